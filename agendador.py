@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Agendador adaptativo com sondas baratas
+
+O "Schedule Trigger" do n8n rodava a sincronização completa em intervalo de
+segundos, enquanto o README previa uma execução diária às 01:00. Aqui uma
+sonda leve roda com frequência: o `total_count` de produtos (1 objeto) e um
+trecho rotativo das páginas de preços, comparado com hashes guardados. Só há
+sincronização quando a sonda vê mudança: parcial (apenas os produtos com preço
+alterado) ou completa (o catálogo cresceu ou encolheu, ou chegou a hora da
+completa diária).
+
+O intervalo entre sondas cai pela metade quando há mudança e cresce aos poucos
+quando não há. O número de páginas de preços por sonda é proporcional ao
+intervalo, de forma que todas as páginas são verificadas dentro de
+`janela_precos` segundos e a carga na API fica aproximadamente constante.
+
+Uso:
+    python agendador.py --config config_baserow.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from combinar_produtos import extrair_id_recurso
+from loja_integrada import LojaIntegradaClient
+
+ARQUIVO_SONDA = os.path.join('estado', 'sonda.json')
+
+def hash_preco(preco: Dict) -> str:
+    """Hash curto dos campos de preço que importam para o catálogo"""
+    conteudo = '|'.join(str(preco.get(campo)) for campo in ('cheio', 'promocional', 'custo', 'sob_consulta'))
+    return hashlib.blake2b(conteudo.encode('utf-8'), digest_size=6).hexdigest()
+
+@dataclass
+class ResultadoSonda:
+    total_produtos: int
+    total_precos: int
+    paginas_verificadas: int = 0
+    precos_alterados: Dict[str, Dict] = field(default_factory=dict)
+    # Hashes e cursor vistos nesta sonda; só entram na `SondaMudancas` via `commit`
+    hashes: Dict[str, str] = field(default_factory=dict)
+    cursor: int = 0
+
+class SondaMudancas:
+    """Detecta mudanças com poucas requisições e guarda o que já viu em disco"""
+
+    def __init__(self, loja: LojaIntegradaClient, caminho: str = ARQUIVO_SONDA):
+        self.loja = loja
+        self.caminho = caminho
+        self.total_produtos: Optional[int] = None
+        self.hashes: Dict[str, str] = {}
+        self.cursor = 0
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            self.total_produtos = dados.get('total_produtos')
+            self.hashes = dados.get('hashes', {})
+            self.cursor = dados.get('cursor', 0)
+
+    def save(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({'total_produtos': self.total_produtos, 'hashes': self.hashes, 'cursor': self.cursor}, f)
+        os.replace(temporario, self.caminho)
+
+    def probe(self, paginas: int = 1) -> ResultadoSonda:
+        """Lê o total de produtos e `paginas` páginas de preços a partir do cursor rotativo
+
+        Um preço só conta como alterado se já tinha sido visto; a primeira volta
+        completa apenas registra os hashes. Nada muda na sonda até `commit`: se a
+        sincronização disparada por este resultado falhar, os mesmos preços voltam
+        a aparecer como alterados na próxima sonda.
+        """
+        total_produtos = int((self.loja.get_page('produto', 0, limite=1).get('meta') or {}).get('total_count') or 0)
+        limite = self.loja.limite_por_pagina
+        resultado = ResultadoSonda(total_produtos, 0, cursor=self.cursor)
+        for _ in range(max(1, paginas)):
+            pagina = self.loja.get_page('produto_preco', resultado.cursor)
+            resultado.total_precos = int((pagina.get('meta') or {}).get('total_count') or 0)
+            resultado.paginas_verificadas += 1
+            for preco in pagina.get('objects') or []:
+                produto_id = extrair_id_recurso(preco.get('produto'))
+                novo = hash_preco(preco)
+                anterior = self.hashes.get(produto_id)
+                if anterior is not None and anterior != novo:
+                    resultado.precos_alterados[produto_id] = preco
+                resultado.hashes[produto_id] = novo
+            resultado.cursor += limite
+            if resultado.cursor >= resultado.total_precos:
+                # Fim de uma volta: a próxima sonda recomeça da primeira página
+                resultado.cursor = 0
+                break
+        return resultado
+
+    def commit(self, resultado: ResultadoSonda):
+        """Registra e grava o que a sonda viu, depois que a sincronização terminou sem erro"""
+        self.total_produtos = resultado.total_produtos
+        self.hashes.update(resultado.hashes)
+        self.cursor = resultado.cursor
+        self.save()
+
+class AgendadorAdaptativo:
+    """Decide a cada ciclo entre nenhuma, parcial ou completa e ajusta o intervalo
+
+    `sincronizar(parcial)` roda a sincronização (`parcial=None` para a completa);
+    `relogio` e `dormir` podem ser trocados para testes.
+    """
+
+    def __init__(self, sonda: SondaMudancas, sincronizar: Callable[[Optional[Dict[str, Dict]]], Dict],
+                 intervalo_min: float = 60, intervalo_max: float = 900, janela_precos: float = 900,
+                 hora_completa: int = 1, fator_aumento: float = 1.5,
+                 relogio: Callable[[], float] = time.time, dormir: Callable[[float], None] = time.sleep):
+        self.sonda = sonda
+        self.sincronizar = sincronizar
+        self.intervalo_min = intervalo_min
+        self.intervalo_max = intervalo_max
+        self.janela_precos = janela_precos
+        self.hora_completa = hora_completa
+        self.fator_aumento = fator_aumento
+        self.relogio = relogio
+        self.dormir = dormir
+        self.intervalo = intervalo_min
+        self.total_precos = 0
+        self.proxima_completa = self._proxima_completa(relogio())
+
+    def _proxima_completa(self, agora: float) -> float:
+        """Próxima ocorrência de `hora_completa` (hora local)"""
+        momento = datetime.fromtimestamp(agora).replace(hour=self.hora_completa, minute=0, second=0, microsecond=0)
+        if momento.timestamp() <= agora:
+            momento += timedelta(days=1)
+        return momento.timestamp()
+
+    def paginas_por_sonda(self) -> int:
+        """Páginas de preços necessárias para cobrir o catálogo dentro de `janela_precos`"""
+        paginas = math.ceil(self.total_precos / self.sonda.loja.limite_por_pagina) if self.total_precos else 1
+        return max(1, min(paginas, math.ceil(paginas * self.intervalo / self.janela_precos)))
+
+    def ciclo(self) -> Dict:
+        """Roda uma sonda e, se preciso, uma sincronização; retorna o que foi decidido"""
+        agora = self.relogio()
+        total_anterior = self.sonda.total_produtos
+        resultado = self.sonda.probe(self.paginas_por_sonda())
+        self.total_precos = resultado.total_precos
+
+        mudou_total = total_anterior is not None and resultado.total_produtos != total_anterior
+        if total_anterior is None or mudou_total or agora >= self.proxima_completa:
+            acao = 'completa'
+        elif resultado.precos_alterados:
+            acao = 'parcial'
+        else:
+            acao = 'nenhuma'
+
+        relatorio = None
+        if acao == 'completa':
+            relatorio = self.sincronizar(None)
+            self.proxima_completa = self._proxima_completa(agora)
+        elif acao == 'parcial':
+            relatorio = self.sincronizar(resultado.precos_alterados)
+        # Só registra o novo total, os hashes e o cursor depois que a sincronização terminou sem erro
+        self.sonda.commit(resultado)
+
+        if mudou_total or resultado.precos_alterados:
+            self.intervalo = max(self.intervalo_min, self.intervalo / 2)
+        else:
+            self.intervalo = min(self.intervalo_max, self.intervalo * self.fator_aumento)
+        return {
+            'acao': acao,
+            'paginas_verificadas': resultado.paginas_verificadas,
+            'precos_alterados': len(resultado.precos_alterados),
+            'proximo_intervalo_s': round(self.intervalo, 1),
+            'relatorio': relatorio
+        }
+
+    def executar(self, max_ciclos: Optional[int] = None):
+        ciclos = 0
+        while max_ciclos is None or ciclos < max_ciclos:
+            try:
+                decisao = self.ciclo()
+                print(f"🛰️ {datetime.now():%H:%M:%S} sonda: {decisao['paginas_verificadas']} páginas, "
+                      f"{decisao['precos_alterados']} preços alterados → {decisao['acao']} "
+                      f"(próxima em {decisao['proximo_intervalo_s']:.0f}s)")
+            except Exception as e:
+                # Uma falha de rede não derruba o agendador; tenta de novo no intervalo mínimo
+                print(f"❌ Ciclo falhou: {e}")
+                self.intervalo = self.intervalo_min
+            ciclos += 1
+            if max_ciclos is None or ciclos < max_ciclos:
+                self.dormir(self.intervalo)
+
+def main(argv=None):
+    from sync import SyncPipeline, carregar_config
+
+    parser = argparse.ArgumentParser(description="Agendador adaptativo da sincronização Loja Integrada → Baserow")
+    parser.add_argument('--config', default='config_baserow.json')
+    parser.add_argument('--intervalo-min', type=float, default=60, help="Menor intervalo entre sondas (s)")
+    parser.add_argument('--intervalo-max', type=float, default=900, help="Maior intervalo entre sondas (s)")
+    parser.add_argument('--janela-precos', type=float, default=900,
+                        help="Tempo para verificar todas as páginas de preços (s)")
+    parser.add_argument('--hora-completa', type=int, default=1, help="Hora da sincronização completa diária")
+    args = parser.parse_args(argv)
+
+    config = carregar_config(args.config)
+    loja = LojaIntegradaClient(config.chave_api, config.aplicacao, base_url=config.loja_url,
+                               max_workers=config.max_workers)
+
+    def sincronizar(parcial):
+        pipeline = SyncPipeline(config, loja=loja)
+        relatorio = asyncio.run(pipeline.run(parcial))
+        pipeline.metricas.imprimir()
+        return relatorio
+
+    agendador = AgendadorAdaptativo(SondaMudancas(loja), sincronizar, intervalo_min=args.intervalo_min,
+                                    intervalo_max=args.intervalo_max, janela_precos=args.janela_precos,
+                                    hora_completa=args.hora_completa)
+    agendador.executar()
+
+if __name__ == "__main__":
+    main()
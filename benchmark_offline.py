@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline da sincronização com servidores locais da Loja Integrada e do Baserow
+
+O `testar_api.py` consulta a API real com `limit: 5` e a lógica de combinação
+era validada com um único produto fixo; não havia como medir a sincronização
+com um catálogo de verdade. Aqui os dumps do repositório (Produtos, Preços e
+Baserow2) são replicados até 1k/10k/100k produtos e servidos por dois
+servidores HTTP locais que imitam as rotas usadas pelo `sync.py`, com
+latência e 429 (Retry-After) injetados. Cada tamanho roda três cenários:
+carga inicial (tabela vazia), execução sem mudanças e execução com uma fração
+dos preços alterada.
+
+Os servidores rodam em um processo próprio, para não disputarem o GIL com o
+pipeline medido. A latência por etapa é medida no servidor (inclui a latência
+injetada); as 429 do Baserow são repetidas pela sessão HTTP e só aparecem
+aqui.
+
+Uso:
+    python benchmark_offline.py [--tamanhos 1000 10000 100000] [--latencia 0.02] [--taxa-429 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from cliente_http import fechar_sessoes
+from combinar_produtos import extrair_id_recurso, gerar_catalogo_sintetico, preco_valido
+from leitura_streaming import ler_dump
+
+ARQUIVO_PRODUTOS = 'Loja Integrada API - Produtos exemplo output api.json'
+ARQUIVO_PRECOS = 'Loja Integrada API - Preços exemplo output api.json'
+ARQUIVO_BASEROW2 = 'Baserow2-exemplo output.json'
+TABELA_ID = 1
+CAMPO_ID_PRODUTO = 'ID Produto Loja Integrada'
+CENARIOS = ('inicial', 'sem_mudancas', 'incremental')
+
+def carregar_fixtures(total: int, semente: int = 42) -> Tuple[List[Dict], List[Dict], Dict[str, Dict]]:
+    """Produtos, preços e categorias sintéticos a partir dos dumps gravados do n8n
+
+    Os produtos das saídas "Produtos" e "Baserow2" (a mesma listagem, em
+    execuções diferentes) formam a base; as cópias mantêm as URIs de
+    categorias e SEO da base, então o resolver busca cada recurso uma vez.
+    """
+    base = {}
+    for arquivo in (ARQUIVO_PRODUTOS, ARQUIVO_BASEROW2):
+        for produto in ler_dump(arquivo):
+            base.setdefault(produto['id'], produto)
+    produtos, precos = gerar_catalogo_sintetico(list(base.values()), list(ler_dump(ARQUIVO_PRECOS)), total, semente)
+    categorias = {}
+    for produto in base.values():
+        for uri in produto.get('categorias') or []:
+            categoria_id = extrair_id_recurso(uri)
+            categorias[uri] = {'id': int(categoria_id), 'nome': f"Categoria {categoria_id}",
+                               'categoria_pai': None, 'resource_uri': uri}
+    return produtos, precos, categorias
+
+def etapa_da_rota(metodo: str, caminho: str) -> str:
+    """Etapa do `sync.py` responsável por uma requisição"""
+    if caminho.startswith('/v1/produto_preco'):
+        return 'precos'
+    if caminho.startswith('/v1/produto'):
+        return 'produtos'
+    if caminho.startswith('/v1/'):
+        return 'recursos'
+    if caminho.startswith('/api/database/fields/'):
+        return 'campos'
+    return 'indice_baserow' if metodo == 'GET' else 'escrita'
+
+class ServidorSimulado:
+    """Estado compartilhado pelos dois servidores: fixtures, tabela do Baserow e registro das requisições
+
+    A tabela guarda só o id da linha e a coluna `ID Produto Loja Integrada`,
+    o suficiente para o índice e os filtros; o resto do payload é descartado.
+    """
+
+    def __init__(self, total: int, latencia: float = 0.02, taxa_429: float = 0.01, retry_after: int = 1,
+                 semente: int = 42):
+        self.produtos, self.precos, self.categorias = carregar_fixtures(total, semente)
+        self.por_id = {str(produto['id']): produto for produto in self.produtos}
+        self.latencia = latencia
+        self.taxa_429 = taxa_429
+        self.retry_after = retry_after
+        self.aleatorio = random.Random(semente)
+        self.lock = threading.Lock()
+        self.campos: Dict[str, Dict] = {}
+        self.linhas: Dict[int, str] = {}
+        self.proxima_linha = 1
+        self.registros: List[Tuple[str, int, float]] = []
+
+    def registrar(self, etapa: str, status: int, segundos: float):
+        with self.lock:
+            self.registros.append((etapa, status, segundos))
+
+    def sortear_429(self) -> bool:
+        with self.lock:
+            return self.aleatorio.random() < self.taxa_429
+
+    def esperar(self):
+        if self.latencia:
+            with self.lock:
+                fator = self.aleatorio.uniform(0.5, 1.5)
+            time.sleep(self.latencia * fator)
+
+    def alterar_precos(self, fracao: float) -> int:
+        """Aumenta em R$ 1,00 o preço cheio de uma fração dos produtos com preço válido"""
+        validos = [i for i, preco in enumerate(self.precos) if preco_valido(preco)]
+        with self.lock:
+            escolhidos = self.aleatorio.sample(validos, int(len(validos) * fracao))
+        for i in escolhidos:
+            preco = self.precos[i]
+            self.precos[i] = dict(preco, cheio=str(Decimal(preco.get('cheio') or 0) + 1))
+        return len(escolhidos)
+
+    def estatisticas(self) -> List[Tuple[str, int, float]]:
+        with self.lock:
+            registros, self.registros = self.registros, []
+        return registros
+
+    # Loja Integrada
+
+    def rota_loja(self, caminho: str, query: Dict[str, List[str]]) -> Tuple[int, Optional[object]]:
+        partes = [parte for parte in caminho.split('/') if parte]
+        if len(partes) == 3:
+            tipo, recurso_id = partes[1], partes[2]
+            if tipo == 'produto':
+                return (200, self.por_id[recurso_id]) if recurso_id in self.por_id else (404, None)
+            if tipo == 'categoria':
+                categoria = self.categorias.get(f"/api{caminho}")
+                return (200, categoria) if categoria else (404, None)
+            # SEO e variações: conteúdo derivado do id
+            return 200, {'id': int(recurso_id), 'resource_uri': f"/api{caminho}", 'nome': f"{tipo} {recurso_id}",
+                         'title': f"Título {recurso_id}", 'description': f"Descrição {recurso_id}"}
+        dados = {'produto': self.produtos, 'produto_preco': self.precos,
+                 'categoria': list(self.categorias.values())}.get(partes[-1])
+        if dados is None:
+            return 404, None
+        limite = int(query.get('limit', ['20'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        proximo = f"/api{caminho}?limit={limite}&offset={offset + limite}" if offset + limite < len(dados) else None
+        return 200, {'meta': {'limit': limite, 'offset': offset, 'total_count': len(dados), 'next': proximo},
+                     'objects': dados[offset:offset + limite]}
+
+    # Baserow
+
+    def _id_produto(self, item: Dict) -> Optional[str]:
+        campo = self.campos.get(CAMPO_ID_PRODUTO)
+        valor = item.get(f"field_{campo['id']}") if campo else None
+        if valor is None:
+            valor = item.get(CAMPO_ID_PRODUTO)
+        return None if valor is None else str(valor)
+
+    def rota_baserow(self, metodo: str, caminho: str, query: Dict[str, List[str]], corpo: Optional[Dict],
+                     base_url: str) -> Tuple[int, Optional[object]]:
+        with self.lock:
+            if caminho.startswith('/api/database/fields/'):
+                if metodo == 'GET':
+                    return 200, list(self.campos.values())
+                campo = dict(corpo, id=len(self.campos) + 1000)
+                self.campos[campo['name']] = campo
+                return 200, campo
+            if caminho.endswith('/batch-delete/'):
+                for linha_id in corpo['items']:
+                    self.linhas.pop(int(linha_id), None)
+                return 204, None
+            if caminho.endswith('/batch/'):
+                itens = []
+                for item in corpo['items']:
+                    linha_id = item.get('id')
+                    if linha_id is None:
+                        linha_id, self.proxima_linha = self.proxima_linha, self.proxima_linha + 1
+                    produto_id = self._id_produto(item)
+                    if produto_id is not None or linha_id not in self.linhas:
+                        self.linhas[linha_id] = produto_id
+                    itens.append({'id': linha_id})
+                return 200, {'items': itens}
+            linhas = sorted(self.linhas.items())
+        if 'filters' in query:
+            valores = {filtro['value'] for filtro in json.loads(query['filters'][0])['filters']}
+            linhas = [(linha_id, produto_id) for linha_id, produto_id in linhas if produto_id in valores]
+        pagina = int(query.get('page', ['1'])[0])
+        tamanho = int(query.get('size', ['100'])[0])
+        inicio = (pagina - 1) * tamanho
+        proximo = None
+        if inicio + tamanho < len(linhas):
+            proximo = (f"{base_url}{caminho}?page={pagina + 1}&size={tamanho}&user_field_names=true"
+                       f"&include={CAMPO_ID_PRODUTO}")
+        return 200, {'count': len(linhas), 'next': proximo, 'previous': None,
+                     'results': [{'id': linha_id, CAMPO_ID_PRODUTO: produto_id}
+                                 for linha_id, produto_id in linhas[inicio:inicio + tamanho]]}
+
+def _criar_handler(servidor: ServidorSimulado, api: str):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        wbufsize = -1
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status: int, corpo=None, cabecalhos: Optional[Dict[str, str]] = None):
+            dados = json.dumps(corpo, ensure_ascii=False).encode('utf-8') if corpo is not None else b''
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _controle(self, metodo: str, caminho: str, query: Dict[str, List[str]]):
+            if caminho == '/_benchmark/estatisticas':
+                return self._responder(200, servidor.estatisticas())
+            if caminho == '/_benchmark/alterar-precos':
+                return self._responder(200, {'alterados': servidor.alterar_precos(float(query['fracao'][0]))})
+            self._responder(404)
+
+        def _tratar(self, metodo: str):
+            inicio = time.perf_counter()
+            partes = urlsplit(self.path)
+            query = parse_qs(partes.query)
+            tamanho = int(self.headers.get('Content-Length') or 0)
+            corpo = json.loads(self.rfile.read(tamanho)) if tamanho else None
+            if partes.path.startswith('/_benchmark/'):
+                return self._controle(metodo, partes.path, query)
+            etapa = etapa_da_rota(metodo, partes.path)
+            servidor.esperar()
+            if servidor.sortear_429():
+                status, resposta = 429, {'detail': 'Too Many Requests'}
+                self._responder(status, resposta, {'Retry-After': str(servidor.retry_after)})
+            else:
+                if api == 'loja':
+                    status, resposta = servidor.rota_loja(partes.path, query)
+                else:
+                    base_url = f"http://{self.headers.get('Host')}"
+                    status, resposta = servidor.rota_baserow(metodo, partes.path, query, corpo, base_url)
+                self._responder(status, resposta)
+            servidor.registrar(etapa, status, time.perf_counter() - inicio)
+
+        def do_GET(self):
+            self._tratar('GET')
+
+        def do_POST(self):
+            self._tratar('POST')
+
+        def do_PATCH(self):
+            self._tratar('PATCH')
+
+    return Handler
+
+def _servir(total: int, latencia: float, taxa_429: float, retry_after: int, fila):
+    """Processo dos servidores: monta as fixtures, sobe as duas APIs e informa as portas"""
+    servidor = ServidorSimulado(total, latencia, taxa_429, retry_after)
+    portas = []
+    for api in ('loja', 'baserow'):
+        http = ThreadingHTTPServer(('127.0.0.1', 0), _criar_handler(servidor, api))
+        http.daemon_threads = True
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        portas.append(http.server_port)
+    fila.put(tuple(portas))
+    threading.Event().wait()
+
+def percentil(valores: List[float], fracao: float) -> float:
+    """Percentil por interpolação linear (valores já ordenados)"""
+    if not valores:
+        return 0.0
+    posicao = (len(valores) - 1) * fracao
+    inferior = int(posicao)
+    superior = min(inferior + 1, len(valores) - 1)
+    return valores[inferior] + (valores[superior] - valores[inferior]) * (posicao - inferior)
+
+def resumir_etapas(registros: List[Tuple[str, int, float]], tempos: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Requisições, 429 e percentis de latência por etapa, com a duração medida pelo pipeline"""
+    por_etapa: Dict[str, List] = {}
+    for etapa, status, segundos in registros:
+        por_etapa.setdefault(etapa, []).append((status, segundos))
+    resumo = {}
+    for etapa in sorted(set(por_etapa) | set(tempos)):
+        chamadas = por_etapa.get(etapa, [])
+        latencias = sorted(segundos * 1000 for _, segundos in chamadas)
+        resumo[etapa] = {
+            'requisicoes': len(chamadas),
+            'respostas_429': sum(1 for status, _ in chamadas if status == 429),
+            'p50_ms': round(percentil(latencias, 0.50), 2),
+            'p95_ms': round(percentil(latencias, 0.95), 2),
+            'p99_ms': round(percentil(latencias, 0.99), 2),
+            'duracao_s': (tempos.get(etapa) or {}).get('duracao_s')
+        }
+    return resumo
+
+def executar_tamanho(total: int, latencia: float = 0.02, taxa_429: float = 0.01, retry_after: int = 1,
+                     workers: int = 4, requisicoes_por_segundo: float = 1000.0,
+                     fracao_alterada: float = 0.01, expandir_recursos: bool = True,
+                     embeddings: bool = False) -> List[Dict]:
+    """Roda os cenários de `CENARIOS` para um catálogo de `total` produtos"""
+    import multiprocessing
+
+    from loja_integrada import LojaIntegradaClient, RateLimiter
+    from sync import ConfigSync, SyncPipeline
+
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_servir, args=(total, latencia, taxa_429, retry_after, fila), daemon=True)
+    processo.start()
+    resultados = []
+    try:
+        porta_loja, porta_baserow = fila.get(timeout=300)
+        loja_url = f"http://127.0.0.1:{porta_loja}"
+        with tempfile.TemporaryDirectory() as pasta:
+            config = ConfigSync(
+                chave_api='benchmark', aplicacao='benchmark', baserow_url=f"http://127.0.0.1:{porta_baserow}",
+                baserow_token='benchmark', tabela_id=TABELA_ID, loja_url=loja_url, max_workers=workers,
+                arquivo_estado=os.path.join(pasta, 'fingerprints.json'),
+                arquivo_journal=os.path.join(pasta, 'journal.sqlite'),
+                arquivo_campos=os.path.join(pasta, 'campos_baserow.json'),
+                arquivo_recursos=os.path.join(pasta, 'recursos.sqlite'),
+                pasta_vector_store=os.path.join(pasta, 'vector_store'),
+                pasta_historico=os.path.join(pasta, 'historico'),
+                arquivo_faq=os.path.join(pasta, 'faq.sqlite'),
+                arquivo_embeddings=os.path.join(pasta, 'embeddings.sqlite'),
+                expandir_recursos=expandir_recursos, embeddings=embeddings)
+            for cenario in CENARIOS:
+                if cenario == 'incremental':
+                    requests.get(f"{loja_url}/_benchmark/alterar-precos", params={'fracao': fracao_alterada})
+                # Ler as estatísticas também as zera: descarta as requisições do cenário anterior
+                requests.get(f"{loja_url}/_benchmark/estatisticas")
+                loja = LojaIntegradaClient(config.chave_api, config.aplicacao, base_url=loja_url,
+                                           max_workers=workers,
+                                           rate_limiter=RateLimiter(requisicoes_por_segundo, rajada=workers))
+                pipeline = SyncPipeline(config, loja=loja)
+                relatorio = asyncio.run(pipeline.run())
+                registros = requests.get(f"{loja_url}/_benchmark/estatisticas").json()
+                contadores = relatorio['contadores']
+                resultados.append({
+                    'produtos': total,
+                    'cenario': cenario,
+                    'total_s': relatorio['total_s'],
+                    'produtos_por_s': round(total / relatorio['total_s'], 1) if relatorio['total_s'] else None,
+                    'requisicoes': len(registros),
+                    'respostas_429': sum(1 for _, status, _ in registros if status == 429),
+                    # Visão do cliente (metricas.py): deve bater com os 429 vistos pelo servidor
+                    'retentativas_cliente': sum(serie['valor'] for serie in relatorio['series']
+                                                if serie['nome'] == 'http_retentativas'),
+                    'linhas_gravadas': {acao: contadores.get(f"linhas_{acao}", 0)
+                                        for acao in ('create', 'update', 'delete', 'desativar')},
+                    'embeddings': {nome: contadores[nome] for nome in (
+                        'embeddings_gerados', 'embeddings_reaproveitados', 'vector_store_produtos')
+                        if nome in contadores},
+                    'etapas': resumir_etapas(registros, relatorio['etapas'])
+                })
+    finally:
+        processo.terminate()
+        processo.join()
+        # As portas mudam a cada tamanho; as sessões antigas não servem mais
+        fechar_sessoes()
+    return resultados
+
+def imprimir_resultado(resultado: Dict):
+    linhas = ', '.join(f"{acao}={quantidade}" for acao, quantidade in resultado['linhas_gravadas'].items()
+                       if quantidade)
+    print(f"\n📦 {resultado['produtos']} produtos | {resultado['cenario']} | {resultado['total_s']:.2f}s | "
+          f"{resultado['produtos_por_s']} produtos/s | {resultado['requisicoes']} requisições "
+          f"({resultado['respostas_429']} × 429, {resultado['retentativas_cliente']} retentativas no cliente) | "
+          f"{linhas or 'nada gravado'}")
+    if resultado['embeddings']:
+        print("   " + ', '.join(f"{nome}={quantidade}" for nome, quantidade in resultado['embeddings'].items()))
+    print(f"   {'etapa':<16} | {'req':>6} | {'429':>4} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | {'duração':>8}")
+    print("   " + "-" * 78)
+    for etapa, dados in resultado['etapas'].items():
+        duracao = f"{dados['duracao_s']:.2f}s" if dados['duracao_s'] is not None else '-'
+        print(f"   {etapa:<16} | {dados['requisicoes']:>6} | {dados['respostas_429']:>4} | "
+              f"{dados['p50_ms']:>8.1f} | {dados['p95_ms']:>8.1f} | {dados['p99_ms']:>8.1f} | {duracao:>8}")
+
+def benchmark_offline(tamanhos=(1000, 10000, 100000), **opcoes) -> List[Dict]:
+    """Roda todos os tamanhos e imprime throughput, requisições e percentis por etapa"""
+    resultados = []
+    for total in tamanhos:
+        for resultado in executar_tamanho(total, **opcoes):
+            imprimir_resultado(resultado)
+            resultados.append(resultado)
+    return resultados
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline da sincronização com APIs simuladas")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--latencia', type=float, default=0.02, help="Latência média por requisição (s)")
+    parser.add_argument('--taxa-429', type=float, default=0.01, help="Fração das requisições respondidas com 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After das respostas 429 (s)")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rps', type=float, default=1000.0,
+                        help="Limite do rate limiter da Loja Integrada (a API real aceita ~5/s)")
+    parser.add_argument('--fracao-alterada', type=float, default=0.01,
+                        help="Fração dos preços alterada antes do cenário incremental")
+    parser.add_argument('--sem-recursos', action='store_true', help="Não expande categorias, SEO e variações")
+    parser.add_argument('--embeddings', action='store_true', help="Inclui a etapa de embeddings/vector store")
+    parser.add_argument('--saida', help="Grava os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    print("⏱️ Benchmark offline da sincronização Loja Integrada → Baserow")
+    print("=" * 60)
+    resultados = benchmark_offline(args.tamanhos, latencia=args.latencia, taxa_429=args.taxa_429,
+                                   retry_after=args.retry_after, workers=args.workers,
+                                   requisicoes_por_segundo=args.rps, fracao_alterada=args.fracao_alterada,
+                                   expandir_recursos=not args.sem_recursos, embeddings=args.embeddings)
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+    return resultados
+
+if __name__ == "__main__":
+    main()
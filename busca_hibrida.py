@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+Busca híbrida (BM25 + vetores) sobre o catálogo de produtos
+
+Clientes perguntam por SKU ("F7VMEU95P"), nome de modelo e GTIN, onde a busca
+puramente semântica falha. Um índice invertido BM25 sobre `nome`, `sku`, `gtin`,
+`mpn`, categorias, variações e a descrição limpa roda em processo; o ranking final funde BM25 e
+similaridade vetorial por Reciprocal Rank Fusion. O índice é atualizado
+incrementalmente quando produtos são criados, alterados ou removidos.
+"""
+
+import math
+import random
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_TOKENS = re.compile(r'\w+', re.UNICODE)
+
+# Campos indexados e o peso de cada um (SKU/GTIN/MPN valem mais que a descrição)
+PESOS_CAMPOS = {'nome': 3, 'sku': 5, 'gtin': 5, 'mpn': 5, 'categorias': 2, 'variacoes': 2,
+                'descricao_produto': 1}
+
+# Palavras muito frequentes que só inflariam as listas invertidas
+STOPWORDS = {
+    'a', 'ao', 'aos', 'as', 'com', 'da', 'das', 'de', 'do', 'dos', 'e', 'em', 'na', 'nas', 'no',
+    'nos', 'o', 'os', 'ou', 'para', 'por', 'que', 'se', 'sem', 'um', 'uma'
+}
+
+# Tabela para remover acentos sem normalizar caractere a caractere
+_SEM_ACENTOS = str.maketrans('áàâãäéèêëíìîïóòôõöúùûüçñ', 'aaaaaeeeeiiiiooooouuuucn')
+
+def tokenizar(texto: str) -> List[str]:
+    """Minúsculas, sem acentos e sem stopwords, separando por caracteres não alfanuméricos"""
+    texto = (texto or '').lower().translate(_SEM_ACENTOS)
+    return [termo for termo in _TOKENS.findall(texto) if termo not in STOPWORDS]
+
+class IndiceBM25:
+    """Índice invertido BM25 com inserção, atualização e remoção incrementais
+
+    Cada documento ocupa uma posição ("slot") em arrays NumPy de comprimento e
+    score; as listas invertidas ficam em dicts (atualização O(termos do doc)) e
+    são convertidas para arrays sob demanda, só para os termos que mudaram.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, pesos: Optional[Dict[str, int]] = None):
+        self.k1 = k1
+        self.b = b
+        self.pesos = pesos or PESOS_CAMPOS
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.termos_doc: Dict[int, Dict[str, int]] = {}
+        self.slots: Dict[str, int] = {}
+        self.doc_ids: List[Optional[str]] = []
+        self.slots_livres: List[int] = []
+        self.comprimentos = np.zeros(1024, dtype=np.float64)
+        self.soma_comprimentos = 0
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # Fator de normalização por documento, recalculado após alterações
+        self._normas: Optional[np.ndarray] = None
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _frequencias(self, registro: Dict) -> Dict[str, int]:
+        frequencias: Dict[str, int] = defaultdict(int)
+        for campo, peso in self.pesos.items():
+            for termo in tokenizar(str(registro.get(campo) or '')):
+                frequencias[termo] += peso
+        return frequencias
+
+    def _novo_slot(self, doc_id: str) -> int:
+        if self.slots_livres:
+            slot = self.slots_livres.pop()
+            self.doc_ids[slot] = doc_id
+        else:
+            slot = len(self.doc_ids)
+            self.doc_ids.append(doc_id)
+            if slot >= len(self.comprimentos):
+                self.comprimentos = np.concatenate([self.comprimentos, np.zeros_like(self.comprimentos)])
+        self.slots[doc_id] = slot
+        return slot
+
+    def upsert(self, doc_id: str, registro: Dict):
+        """Indexa (ou reindexa) um produto"""
+        doc_id = str(doc_id)
+        if doc_id in self.slots:
+            self.remove(doc_id)
+        slot = self._novo_slot(doc_id)
+        frequencias = self._frequencias(registro)
+        for termo, frequencia in frequencias.items():
+            self.postings[termo][slot] = frequencia
+            self._arrays.pop(termo, None)
+        comprimento = sum(frequencias.values())
+        self.termos_doc[slot] = frequencias
+        self.comprimentos[slot] = comprimento
+        self.soma_comprimentos += comprimento
+        self._normas = None
+
+    def remove(self, doc_id: str):
+        slot = self.slots.pop(str(doc_id), None)
+        if slot is None:
+            return
+        for termo in self.termos_doc.pop(slot):
+            lista = self.postings[termo]
+            lista.pop(slot, None)
+            self._arrays.pop(termo, None)
+            if not lista:
+                del self.postings[termo]
+        self.soma_comprimentos -= self.comprimentos[slot]
+        self.comprimentos[slot] = 0
+        self.doc_ids[slot] = None
+        self.slots_livres.append(slot)
+        self._normas = None
+
+    def _calcular_normas(self) -> np.ndarray:
+        media = self.soma_comprimentos / len(self.slots)
+        self._normas = self.k1 * (1 - self.b + self.b * self.comprimentos[:len(self.doc_ids)] / media)
+        return self._normas
+
+    def _arrays_termo(self, termo: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        arrays = self._arrays.get(termo)
+        if arrays is None:
+            lista = self.postings.get(termo)
+            if not lista:
+                return None
+            arrays = self._arrays[termo] = (
+                np.fromiter(lista.keys(), dtype=np.int64, count=len(lista)),
+                np.fromiter(lista.values(), dtype=np.float64, count=len(lista))
+            )
+        return arrays
+
+    def search(self, consulta: str, k: int = 10) -> List[Tuple[str, float]]:
+        total = len(self.slots)
+        # `k <= 0` quebraria o argpartition (kth fora do intervalo ou fatia negativa)
+        if not total or k <= 0:
+            return []
+        normas = self._normas if self._normas is not None else self._calcular_normas()
+        scores = None
+        for termo in set(tokenizar(consulta)):
+            arrays = self._arrays_termo(termo)
+            if arrays is None:
+                continue
+            slots, frequencias = arrays
+            peso = math.log(1 + (total - len(slots) + 0.5) / (len(slots) + 0.5)) * (self.k1 + 1)
+            if scores is None:
+                scores = np.zeros(len(normas), dtype=np.float64)
+            scores[slots] += peso * frequencias / (frequencias + normas[slots])
+        if scores is None:
+            return []
+        encontrados = np.flatnonzero(scores)
+        if len(encontrados) > k:
+            encontrados = encontrados[np.argpartition(-scores[encontrados], k - 1)[:k]]
+        encontrados = encontrados[np.argsort(-scores[encontrados])]
+        return [(self.doc_ids[slot], float(scores[slot])) for slot in encontrados]
+
+def fundir_rrf(rankings: Iterable[List[Tuple[str, float]]], pesos: Optional[List[float]] = None,
+               k: int = 60) -> List[Tuple[str, float]]:
+    """Reciprocal Rank Fusion: soma `peso / (k + posição)` de cada ranking"""
+    rankings = list(rankings)
+    pesos = pesos or [1.0] * len(rankings)
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking, peso in zip(rankings, pesos):
+        for posicao, (doc_id, _) in enumerate(ranking):
+            scores[str(doc_id)] += peso / (k + posicao + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+class BuscaHibrida:
+    """Combina o BM25 com uma busca vetorial opcional
+
+    `busca_vetorial(consulta, k)` deve retornar `[(id_produto, score), ...]`, por
+    exemplo embedando a consulta e chamando `VectorStore.search`.
+    """
+
+    def __init__(self, busca_vetorial: Optional[Callable[[str, int], List[Tuple[str, float]]]] = None,
+                 peso_bm25: float = 1.0, peso_vetorial: float = 1.0):
+        self.bm25 = IndiceBM25()
+        self.busca_vetorial = busca_vetorial
+        self.peso_bm25 = peso_bm25
+        self.peso_vetorial = peso_vetorial
+
+    def index(self, registros: Iterable[Dict]):
+        for registro in registros:
+            self.bm25.upsert(registro['id_produto_loja_integrada'], registro)
+
+    def apply_delta(self, resultado):
+        """Aplica um `ResultadoDelta` da sincronização incremental ao índice"""
+        for registro in resultado.creates + resultado.updates:
+            self.bm25.upsert(registro['id_produto_loja_integrada'], registro)
+        for produto_id in resultado.removidos:
+            self.bm25.remove(produto_id)
+
+    def search(self, consulta: str, k: int = 10, candidatos: int = 50) -> List[Tuple[str, float]]:
+        rankings = [self.bm25.search(consulta, candidatos)]
+        pesos = [self.peso_bm25]
+        if self.busca_vetorial is not None:
+            rankings.append(self.busca_vetorial(consulta, candidatos))
+            pesos.append(self.peso_vetorial)
+        return fundir_rrf(rankings, pesos)[:k]
+
+def benchmark_busca(total: int = 100000, consultas: int = 500, semente: int = 0) -> Dict[str, float]:
+    """Latência p50/p99 do BM25 sobre um catálogo sintético com vocabulário de drones"""
+    rng = random.Random(semente)
+    marcas = ['dji', 'autel', 'parrot', 'skydio', 'xag', 'yuneec']
+    modelos = ['mavic', 'matrice', 'mini', 'air', 'avata', 'agras', 'evo', 'anafi', 'inspire', 'phantom']
+    termos = ['bateria', 'hélice', 'carregador', 'câmera', 'gimbal', 'controle', 'case', 'filtro',
+              'enterprise', 'combo', 'rtk', 'térmica', 'zoom', 'lidar', 'pulverização', 'garantia',
+              'homologação', 'anatel', 'autonomia', 'minutos', 'transmissão', 'km', 'sensor', 'cmos']
+    # Vocabulário com distribuição de Zipf, como em descrições reais
+    vocabulario = np.array(termos + [f"termo{i}" for i in range(20000)])
+    zipf = 1 / np.arange(1, len(vocabulario) + 1)
+    palavras = np.random.default_rng(semente).choice(len(vocabulario), size=(total, 80), p=zipf / zipf.sum())
+    skus, registros = [], []
+    for i in range(total):
+        sku = ''.join(rng.choice('ABCDEFGHJKLMNPQRSTUVWXYZ0123456789') for _ in range(9))
+        skus.append(sku)
+        registros.append({
+            'nome': f"Drone {rng.choice(marcas)} {rng.choice(modelos)} {rng.randint(1, 4)} {rng.choice(termos)}",
+            'sku': sku,
+            'gtin': str(7890000000000 + i),
+            'descricao_produto': ' '.join(vocabulario[palavras[i]])
+        })
+
+    busca = BuscaHibrida()
+    inicio = time.perf_counter()
+    for i, registro in enumerate(registros):
+        busca.bm25.upsert(str(i), registro)
+    tempo_indexacao = time.perf_counter() - inicio
+
+    latencias = []
+    for i in range(consultas):
+        if i % 2:
+            consulta = skus[rng.randrange(total)]
+        else:
+            consulta = f"{rng.choice(modelos)} {rng.randint(1, 4)} {rng.choice(termos)}"
+        inicio = time.perf_counter()
+        busca.search(consulta, k=10)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    resultado = {
+        'produtos': total,
+        'indexacao_s': tempo_indexacao,
+        'p50_ms': latencias[len(latencias) // 2] * 1000,
+        'p99_ms': latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+    }
+    print(f"🔎 {total} produtos indexados em {tempo_indexacao:.1f}s")
+    print(f"   {consultas} consultas (metade SKU, metade texto): "
+          f"p50 {resultado['p50_ms']:.2f} ms | p99 {resultado['p99_ms']:.2f} ms")
+    return resultado
+
+if __name__ == "__main__":
+    benchmark_busca(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
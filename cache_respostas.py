@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Cache semântico de respostas na frente do agente de atendimento
+
+O agente responde as mesmas poucas perguntas ("tem o Mavic 3 em estoque?",
+"qual o preço do ...") o tempo todo, pagando busca e geração a cada vez. As
+perguntas são normalizadas e embedadas; se já existe uma pergunta quase igual
+(similaridade de cosseno acima do limiar), a resposta guardada é devolvida,
+desde que as duas citem os mesmos números, códigos e modelos e tenham as
+mesmas negações.
+
+Cada resposta guarda o fingerprint (`sincronizacao_incremental.py`) dos
+produtos que cita. Quando a sincronização grava um fingerprint novo (o preço
+faz parte dele) ou remove o produto, as respostas que o citam deixam de valer:
+em processo via `apply_delta`, e entre processos relendo o arquivo de estado
+quando ele muda.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from embeddings import EmbedderHash
+from sincronizacao_incremental import ARQUIVO_ESTADO, EstadoSincronizacao
+
+ARQUIVO_CACHE = os.path.join('estado', 'respostas.sqlite')
+LIMIAR_PADRAO = 0.9
+
+_TOKENS = re.compile(r'\w+', re.UNICODE)
+_SEM_ACENTOS = str.maketrans('áàâãäéèêëíìîïóòôõöúùûüçñ', 'aaaaaeeeeiiiiooooouuuucn')
+
+def normalizar_pergunta(texto: str) -> str:
+    """Minúsculas, sem acentos e sem pontuação (stopwords ficam: "com" e "sem" mudam a pergunta)"""
+    return ' '.join(_TOKENS.findall((texto or '').lower().translate(_SEM_ACENTOS)))
+
+_NUMERO = re.compile(r'\d')
+
+# Negações mudam o sentido da pergunta e nunca são tratadas como stopword
+NEGACOES = frozenset({'nao', 'nem', 'nunca', 'jamais', 'sem', 'nenhum', 'nenhuma'})
+# Palavras funcionais (já sem acento) que nunca identificam um modelo, mesmo dentro do nome do produto
+STOPWORDS = frozenset({
+    'a', 'o', 'as', 'os', 'um', 'uma', 'uns', 'umas', 'e', 'ou', 'de', 'do', 'da', 'dos', 'das',
+    'em', 'no', 'na', 'nos', 'nas', 'ao', 'aos', 'por', 'pelo', 'pela', 'para', 'pra', 'pro',
+    'que', 'se', 'me', 'eu', 'voce', 'voces', 'vc', 'vcs', 'ai', 'la', 'ja', 'esse', 'essa', 'este', 'esta',
+    'isso', 'isto', 'ele', 'ela', 'seu', 'sua', 'meu', 'minha', 'ola', 'oi', 'favor', 'obrigado', 'obrigada'
+}) - NEGACOES
+
+def termos_de_modelo(nomes: Iterable[str]) -> frozenset:
+    """Termos dos nomes de produto (fora as stopwords) que identificam um modelo: "classic", "enterprise"..."""
+    return frozenset(termo for nome in nomes for termo in normalizar_pergunta(nome).split()
+                     if termo not in STOPWORDS)
+
+def identificadores(normalizada: str, termos_modelo: frozenset = frozenset()) -> frozenset:
+    """Números, códigos (SKU) e termos de modelo citados: "mavic 3" e "mavic 4" são vizinhos no embedding"""
+    return frozenset(termo for termo in normalizada.split() if _NUMERO.search(termo) or termo in termos_modelo)
+
+def negacoes(normalizada: str) -> frozenset:
+    return NEGACOES.intersection(normalizada.split())
+
+class CacheRespostas:
+    """Perguntas já respondidas, com busca por similaridade em memória e persistência em SQLite
+
+    `embedder` segue a interface de `embeddings.py` (`nome`, `dim`,
+    `embed(textos)` com vetores normalizados). `caminho_estado` é o arquivo de
+    fingerprints da sincronização; `None` desliga a validação entre processos.
+    `nomes_produtos` (os nomes do catálogo) ensina quais palavras são modelo;
+    sem ele, só números e códigos separam perguntas parecidas.
+    """
+
+    def __init__(self, embedder=None, caminho: str = ARQUIVO_CACHE, limiar: float = LIMIAR_PADRAO,
+                 caminho_estado: Optional[str] = ARQUIVO_ESTADO, max_itens: int = 10000,
+                 nomes_produtos: Iterable[str] = ()):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.embedder = embedder or EmbedderHash()
+        self.limiar = limiar
+        self.termos_modelo = termos_de_modelo(nomes_produtos)
+        self.caminho_estado = caminho_estado
+        self.max_itens = max_itens
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " id INTEGER PRIMARY KEY, modelo TEXT NOT NULL, normalizada TEXT NOT NULL,"
+            " pergunta TEXT NOT NULL, resposta TEXT NOT NULL, produtos TEXT NOT NULL,"
+            " vetor BLOB NOT NULL, custo_s REAL NOT NULL, acessado_em REAL NOT NULL)"
+        )
+        self.metricas = {'consultas': 0, 'acertos': 0, 'acertos_exatos': 0, 'invalidadas': 0,
+                         'segundos_economizados': 0.0, 'segundos_consulta': 0.0}
+        self._mtime_estado: Optional[float] = None
+        self._carregar()
+
+    def _carregar(self):
+        """Monta os índices em memória a partir do SQLite (entradas de outro embedder são ignoradas)"""
+        self.ids: List[int] = []
+        self.entradas: Dict[int, Dict] = {}
+        self.exatas: Dict[str, int] = {}
+        vetores = []
+        for linha_id, normalizada, resposta, produtos, vetor, custo in self.conn.execute(
+                "SELECT id, normalizada, resposta, produtos, vetor, custo_s FROM respostas WHERE modelo = ?",
+                (self.embedder.nome,)):
+            self._indexar(linha_id, normalizada, resposta, json.loads(produtos), custo)
+            vetores.append(np.frombuffer(vetor, dtype=np.float32))
+        self.vetores = np.stack(vetores) if vetores else np.zeros((0, self.embedder.dim), dtype=np.float32)
+
+    def _indexar(self, linha_id: int, normalizada: str, resposta: str, produtos: Dict[str, Optional[str]],
+                 custo: float):
+        self.ids.append(linha_id)
+        self.entradas[linha_id] = {'normalizada': normalizada, 'resposta': resposta, 'produtos': produtos,
+                                   'custo_s': custo, 'guarda': self._guarda(normalizada)}
+        self.exatas[normalizada] = linha_id
+
+    def _guarda(self, normalizada: str) -> Tuple[frozenset, frozenset]:
+        return identificadores(normalizada, self.termos_modelo), negacoes(normalizada)
+
+    def _remover(self, linha_ids: Iterable[int]) -> int:
+        """Tira entradas do SQLite e da memória (chamar com o lock)"""
+        remover = set(linha_ids) & self.entradas.keys()
+        if not remover:
+            return 0
+        self.conn.executemany("DELETE FROM respostas WHERE id = ?", [(linha_id,) for linha_id in remover])
+        self.conn.commit()
+        manter = [i for i, linha_id in enumerate(self.ids) if linha_id not in remover]
+        self.ids = [self.ids[i] for i in manter]
+        self.vetores = self.vetores[manter]
+        for linha_id in remover:
+            entrada = self.entradas.pop(linha_id)
+            if self.exatas.get(entrada['normalizada']) == linha_id:
+                del self.exatas[entrada['normalizada']]
+        return len(remover)
+
+    def _fingerprints(self) -> Optional[Dict[str, str]]:
+        """Fingerprints atuais da sincronização, relidos só quando o arquivo muda"""
+        if self.caminho_estado is None or not os.path.exists(self.caminho_estado):
+            return None
+        mtime = os.path.getmtime(self.caminho_estado)
+        if mtime != self._mtime_estado:
+            self._mtime_estado = mtime
+            self._estado = EstadoSincronizacao(self.caminho_estado).fingerprints
+            self._validar(self._estado)
+        return self._estado
+
+    def _validar(self, fingerprints: Dict[str, str]) -> int:
+        """Invalida as respostas que citam produtos com fingerprint diferente do guardado"""
+        obsoletas = [linha_id for linha_id, entrada in self.entradas.items()
+                     if any(fingerprints.get(produto_id) != fingerprint
+                            for produto_id, fingerprint in entrada['produtos'].items())]
+        removidas = self._remover(obsoletas)
+        self.metricas['invalidadas'] += removidas
+        return removidas
+
+    def get(self, pergunta: str) -> Optional[Dict]:
+        """Resposta guardada para uma pergunta equivalente, ou `None`
+
+        Retorna `{'resposta', 'produtos', 'similaridade'}`.
+        """
+        inicio = time.perf_counter()
+        normalizada = normalizar_pergunta(pergunta)
+        with self.lock:
+            self._fingerprints()
+            self.metricas['consultas'] += 1
+            linha_id = self.exatas.get(normalizada)
+            similaridade = 1.0
+            if linha_id is None and self.ids:
+                scores = self.vetores @ self.embedder.embed([normalizada])[0]
+                guarda = self._guarda(normalizada)
+                for posicao in np.argsort(-scores):
+                    if scores[posicao] < self.limiar:
+                        break
+                    # Paráfrases passam pelo limiar; outro modelo, número ou uma negação muda a resposta
+                    if self.entradas[self.ids[posicao]]['guarda'] == guarda:
+                        linha_id, similaridade = self.ids[posicao], float(scores[posicao])
+                        break
+            elif linha_id is not None:
+                self.metricas['acertos_exatos'] += 1
+            duracao = time.perf_counter() - inicio
+            self.metricas['segundos_consulta'] += duracao
+            if linha_id is None:
+                return None
+            entrada = self.entradas[linha_id]
+            self.metricas['acertos'] += 1
+            self.metricas['segundos_economizados'] += max(0.0, entrada['custo_s'] - duracao)
+            self.conn.execute("UPDATE respostas SET acessado_em = ? WHERE id = ?", (time.time(), linha_id))
+            self.conn.commit()
+            return {'resposta': entrada['resposta'], 'produtos': list(entrada['produtos']),
+                    'similaridade': similaridade}
+
+    def put(self, pergunta: str, resposta: str, produtos: Iterable[str], custo_s: float = 0.0) -> int:
+        """Guarda uma resposta e os produtos que ela cita (com o fingerprint atual de cada um)
+
+        `custo_s` é quanto a resposta custou para ser gerada (busca + modelo),
+        usado na métrica de tempo economizado.
+        """
+        normalizada = normalizar_pergunta(pergunta)
+        vetor = self.embedder.embed([normalizada])[0].astype(np.float32)
+        with self.lock:
+            fingerprints = self._fingerprints() or {}
+            citados = {str(produto_id): fingerprints.get(str(produto_id)) for produto_id in produtos}
+            if normalizada in self.exatas:
+                self._remover([self.exatas[normalizada]])
+            cursor = self.conn.execute(
+                "INSERT INTO respostas (modelo, normalizada, pergunta, resposta, produtos, vetor, custo_s, acessado_em)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.embedder.nome, normalizada, pergunta, resposta, json.dumps(citados), vetor.tobytes(),
+                 custo_s, time.time()))
+            self.conn.commit()
+            self._indexar(cursor.lastrowid, normalizada, resposta, citados, custo_s)
+            self.vetores = np.vstack([self.vetores, vetor[None, :]])
+            self._evict()
+            return cursor.lastrowid
+
+    def _evict(self):
+        """Descarta as respostas acessadas há mais tempo acima de `max_itens` (chamar com o lock)"""
+        excesso = len(self.ids) - self.max_itens
+        if excesso > 0:
+            antigas = [linha_id for (linha_id,) in self.conn.execute(
+                "SELECT id FROM respostas WHERE modelo = ? ORDER BY acessado_em LIMIT ?",
+                (self.embedder.nome, excesso))]
+            self._remover(antigas)
+
+    def invalidate(self, produto_ids: Iterable[str]) -> int:
+        """Remove as respostas que citam qualquer um dos produtos; retorna quantas"""
+        produtos = {str(produto_id) for produto_id in produto_ids}
+        with self.lock:
+            removidas = self._remover([linha_id for linha_id, entrada in self.entradas.items()
+                                       if produtos & entrada['produtos'].keys()])
+            self.metricas['invalidadas'] += removidas
+        return removidas
+
+    def apply_delta(self, resultado) -> int:
+        """Aplica um `ResultadoDelta` da sincronização: produtos alterados ou removidos invalidam respostas"""
+        return self.invalidate([op['id_produto_loja_integrada'] for op in resultado.updates] + resultado.removidos)
+
+    def responder(self, pergunta: str, gerar: Callable[[str], Tuple[str, List[str]]]) -> str:
+        """Resposta do cache ou, se não houver, de `gerar(pergunta) -> (resposta, produtos citados)`"""
+        guardada = self.get(pergunta)
+        if guardada is not None:
+            return guardada['resposta']
+        inicio = time.perf_counter()
+        resposta, produtos = gerar(pergunta)
+        self.put(pergunta, resposta, produtos, time.perf_counter() - inicio)
+        return resposta
+
+    def estatisticas(self) -> Dict:
+        """Taxa de acerto, tempo economizado e latência média da consulta ao cache"""
+        with self.lock:
+            metricas = dict(self.metricas)
+            metricas['entradas'] = len(self.ids)
+        consultas = metricas['consultas']
+        metricas['taxa_acerto'] = round(metricas['acertos'] / consultas, 4) if consultas else 0.0
+        metricas['ms_por_consulta'] = round(metricas['segundos_consulta'] / consultas * 1000, 3) if consultas else 0.0
+        metricas['segundos_economizados'] = round(metricas['segundos_economizados'], 3)
+        del metricas['segundos_consulta']
+        return metricas
+
+    def close(self):
+        self.conn.close()
+
+def benchmark_cache(perguntas: int = 2000, custo_s: float = 0.8, semente: int = 0) -> Dict:
+    """Simula o tráfego do atendimento: poucas perguntas repetidas com variações de escrita"""
+    import random
+    import tempfile
+
+    modelos = ['Mavic 3', 'Mavic 3 Enterprise', 'Mini 4 Pro', 'Air 3', 'Avata 2', 'Matrice 350']
+    modelos_perguntas = ['tem o {} em estoque?', 'Qual o preço do {}?', 'qual é o preco do {}',
+                         'O {} tem garantia?', 'Tem o {} em estoque', 'quanto custa o {}?']
+    aleatorio = random.Random(semente)
+    with tempfile.TemporaryDirectory() as pasta:
+        cache = CacheRespostas(caminho=os.path.join(pasta, 'respostas.sqlite'), caminho_estado=None,
+                               nomes_produtos=modelos)
+        inicio = time.perf_counter()
+        for _ in range(perguntas):
+            modelo = aleatorio.choice(modelos)
+            pergunta = aleatorio.choice(modelos_perguntas).format(modelo)
+            cache.responder(pergunta, lambda p: (f"Resposta sobre {modelo}", [modelo]))
+        duracao = time.perf_counter() - inicio
+        estatisticas = cache.estatisticas()
+        cache.close()
+    # `custo_s` é o custo típico de busca + geração que cada acerto evita
+    estatisticas['segundos_economizados_estimados'] = round(estatisticas['acertos'] * custo_s, 1)
+    print(f"💬 {perguntas} perguntas em {duracao:.2f}s | {estatisticas['entradas']} respostas guardadas | "
+          f"taxa de acerto {estatisticas['taxa_acerto']:.1%} ({estatisticas['acertos_exatos']} exatos) | "
+          f"{estatisticas['ms_por_consulta']:.3f} ms/consulta | "
+          f"~{estatisticas['segundos_economizados_estimados']}s de busca+geração evitados")
+    return estatisticas
+
+if __name__ == "__main__":
+    benchmark_cache()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Divisão das descrições de produtos em chunks para o RAG
+
+Em vez de cortar a `descricao_produto` em 1000 caracteres, cada descrição limpa
+é dividida em trechos com orçamento de tokens e sobreposição entre trechos
+vizinhos. Cada chunk leva os metadados do produto (ID, SKU, preço). Tudo é
+feito com geradores: só a descrição do produto atual fica em memória.
+"""
+
+import json
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+
+_PALAVRAS = re.compile(r'\S+')
+
+# Campos do registro combinado copiados para cada chunk
+CAMPOS_METADADOS = ('id_produto_loja_integrada', 'sku', 'nome', 'url_produto', 'preco_cheio',
+                    'preco_promocional', 'ativo', 'sob_consulta')
+
+# Tokenizador: `texto -> [(início, fim), ...]`, um span por token
+Tokenizador = Callable[[str], List[Tuple[int, int]]]
+
+def tokenizar(texto: str) -> List[Tuple[int, int]]:
+    """Posições `(início, fim)` de cada palavra (sequência sem espaços)
+
+    Conta palavras, não tokens de modelo: um tokenizer BPE costuma gerar de 1,3
+    a 2 tokens por palavra em português. Para orçamentos exatos, passe em
+    `tokenizador` uma função com a mesma assinatura sobre o tokenizer do modelo
+    (offsets de cada token).
+    """
+    return [m.span() for m in _PALAVRAS.finditer(texto)]
+
+def dividir_texto(texto: str, max_tokens: int = 200, sobreposicao: int = 40,
+                  tokenizador: Tokenizador = tokenizar) -> Iterator[Tuple[str, int]]:
+    """Gera `(trecho, tokens)` com até `max_tokens` tokens e `sobreposicao` entre trechos
+
+    Sempre que possível o corte é feito em uma quebra de linha dentro do último
+    quarto da janela, para não separar um item de lista ou título do seu texto.
+    """
+    if sobreposicao >= max_tokens:
+        raise ValueError("sobreposicao deve ser menor que max_tokens")
+    spans = tokenizador(texto)
+    total = len(spans)
+    inicio = 0
+    while inicio < total:
+        fim = min(inicio + max_tokens, total)
+        if fim < total:
+            minimo = inicio + max(sobreposicao + 1, (max_tokens * 3) // 4)
+            for corte in range(fim - 1, minimo - 1, -1):
+                if '\n' in texto[spans[corte - 1][1]:spans[corte][0]]:
+                    fim = corte
+                    break
+        yield texto[spans[inicio][0]:spans[fim - 1][1]], fim - inicio
+        if fim >= total:
+            break
+        inicio = fim - sobreposicao
+
+def gerar_chunks(registros: Iterable[Dict], max_tokens: int = 200, sobreposicao: int = 40,
+                 campo_texto: str = 'descricao_produto', tokenizador: Tokenizador = tokenizar) -> Iterator[Dict]:
+    """Gera os chunks de todos os produtos, um de cada vez (`tokens` segundo `tokenizador`)"""
+    for registro in registros:
+        metadados = {campo: registro.get(campo) for campo in CAMPOS_METADADOS}
+        texto = registro.get(campo_texto) or registro.get('nome') or ''
+        for indice, (trecho, tokens) in enumerate(dividir_texto(texto, max_tokens, sobreposicao, tokenizador)):
+            chunk = dict(metadados)
+            chunk['id_chunk'] = f"{metadados['id_produto_loja_integrada']}-{indice}"
+            chunk['indice_chunk'] = indice
+            chunk['texto'] = trecho
+            chunk['tokens'] = tokens
+            yield chunk
+
+def benchmark_chunking(arquivo_produtos: str = 'Loja Integrada API - Produtos exemplo output api.json',
+                       repeticoes: int = 20, max_tokens: int = 200, sobreposicao: int = 40) -> Dict[str, float]:
+    """Mede chunks/s sobre a amostra (HTML já limpo, sem contar a limpeza)"""
+    from combinar_produtos import extrair_objetos, montar_registro
+
+    with open(arquivo_produtos, 'r', encoding='utf-8') as f:
+        registros = [montar_registro(produto, None) for produto in extrair_objetos(json.load(f))]
+
+    inicio = time.perf_counter()
+    chunks = tokens = 0
+    for _ in range(repeticoes):
+        for chunk in gerar_chunks(registros, max_tokens, sobreposicao):
+            chunks += 1
+            tokens += chunk['tokens']
+    duracao = time.perf_counter() - inicio
+
+    resultado = {
+        'produtos': len(registros),
+        'chunks_por_produto': chunks / repeticoes / max(1, len(registros)),
+        'chunks_por_segundo': chunks / duracao,
+        'tokens_por_segundo': tokens / duracao
+    }
+    print(f"🧩 {len(registros)} produtos, {chunks // repeticoes} chunks por passada "
+          f"({resultado['chunks_por_produto']:.1f} por produto, {max_tokens} tokens, sobreposição {sobreposicao})")
+    print(f"   {resultado['chunks_por_segundo']:,.0f} chunks/s | {resultado['tokens_por_segundo']:,.0f} tokens/s")
+    return resultado
+
+if __name__ == "__main__":
+    benchmark_chunking()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Camada HTTP compartilhada pelos clientes da Loja Integrada e do Baserow
+
+Cada host recebe uma única `requests.Session` com pool de conexões keep-alive,
+timeout padrão e retry automático com backoff exponencial, evitando um novo
+handshake TCP+TLS a cada chamada. Toda resposta é registrada nas métricas
+ativas (`metricas.py`): latência, status e retentativas.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from metricas import gancho_resposta
+
+TIMEOUT_PADRAO = 30
+POOL_PADRAO = 10
+STATUS_RETRY = (429, 500, 502, 503, 504)
+# Repetidos após 5xx ou erro de leitura: reenviar não muda o resultado (os PATCH do Baserow
+# gravam os mesmos valores). POST fica de fora: um 502 pode chegar depois das linhas criadas
+METODOS_IDEMPOTENTES = Retry.DEFAULT_ALLOWED_METHODS | {'PATCH'}
+
+class RetrySeguro(Retry):
+    """Retry que repete métodos não idempotentes (POST) apenas em 429
+
+    O 429 do rate limit é devolvido antes de o servidor processar o corpo, então
+    reenviar um POST de criação em lote não duplica linhas; 5xx e timeouts de
+    leitura de um POST chegam ao chamador.
+    """
+
+    def is_retry(self, method: str, status_code: int, has_retry_after: bool = False) -> bool:
+        if status_code == 429 and not self._is_method_retryable(method):
+            return bool(self.total) and status_code in (self.status_forcelist or ())
+        return super().is_retry(method, status_code, has_retry_after)
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter que aplica um timeout padrão quando a chamada não define um"""
+
+    def __init__(self, *args, timeout: float = TIMEOUT_PADRAO, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+def criar_sessao(pool_size: int = POOL_PADRAO, max_tentativas: int = 3, backoff: float = 0.5,
+                 timeout: float = TIMEOUT_PADRAO, headers: Optional[Dict[str, str]] = None,
+                 status_retry=STATUS_RETRY) -> requests.Session:
+    """Cria uma sessão com pool keep-alive, timeout padrão e retry com backoff
+
+    O retry cobre falhas de conexão e os status em `status_retry` (respeitando
+    Retry-After). Métodos não idempotentes como POST só são repetidos em 429
+    (`RetrySeguro`): reenviar um POST /batch/ depois de um 502 pode duplicar
+    linhas. Use `max_tentativas=0` quando o chamador já controla o retry.
+    """
+    retry = RetrySeguro(
+        total=max_tentativas,
+        backoff_factor=backoff,
+        status_forcelist=status_retry,
+        allowed_methods=METODOS_IDEMPOTENTES,
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = TimeoutHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                 max_retries=retry, timeout=timeout)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    if headers:
+        session.headers.update(headers)
+    session.hooks['response'].append(gancho_resposta)
+    return session
+
+_sessoes: Dict[Tuple[str, str], requests.Session] = {}
+_lock = threading.Lock()
+
+def obter_sessao(url: str, **kwargs) -> requests.Session:
+    """Retorna a sessão compartilhada do host de `url`, criando-a na primeira chamada
+
+    Os `kwargs` (ver `criar_sessao`) só têm efeito na criação; cabeçalhos de
+    autenticação devem ir em cada cliente, não na sessão compartilhada.
+    """
+    partes = urlsplit(url)
+    chave = (partes.scheme, partes.netloc)
+    with _lock:
+        sessao = _sessoes.get(chave)
+        if sessao is None:
+            sessao = _sessoes[chave] = criar_sessao(**kwargs)
+        return sessao
+
+def fechar_sessoes():
+    """Fecha todas as sessões compartilhadas (ex: ao fim de um processo de sync)"""
+    with _lock:
+        for sessao in _sessoes.values():
+            sessao.close()
+        _sessoes.clear()
+
+class _HandlerBenchmark(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Resposta em um único segmento TCP, sem o atraso de Nagle + delayed ACK
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        corpo = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+def benchmark_conexoes(total: int = 500) -> Dict[str, float]:
+    """Compara chamadas sequenciais com `requests.get` avulso e com sessão em pool"""
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _HandlerBenchmark)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_port}/"
+    resultados = {}
+    try:
+        inicio = time.perf_counter()
+        for _ in range(total):
+            requests.get(url, timeout=TIMEOUT_PADRAO)
+        resultados['sem_pool_ms'] = (time.perf_counter() - inicio) / total * 1000
+
+        sessao = criar_sessao()
+        inicio = time.perf_counter()
+        for _ in range(total):
+            sessao.get(url)
+        resultados['com_pool_ms'] = (time.perf_counter() - inicio) / total * 1000
+        sessao.close()
+    finally:
+        servidor.shutdown()
+
+    print(f"📡 {total} requisições sequenciais (servidor local, HTTP/1.1)")
+    print(f"   Sem pool: {resultados['sem_pool_ms']:.3f} ms/requisição")
+    print(f"   Com pool: {resultados['com_pool_ms']:.3f} ms/requisição")
+    print(f"   Economia: {resultados['sem_pool_ms'] - resultados['com_pool_ms']:.3f} ms/requisição")
+    return resultados
+
+if __name__ == "__main__":
+    benchmark_conexoes()
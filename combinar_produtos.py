@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Combinação de produtos e preços da Loja Integrada
+
+Substitui a busca linear do `encontrarPreco` (node "Combinar Produtos e Preços")
+por um índice em hash: cada URI de `produto` é interpretada uma única vez e a
+combinação é feita em uma só passada, em tempo O(produtos + preços).
+"""
+
+import json
+import random
+import time
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from limpeza_html import html_para_texto
+
+def extrair_id_recurso(resource_uri: Optional[str]) -> str:
+    """Extrai o ID final de uma URI de recurso (ex: /api/v1/produto/123 -> '123')"""
+    if not resource_uri:
+        return ''
+    return str(resource_uri).rstrip('/').rpartition('/')[2]
+
+def extrair_objetos(paginas: Iterable[Dict]) -> Iterator[Dict]:
+    """Percorre páginas da API (com ou sem o envelope `json` do n8n) e gera os objetos"""
+    for pagina in paginas or []:
+        dados = pagina.get('json', pagina)
+        objetos = dados.get('objects')
+        if isinstance(objetos, list):
+            yield from objetos
+
+def preco_valido(preco: Dict) -> bool:
+    """Replica o filtro do workflow: só conta preço com `cheio` maior que zero"""
+    try:
+        return float(preco.get('cheio') or 0) > 0
+    except (ValueError, TypeError):
+        return False
+
+def indexar_precos(precos: Iterable[Dict], apenas_validos: bool = True) -> Dict[str, Dict]:
+    """Monta o índice `id do produto -> preço` a partir da lista de preços"""
+    indice = {}
+    for preco in precos:
+        if apenas_validos and not preco_valido(preco):
+            continue
+        produto_id = extrair_id_recurso(preco.get('produto'))
+        if produto_id:
+            indice[produto_id] = preco
+    return indice
+
+_CENTAVOS = Decimal('0.01')
+
+def converter_preco(valor) -> Optional[Decimal]:
+    """Converte o preço da API ("19000.0000") em `Decimal` exato com 2 casas"""
+    if valor is None or valor == '':
+        return None
+    try:
+        numero = Decimal(str(valor))
+    except (InvalidOperation, ValueError):
+        return None
+    if not numero.is_finite():
+        return None
+    return numero.quantize(_CENTAVOS, rounding=ROUND_HALF_UP)
+
+def valor_decimal(valor) -> Optional[str]:
+    """Valor para os campos numéricos do Baserow ('19000.00'), ou `None` sem preço"""
+    numero = converter_preco(valor)
+    return str(numero) if numero is not None else None
+
+def formatar_preco(valor) -> str:
+    """Formata um valor como moeda brasileira (ex: 'R$ 19.000,00')"""
+    numero = converter_preco(valor) if valor else None
+    if numero is None:
+        return 'R$ 0,00'
+    return f"R$ {numero:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
+
+def _como_booleano(valor) -> bool:
+    return valor is True or valor == 'true' or valor == 1
+
+def montar_registro(produto: Dict, preco: Optional[Dict]) -> Dict:
+    """Monta o registro combinado no formato esperado pelo Baserow"""
+    descricao = produto.get('descricao_completa') or ''
+    return {
+        'id_produto_loja_integrada': str(produto.get('id', '')),
+        'nome': produto.get('nome') or '',
+        'titulo_produto': produto.get('nome') or '',
+        'apelido': produto.get('apelido') or '',
+        'sku': produto.get('sku') or '',
+        'descricao_completa': descricao,
+        'descricao_produto': html_para_texto(descricao),
+        'url_produto': produto.get('url') or '',
+        'url_video_youtube': produto.get('url_video_youtube') or '',
+        'gtin': produto.get('gtin') or '',
+        'mpn': produto.get('mpn') or '',
+        'ncm': produto.get('ncm') or '',
+        'id_externo': produto.get('id_externo') or '',
+        'ativo': _como_booleano(produto.get('ativo')),
+        'bloqueado': _como_booleano(produto.get('bloqueado')),
+        'removido': _como_booleano(produto.get('removido')),
+        'tipo': produto.get('tipo') or 'produto',
+        'preco_cheio': formatar_preco(preco.get('cheio')) if preco else 'R$ 0,00',
+        'preco_promocional': formatar_preco(preco.get('promocional')) if preco and preco.get('promocional') else '',
+        'preco_custo': formatar_preco(preco.get('custo')) if preco and preco.get('custo') else '',
+        'valor_cheio': valor_decimal(preco.get('cheio')) if preco else None,
+        'valor_promocional': valor_decimal(preco.get('promocional')) if preco else None,
+        'valor_custo': valor_decimal(preco.get('custo')) if preco else None,
+        'sob_consulta': preco.get('sob_consulta') is True if preco else False,
+        'fonte': 'loja_integrada'
+    }
+
+def combinar_produtos(produtos: Iterable[Dict], precos: Iterable[Dict],
+                      apenas_com_preco: bool = True) -> Iterator[Dict]:
+    """Combina produtos e preços em uma única passada usando o índice de preços"""
+    indice = indexar_precos(precos)
+    for produto in produtos:
+        preco = indice.get(str(produto.get('id', '')))
+        if preco is None and apenas_com_preco:
+            continue
+        yield montar_registro(produto, preco)
+
+def gerar_catalogo_sintetico(produtos_base: List[Dict], precos_base: List[Dict], total: int,
+                             semente: int = 42):
+    """Replica a amostra real até `total` SKUs com IDs únicos (preços embaralhados)"""
+    produtos, precos = [], []
+    for i in range(total):
+        base = produtos_base[i % len(produtos_base)]
+        preco_base = precos_base[i % len(precos_base)]
+        produto_id = 900000000 + i
+        produtos.append(dict(base, id=produto_id, sku=f"SKU{i:08d}"))
+        precos.append(dict(preco_base, produto=f"/api/v1/produto/{produto_id}"))
+    random.Random(semente).shuffle(precos)
+    return produtos, precos
+
+def benchmark_combinacao(arquivo_produtos: str = 'Loja Integrada API - Produtos exemplo output api.json',
+                         arquivo_precos: str = 'Loja Integrada API - Preços exemplo output api.json',
+                         tamanhos=(258, 1000, 10000, 100000)) -> List[Dict]:
+    """Mede o tempo de combinação para catálogos sintéticos de tamanhos crescentes"""
+    with open(arquivo_produtos, 'r', encoding='utf-8') as f:
+        produtos_base = list(extrair_objetos(json.load(f)))
+    with open(arquivo_precos, 'r', encoding='utf-8') as f:
+        precos_base = list(extrair_objetos(json.load(f)))
+
+    resultados = []
+    print(f"{'SKUs':>8} | {'tempo (ms)':>10} | {'µs/SKU':>7} | combinados")
+    print("-" * 45)
+    for tamanho in tamanhos:
+        produtos, precos = gerar_catalogo_sintetico(produtos_base, precos_base, tamanho)
+        inicio = time.perf_counter()
+        combinados = sum(1 for _ in combinar_produtos(produtos, precos))
+        duracao = time.perf_counter() - inicio
+        resultados.append({'skus': tamanho, 'segundos': duracao, 'combinados': combinados})
+        print(f"{tamanho:>8} | {duracao * 1000:>10.1f} | {duracao / tamanho * 1e6:>7.2f} | {combinados}")
+    return resultados
+
+if __name__ == "__main__":
+    print("⏱️ Benchmark da combinação produtos × preços")
+    print("=" * 45)
+    benchmark_combinacao()
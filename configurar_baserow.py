@@ -3,23 +3,78 @@
 Script para configurar Baserow e criar tabelas para produtos
 """
 
-import requests
+import argparse
 import json
-from typing import Dict, List, Optional
+import os
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from cliente_http import POOL_PADRAO, TIMEOUT_PADRAO, obter_sessao
+
+# Limite de linhas por requisição dos endpoints batch do Baserow
+TAMANHO_LOTE_BASEROW = 200
+
+# Cache local `tabela -> {nome do campo: id do campo}`
+ARQUIVO_CAMPOS = os.path.join('estado', 'campos_baserow.json')
+
+def dividir_em_lotes(itens: Iterable, tamanho: int = TAMANHO_LOTE_BASEROW) -> Iterable[List]:
+    """Divide uma sequência em listas de até `tamanho` itens"""
+    lote = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def mapear_para_baserow(registro: Dict, mapeamento: Dict[str, str]) -> Dict:
+    """Converte um registro combinado (snake_case) para os nomes de campo do Baserow"""
+    return {nome: registro[campo] for campo, nome in mapeamento.items() if campo in registro}
+
+def mapear_para_ids(registro: Dict, mapeamento: Dict[str, str], ids_campos: Dict[str, int]) -> Dict:
+    """Converte um registro combinado para o payload compacto `field_<id>` (user_field_names=false)"""
+    return {f"field_{ids_campos[nome]}": registro[campo]
+            for campo, nome in mapeamento.items() if campo in registro and nome in ids_campos}
+
+def carregar_cache_campos(table_id: int, caminho: str = ARQUIVO_CAMPOS) -> Optional[Dict[str, int]]:
+    """Mapa `nome -> id` salvo pelo último provisionamento da tabela, se houver"""
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f).get(str(table_id))
+
+def salvar_cache_campos(table_id: int, ids_campos: Dict[str, int], caminho: str = ARQUIVO_CAMPOS):
+    cache = {}
+    if os.path.exists(caminho):
+        with open(caminho, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    cache[str(table_id)] = ids_campos
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(temporario, caminho)
 
 class BaserowConfig:
-    def __init__(self, base_url: str, token: str):
+    def __init__(self, base_url: str, token: str, pool_size: int = POOL_PADRAO, max_tentativas: int = 3,
+                 timeout: float = TIMEOUT_PADRAO):
         self.base_url = base_url.rstrip('/')
         self.token = token
         self.headers = {
             "Authorization": f"Token {token}",
             "Content-Type": "application/json"
         }
+        self.timeout = timeout
+        # Sessão compartilhada por host: keep-alive, pool e retry com backoff (POST só em 429)
+        self.session = obter_sessao(self.base_url, pool_size=pool_size, max_tentativas=max_tentativas,
+                                    timeout=timeout)
     
     def test_connection(self) -> bool:
         """Testa a conexão com o Baserow"""
         try:
-            response = requests.get(f"{self.base_url}/api/user/", headers=self.headers)
+            response = self.session.get(f"{self.base_url}/api/user/", headers=self.headers)
             if response.status_code == 200:
                 user_data = response.json()
                 print(f"✅ Conectado ao Baserow como: {user_data.get('username', 'N/A')}")
@@ -34,7 +89,7 @@ class BaserowConfig:
     def list_workspaces(self) -> List[Dict]:
         """Lista os workspaces disponíveis"""
         try:
-            response = requests.get(f"{self.base_url}/api/workspaces/", headers=self.headers)
+            response = self.session.get(f"{self.base_url}/api/workspaces/", headers=self.headers)
             if response.status_code == 200:
                 workspaces = response.json()
                 print(f"\n📁 Workspaces encontrados: {len(workspaces)}")
@@ -51,7 +106,7 @@ class BaserowConfig:
     def list_databases(self, workspace_id: int) -> List[Dict]:
         """Lista as bases de dados em um workspace"""
         try:
-            response = requests.get(f"{self.base_url}/api/workspaces/{workspace_id}/applications/", headers=self.headers)
+            response = self.session.get(f"{self.base_url}/api/workspaces/{workspace_id}/applications/", headers=self.headers)
             if response.status_code == 200:
                 databases = response.json()
                 print(f"\n🗄️ Bases de dados no workspace {workspace_id}: {len(databases)}")
@@ -68,7 +123,7 @@ class BaserowConfig:
     def list_tables(self, database_id: int) -> List[Dict]:
         """Lista as tabelas em uma base de dados"""
         try:
-            response = requests.get(f"{self.base_url}/api/database/tables/database/{database_id}/", headers=self.headers)
+            response = self.session.get(f"{self.base_url}/api/database/tables/database/{database_id}/", headers=self.headers)
             if response.status_code == 200:
                 tables = response.json()
                 print(f"\n📋 Tabelas na base {database_id}: {len(tables)}")
@@ -89,7 +144,7 @@ class BaserowConfig:
                 "name": table_name,
                 "data": fields
             }
-            response = requests.post(f"{self.base_url}/api/database/tables/database/{database_id}/", 
+            response = self.session.post(f"{self.base_url}/api/database/tables/database/{database_id}/", 
                                    headers=self.headers, json=data)
             if response.status_code == 200:
                 table = response.json()
@@ -105,7 +160,7 @@ class BaserowConfig:
     def get_table_fields(self, table_id: int) -> List[Dict]:
         """Obtém os campos de uma tabela"""
         try:
-            response = requests.get(f"{self.base_url}/api/database/fields/table/{table_id}/", headers=self.headers)
+            response = self.session.get(f"{self.base_url}/api/database/fields/table/{table_id}/", headers=self.headers)
             if response.status_code == 200:
                 fields = response.json()
                 print(f"\n🔍 Campos da tabela {table_id}:")
@@ -119,6 +174,147 @@ class BaserowConfig:
             print(f"❌ Erro: {e}")
             return []
 
+    def list_fields(self, table_id: int) -> List[Dict]:
+        """Campos da tabela, sem imprimir; erros HTTP são levantados"""
+        response = self.session.get(f"{self.base_url}/api/database/fields/table/{table_id}/",
+                                    headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def create_field(self, table_id: int, field: Dict) -> Dict:
+        """Cria um campo na tabela a partir de uma definição de `criar_estrutura_produtos()`"""
+        response = self.session.post(f"{self.base_url}/api/database/fields/table/{table_id}/",
+                                     headers=self.headers, json=field, timeout=self.timeout)
+        if response.status_code >= 400:
+            print(f"❌ Erro ao criar campo '{field['name']}': {response.status_code} - {response.text}")
+            response.raise_for_status()
+        return response.json()
+
+    def provision_table(self, table_id: int, campos: Optional[List[Dict]] = None,
+                        cache: str = ARQUIVO_CAMPOS) -> Dict[str, int]:
+        """Cria os campos que faltam na tabela e salva o mapa `nome -> id` em cache
+
+        Idempotente: campos existentes (mesmo nome) não são alterados; se o tipo
+        divergir da estrutura esperada, só é emitido um aviso.
+        """
+        campos = campos if campos is not None else criar_estrutura_produtos()
+        existentes = {field["name"]: field for field in self.list_fields(table_id)}
+        criados = 0
+        for campo in campos:
+            atual = existentes.get(campo["name"])
+            if atual is None:
+                existentes[campo["name"]] = self.create_field(table_id, campo)
+                criados += 1
+                print(f"  ➕ Campo criado: {campo['name']} ({campo['type']})")
+            elif atual.get("type") != campo["type"]:
+                print(f"  ⚠️ Campo '{campo['name']}' é {atual.get('type')}, esperado {campo['type']}")
+        ids_campos = {nome: field["id"] for nome, field in existentes.items()}
+        salvar_cache_campos(table_id, ids_campos, cache)
+        print(f"✅ Tabela {table_id} provisionada: {criados} campos criados, {len(ids_campos)} no total")
+        return ids_campos
+
+    def field_ids(self, table_id: int, nomes: Iterable[str], cache: str = ARQUIVO_CAMPOS) -> Dict[str, int]:
+        """Mapa `nome -> id` do cache local; só consulta o Baserow se faltar algum campo"""
+        ids_campos = carregar_cache_campos(table_id, cache)
+        if ids_campos is None or any(nome not in ids_campos for nome in nomes):
+            ids_campos = self.provision_table(table_id, cache=cache)
+        return ids_campos
+
+    def iter_rows(self, table_id: int, page_size: int = TAMANHO_LOTE_BASEROW,
+                  user_field_names: bool = True, include: Optional[List[str]] = None) -> Iterator[Dict]:
+        """Percorre todas as linhas da tabela página a página, sem carregá-las de uma vez"""
+        url = f"{self.base_url}/api/database/rows/table/{table_id}/"
+        params = {"size": page_size, "page": 1}
+        if user_field_names:
+            params["user_field_names"] = "true"
+        if include:
+            params["include"] = ",".join(include)
+        while url:
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+            yield from data.get("results", [])
+            # `next` já traz todos os parâmetros da próxima página
+            url, params = data.get("next"), None
+
+    @staticmethod
+    def _indexar_produtos(rows: Iterable[Dict], campo_id: str) -> Dict[str, int]:
+        indice = {}
+        for row in rows:
+            produto_id = row.get(campo_id)
+            if produto_id in (None, ""):
+                continue
+            # Campos numéricos vêm como string decimal ("365654272" ou "365654272.0")
+            chave = str(produto_id)
+            if chave.endswith(".0"):
+                chave = chave[:-2]
+            indice[chave] = row["id"]
+        return indice
+
+    def build_product_index(self, table_id: int,
+                            campo_id: str = "ID Produto Loja Integrada") -> Dict[str, int]:
+        """Monta o índice `ID Produto Loja Integrada -> id da linha` lendo a tabela inteira"""
+        return self._indexar_produtos(self.iter_rows(table_id, include=[campo_id]), campo_id)
+
+    def find_product_rows(self, table_id: int, produto_ids: Iterable[str],
+                          campo_id: str = "ID Produto Loja Integrada", por_consulta: int = 100) -> Dict[str, int]:
+        """Como `build_product_index`, mas só para os produtos informados (filtro OR no servidor)"""
+        indice = {}
+        for lote in dividir_em_lotes(produto_ids, por_consulta):
+            filtros = {"filter_type": "OR",
+                       "filters": [{"type": "equal", "field": campo_id, "value": str(produto_id)}
+                                   for produto_id in lote]}
+            response = self.session.get(
+                f"{self.base_url}/api/database/rows/table/{table_id}/",
+                params={"user_field_names": "true", "include": campo_id, "size": por_consulta,
+                        "filters": json.dumps(filtros)},
+                headers=self.headers, timeout=self.timeout)
+            response.raise_for_status()
+            indice.update(self._indexar_produtos(response.json().get("results", []), campo_id))
+        return indice
+
+    def _send_batch(self, method: str, url: str, items: List) -> Dict:
+        """Envia um lote; 429 e falhas de conexão já são repetidos pela sessão com backoff
+
+        5xx só é repetido para PATCH: um POST de criação que falha com 502/504 pode
+        ter gravado as linhas, então o erro sobe em vez de reenviar o lote.
+        """
+        response = self.session.request(method, url, json={"items": items}, headers=self.headers,
+                                        timeout=self.timeout)
+        if response.status_code >= 400:
+            print(f"❌ Lote de {len(items)} itens falhou: {response.status_code} - {response.text}")
+            response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def batch_create_rows(self, table_id: int, rows: Iterable[Dict], user_field_names: bool = True) -> List[Dict]:
+        """Cria linhas em lotes de até 200 via `/batch/`; retorna as linhas criadas"""
+        url = f"{self.base_url}/api/database/rows/table/{table_id}/batch/"
+        if user_field_names:
+            url += "?user_field_names=true"
+        criadas = []
+        for lote in dividir_em_lotes(rows):
+            criadas.extend(self._send_batch("POST", url, lote).get("items", []))
+        return criadas
+
+    def batch_update_rows(self, table_id: int, rows: Iterable[Dict], user_field_names: bool = True) -> List[Dict]:
+        """Atualiza linhas (cada uma com a chave `id`) em lotes de até 200 via `/batch/`"""
+        url = f"{self.base_url}/api/database/rows/table/{table_id}/batch/"
+        if user_field_names:
+            url += "?user_field_names=true"
+        atualizadas = []
+        for lote in dividir_em_lotes(rows):
+            atualizadas.extend(self._send_batch("PATCH", url, lote).get("items", []))
+        return atualizadas
+
+    def batch_delete_rows(self, table_id: int, row_ids: Iterable[int]) -> int:
+        """Remove linhas em lotes de até 200 via `/batch-delete/`; retorna o total removido"""
+        url = f"{self.base_url}/api/database/rows/table/{table_id}/batch-delete/"
+        removidas = 0
+        for lote in dividir_em_lotes(int(row_id) for row_id in row_ids):
+            self._send_batch("POST", url, lote)
+            removidas += len(lote)
+        return removidas
+
 def criar_estrutura_produtos():
     """Define a estrutura de campos para a tabela de produtos"""
     return [
@@ -204,10 +400,45 @@ def criar_estrutura_produtos():
             "name": "Preço Custo",
             "type": "text"
         },
+        {
+            "name": "Valor Cheio",
+            "type": "number",
+            "number_decimal_places": 2
+        },
+        {
+            "name": "Valor Promocional",
+            "type": "number",
+            "number_decimal_places": 2
+        },
+        {
+            "name": "Valor Custo",
+            "type": "number",
+            "number_decimal_places": 2
+        },
         {
             "name": "Sob Consulta",
             "type": "boolean"
         },
+        {
+            "name": "Categorias",
+            "type": "text"
+        },
+        {
+            "name": "IDs Categorias",
+            "type": "text"
+        },
+        {
+            "name": "SEO Título",
+            "type": "text"
+        },
+        {
+            "name": "SEO Descrição",
+            "type": "long_text"
+        },
+        {
+            "name": "Variações",
+            "type": "long_text"
+        },
         {
             "name": "Data Sincronização",
             "type": "date"
@@ -309,5 +540,22 @@ def main():
         print(f"  - Table ID: {tabela_produtos['id']}")
         print(f"  - Database ID: {database_id}")
 
+def provisionar(argv: Optional[List[str]] = None):
+    """Provisionamento não interativo a partir do `config_baserow.json`"""
+    parser = argparse.ArgumentParser(description="Configura a tabela de produtos no Baserow")
+    parser.add_argument('--provisionar', action='store_true',
+                        help="Cria os campos que faltam na tabela de produtos (sem perguntas)")
+    parser.add_argument('--config', default='config_baserow.json')
+    parser.add_argument('--cache', default=ARQUIVO_CAMPOS, help="Arquivo do mapa nome -> id dos campos")
+    args = parser.parse_args(argv)
+    if not args.provisionar:
+        main()
+        return None
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        config = json.load(f)['baserow']
+    baserow = BaserowConfig(config['url'], config['token'])
+    return baserow.provision_table(int(config['tables']['produtos']['id']), cache=args.cache)
+
 if __name__ == "__main__":
-    main()
+    provisionar()
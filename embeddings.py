@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Geração de embeddings com cache por hash do conteúdo
+
+Roda depois da combinação de produtos e preços (`sync.py --embeddings`, uma
+página por vez em uma thread própria). O texto que vai para o embedder é
+normalizado e identificado pelo seu SHA-256; vetores já calculados ficam em um
+cache SQLite local com despejo LRU, e só os produtos cujo texto mudou são
+enviados ao embedder, em lotes.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+ARQUIVO_CACHE = os.path.join('estado', 'embeddings.sqlite')
+
+_ESPACOS = re.compile(r'\s+')
+_TOKENS = re.compile(r'\w+', re.UNICODE)
+
+def normalizar_texto(texto: str) -> str:
+    """Normalização usada antes do hash e do embedding (NFC, minúsculas, espaços)"""
+    texto = unicodedata.normalize('NFC', texto or '')
+    return _ESPACOS.sub(' ', texto).strip().lower()
+
+def texto_para_embedding(registro: Dict) -> str:
+    """Texto de um produto combinado que é convertido em vetor"""
+    partes = [
+        registro.get('nome') or '',
+        f"SKU: {registro['sku']}" if registro.get('sku') else '',
+        registro.get('descricao_produto') or ''
+    ]
+    return normalizar_texto('\n'.join(parte for parte in partes if parte))
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode('utf-8')).hexdigest()
+
+class EmbedderHash:
+    """Embedder local e determinístico (hashing trick sobre palavras e trigramas)
+
+    Não substitui um modelo semântico, mas permite rodar e testar o pipeline
+    offline: textos iguais geram vetores iguais e textos parecidos, vetores próximos.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.nome = f"hash-{dim}"
+
+    def _indices(self, texto: str) -> Iterable[bytes]:
+        for palavra in _TOKENS.findall(texto):
+            yield palavra.encode('utf-8')
+            marcada = f"#{palavra}#"
+            for i in range(len(marcada) - 2):
+                yield marcada[i:i + 3].encode('utf-8')
+
+    def embed(self, textos: Sequence[str]) -> np.ndarray:
+        vetores = np.zeros((len(textos), self.dim), dtype=np.float32)
+        for linha, texto in enumerate(textos):
+            for token in self._indices(texto):
+                digest = int.from_bytes(hashlib.blake2b(token, digest_size=8).digest(), 'little')
+                vetores[linha, digest % self.dim] += 1.0 if (digest >> 63) else -1.0
+        normas = np.linalg.norm(vetores, axis=1, keepdims=True)
+        normas[normas == 0] = 1.0
+        return vetores / normas
+
+class CacheEmbeddings:
+    """Cache `(modelo, hash do texto) -> vetor` em SQLite com despejo LRU"""
+
+    def __init__(self, caminho: str = ARQUIVO_CACHE, max_itens: int = 200000):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.max_itens = max_itens
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " modelo TEXT NOT NULL, chave TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vetor BLOB NOT NULL, acessado_em REAL NOT NULL,"
+            " PRIMARY KEY (modelo, chave))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_acesso ON embeddings (acessado_em)")
+
+    def get_many(self, modelo: str, chaves: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Busca vetores em cache e renova o horário de acesso dos encontrados"""
+        encontrados = {}
+        agora = time.time()
+        # Limite de variáveis por consulta do SQLite
+        for inicio in range(0, len(chaves), 500):
+            parte = list(chaves[inicio:inicio + 500])
+            marcadores = ','.join('?' * len(parte))
+            for chave, dim, vetor in self.conn.execute(
+                    f"SELECT chave, dim, vetor FROM embeddings WHERE modelo = ? AND chave IN ({marcadores})",
+                    [modelo] + parte):
+                encontrados[chave] = np.frombuffer(vetor, dtype=np.float32, count=dim)
+            self.conn.execute(
+                f"UPDATE embeddings SET acessado_em = ? WHERE modelo = ? AND chave IN ({marcadores})",
+                [agora, modelo] + parte)
+        self.conn.commit()
+        return encontrados
+
+    def put_many(self, modelo: str, itens: Dict[str, np.ndarray]):
+        agora = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (modelo, chave, dim, vetor, acessado_em) VALUES (?, ?, ?, ?, ?)",
+            [(modelo, chave, len(vetor), np.asarray(vetor, dtype=np.float32).tobytes(), agora)
+             for chave, vetor in itens.items()])
+        self.conn.commit()
+        self.evict()
+
+    def evict(self) -> int:
+        """Remove os itens acessados há mais tempo quando o cache passa de `max_itens`"""
+        total = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excesso = total - self.max_itens
+        if excesso <= 0:
+            return 0
+        self.conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN "
+            "(SELECT rowid FROM embeddings ORDER BY acessado_em LIMIT ?)", (excesso,))
+        self.conn.commit()
+        return excesso
+
+    def close(self):
+        self.conn.close()
+
+@dataclass
+class ResultadoEmbeddings:
+    ids: List[str] = field(default_factory=list)
+    vetores: Optional[np.ndarray] = None
+    chaves: List[str] = field(default_factory=list)
+    reaproveitados: int = 0
+    gerados: int = 0
+
+def gerar_embeddings(registros: Iterable[Dict], embedder, cache: CacheEmbeddings,
+                     tamanho_lote: int = 64) -> ResultadoEmbeddings:
+    """Retorna um vetor por produto, embedando só os textos ausentes do cache
+
+    `embedder` é qualquer objeto com `nome`, `dim` e `embed(textos) -> np.ndarray`.
+    """
+    resultado = ResultadoEmbeddings()
+    textos: Dict[str, str] = {}
+    for registro in registros:
+        texto = texto_para_embedding(registro)
+        chave = hash_texto(texto)
+        resultado.ids.append(str(registro.get('id_produto_loja_integrada', '')))
+        resultado.chaves.append(chave)
+        textos[chave] = texto
+
+    vetores = cache.get_many(embedder.nome, list(textos))
+    faltando = [chave for chave in textos if chave not in vetores]
+    for inicio in range(0, len(faltando), tamanho_lote):
+        lote = faltando[inicio:inicio + tamanho_lote]
+        novos = dict(zip(lote, embedder.embed([textos[chave] for chave in lote])))
+        cache.put_many(embedder.nome, novos)
+        vetores.update(novos)
+
+    resultado.gerados = len(faltando)
+    resultado.reaproveitados = len(textos) - len(faltando)
+    resultado.vetores = (np.stack([vetores[chave] for chave in resultado.chaves])
+                         if resultado.chaves else np.zeros((0, embedder.dim), dtype=np.float32))
+    return resultado
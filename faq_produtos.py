@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+"""
+Geração de FAQ por produto ("30 perguntas e respostas") em lotes, com cache
+
+Feito de forma ingênua seriam 258+ chamadas ao modelo a cada execução. Aqui
+vários produtos vão em cada chamada, as chamadas rodam com concorrência
+limitada e o resultado fica em um cache SQLite indexado pelo hash do que
+influencia o FAQ (nome, descrição limpa, preços, número de perguntas e versão
+do prompt): só produtos cujas entradas mudaram voltam ao modelo.
+
+O modelo é qualquer objeto com `nome` e `completar(prompt) -> str`;
+`ModeloFAQLocal` roda offline e `ModeloOpenAI` usa a API de chat da OpenAI.
+
+Em produção a etapa roda dentro da sincronização (`sync.py --faq local|openai`),
+com os produtos criados ou alterados de cada página combinada. Este script
+gera o FAQ de dumps salvos, para testar prompt e modelo.
+
+Uso:
+    python faq_produtos.py [--modelo local|openai] [--por-chamada 4] [--workers 4]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence
+
+from cliente_http import obter_sessao
+
+ARQUIVO_CACHE = os.path.join('estado', 'faq.sqlite')
+PERGUNTAS_POR_PRODUTO = 30
+# Mude ao alterar o prompt: invalida o cache inteiro
+VERSAO_PROMPT = 1
+# Descrições longas são cortadas no prompt (o hash usa o texto inteiro)
+MAX_CARACTERES_DESCRICAO = 2000
+
+_INICIO_DADOS = '<produtos>'
+_FIM_DADOS = '</produtos>'
+_FRASES = re.compile(r'[^.!?\n]+[.!?]?')
+
+def entradas_faq(registro: Dict) -> Dict:
+    """Campos do registro combinado que influenciam o FAQ"""
+    return {
+        'id': str(registro.get('id_produto_loja_integrada', '')),
+        'nome': (registro.get('nome') or '').strip(),
+        'sku': registro.get('sku') or '',
+        'descricao': (registro.get('descricao_produto') or '').strip(),
+        'preco': registro.get('preco_cheio') or '',
+        'preco_promocional': registro.get('preco_promocional') or '',
+        'sob_consulta': bool(registro.get('sob_consulta'))
+    }
+
+def hash_entradas(entradas: Dict, perguntas: int = PERGUNTAS_POR_PRODUTO) -> str:
+    conteudo = json.dumps([VERSAO_PROMPT, perguntas, entradas], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def montar_prompt(lote: Sequence[Dict], perguntas: int = PERGUNTAS_POR_PRODUTO) -> str:
+    """Prompt de uma chamada com vários produtos; a resposta esperada é um único JSON"""
+    produtos = [dict(entradas, descricao=entradas['descricao'][:MAX_CARACTERES_DESCRICAO]) for entradas in lote]
+    dados = json.dumps({'perguntas_por_produto': perguntas, 'produtos': produtos}, ensure_ascii=False)
+    return (
+        "Você escreve o FAQ de uma loja online. Para cada produto abaixo, gere exatamente "
+        f"{perguntas} perguntas que um cliente faria, com respostas curtas baseadas só nos dados "
+        "informados (nome, SKU, descrição e preço). Não invente especificações.\n"
+        'Responda apenas com JSON no formato {"faqs": [{"id": "<id do produto>", '
+        '"perguntas": [{"pergunta": "...", "resposta": "..."}]}]}.\n'
+        f"{_INICIO_DADOS}{dados}{_FIM_DADOS}"
+    )
+
+def interpretar_resposta(texto: str, ids: Iterable[str]) -> Dict[str, List[Dict]]:
+    """Extrai `id -> perguntas` da resposta; ids ausentes ou sem perguntas válidas ficam de fora"""
+    esperados = set(ids)
+    inicio, fim = texto.find('{'), texto.rfind('}')
+    try:
+        dados = json.loads(texto[inicio:fim + 1]) if inicio >= 0 else {}
+    except ValueError:
+        return {}
+    itens = dados.get('faqs') if isinstance(dados, dict) else None
+    faqs = {}
+    for item in itens or []:
+        produto_id = str(item.get('id', '')) if isinstance(item, dict) else ''
+        if produto_id not in esperados:
+            continue
+        perguntas = [{'pergunta': str(par['pergunta']).strip(), 'resposta': str(par['resposta']).strip()}
+                     for par in item.get('perguntas') or []
+                     if isinstance(par, dict) and par.get('pergunta') and par.get('resposta')]
+        if perguntas:
+            faqs[produto_id] = perguntas
+    return faqs
+
+class ModeloFAQLocal:
+    """Modelo local e determinístico: monta perguntas a partir dos dados do prompt
+
+    Não substitui um LLM, mas percorre o mesmo caminho (prompt em lote → JSON →
+    interpretação), o que permite rodar e testar a etapa offline.
+    """
+
+    def __init__(self):
+        self.nome = 'local-faq'
+        self.chamadas = 0
+
+    def _perguntas(self, produto: Dict, total: int) -> List[Dict]:
+        nome = produto['nome'] or 'este produto'
+        if produto['sob_consulta']:
+            preco = "O preço é sob consulta."
+        elif produto['preco_promocional']:
+            preco = f"Sai por {produto['preco_promocional']} na promoção (preço cheio {produto['preco']})."
+        else:
+            preco = f"Custa {produto['preco']}."
+        # Frases da descrição, sem o título que costuma abri-la
+        frases = [frase.strip() for frase in _FRASES.findall(produto['descricao'])
+                  if len(frase.strip()) > 20 and frase.strip() != nome]
+        pares = [
+            (f"Quanto custa {nome}?", preco),
+            (f"Qual é o SKU de {nome}?", f"O SKU é {produto['sku']}." if produto['sku'] else "Não há SKU informado."),
+            (f"O que é {nome}?", frases[0] if frases else nome),
+        ]
+        for i, frase in enumerate(frases[1:]):
+            pares.append((f"O que a descrição de {nome} diz sobre o item {i + 1}?", frase))
+        while len(pares) < total:
+            pares.append((f"Mais detalhes sobre {nome} ({len(pares) + 1})?",
+                           "Consulte a descrição completa na página do produto."))
+        return [{'pergunta': pergunta, 'resposta': resposta} for pergunta, resposta in pares[:total]]
+
+    def completar(self, prompt: str) -> str:
+        self.chamadas += 1
+        inicio = prompt.index(_INICIO_DADOS) + len(_INICIO_DADOS)
+        dados = json.loads(prompt[inicio:prompt.index(_FIM_DADOS, inicio)])
+        return json.dumps({'faqs': [{'id': produto['id'],
+                                     'perguntas': self._perguntas(produto, dados['perguntas_por_produto'])}
+                                    for produto in dados['produtos']]}, ensure_ascii=False)
+
+class ModeloOpenAI:
+    """Chat Completions da OpenAI (ou compatível) com resposta em JSON"""
+
+    def __init__(self, api_key: str, modelo: str = 'gpt-4o-mini', url: str = 'https://api.openai.com/v1',
+                 timeout: float = 120):
+        self.url = url.rstrip('/')
+        self.nome = modelo
+        self.headers = {'Authorization': f"Bearer {api_key}", 'Content-Type': 'application/json'}
+        self.timeout = timeout
+        self.session = obter_sessao(self.url)
+        self.chamadas = 0
+
+    def completar(self, prompt: str) -> str:
+        self.chamadas += 1
+        response = self.session.post(f"{self.url}/chat/completions", headers=self.headers, timeout=self.timeout,
+                                     json={'model': self.nome, 'temperature': 0.2,
+                                           'response_format': {'type': 'json_object'},
+                                           'messages': [{'role': 'user', 'content': prompt}]})
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+MODELOS = ('local', 'openai')
+
+def criar_modelo(nome: str):
+    """Modelo de `MODELOS` pelo nome; o da OpenAI lê a chave de `OPENAI_API_KEY`"""
+    if nome == 'openai':
+        return ModeloOpenAI(os.environ['OPENAI_API_KEY'])
+    return ModeloFAQLocal()
+
+class CacheFAQ:
+    """Cache `(modelo, hash das entradas) -> perguntas` em SQLite
+
+    Guarda só o FAQ mais recente de cada produto: ao gravar um novo, o antigo
+    (de entradas que já mudaram) é removido.
+    """
+
+    def __init__(self, caminho: str = ARQUIVO_CACHE):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS faq ("
+            " modelo TEXT NOT NULL, chave TEXT NOT NULL, produto_id TEXT NOT NULL,"
+            " perguntas TEXT NOT NULL, gerado_em REAL NOT NULL,"
+            " PRIMARY KEY (modelo, chave))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_faq_produto ON faq (modelo, produto_id)")
+
+    def get_many(self, modelo: str, chaves: Sequence[str]) -> Dict[str, List[Dict]]:
+        encontrados = {}
+        for inicio in range(0, len(chaves), 500):
+            parte = list(chaves[inicio:inicio + 500])
+            marcadores = ','.join('?' * len(parte))
+            for chave, perguntas in self.conn.execute(
+                    f"SELECT chave, perguntas FROM faq WHERE modelo = ? AND chave IN ({marcadores})",
+                    [modelo] + parte):
+                encontrados[chave] = json.loads(perguntas)
+        return encontrados
+
+    def put_many(self, modelo: str, itens: Dict[str, Dict]):
+        """`itens` é `chave -> {'produto_id', 'perguntas'}`"""
+        agora = time.time()
+        with self.conn:
+            for chave, item in itens.items():
+                self.conn.execute("DELETE FROM faq WHERE modelo = ? AND produto_id = ? AND chave != ?",
+                                  (modelo, item['produto_id'], chave))
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO faq (modelo, chave, produto_id, perguntas, gerado_em) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (modelo, chave, item['produto_id'], json.dumps(item['perguntas'], ensure_ascii=False), agora))
+
+    def remove(self, produto_ids: Iterable[str]) -> int:
+        """Apaga o FAQ (de todos os modelos) dos produtos; retorna quantas entradas"""
+        with self.conn:
+            return sum(self.conn.execute("DELETE FROM faq WHERE produto_id = ?", (str(produto_id),)).rowcount
+                       for produto_id in produto_ids)
+
+    def apply_delta(self, resultado) -> int:
+        """Aplica um `ResultadoDelta`: produtos removidos perdem o FAQ (alterados são refeitos pelo hash)"""
+        return self.remove(resultado.removidos)
+
+    def close(self):
+        self.conn.close()
+
+@dataclass
+class ResultadoFAQ:
+    faqs: Dict[str, List[Dict]] = field(default_factory=dict)
+    reaproveitados: int = 0
+    gerados: int = 0
+    chamadas: int = 0
+    falhas: List[str] = field(default_factory=list)
+
+def _chamar(modelo, lote: List[Dict], perguntas: int) -> Dict[str, List[Dict]]:
+    """Uma chamada ao modelo; erros de rede ou JSON inválido viram resposta vazia"""
+    try:
+        texto = modelo.completar(montar_prompt(lote, perguntas))
+    except Exception as e:
+        print(f"⚠️ Chamada ao modelo falhou ({len(lote)} produtos): {e}")
+        return {}
+    return interpretar_resposta(texto, (entradas['id'] for entradas in lote))
+
+def gerar_faq(registros: Iterable[Dict], modelo, cache: CacheFAQ, produtos_por_chamada: int = 4,
+              max_workers: int = 4, perguntas: int = PERGUNTAS_POR_PRODUTO) -> ResultadoFAQ:
+    """FAQ de cada produto combinado, chamando o modelo só para entradas novas ou alteradas
+
+    Os produtos faltando vão ao modelo em lotes de `produtos_por_chamada`, com até
+    `max_workers` chamadas simultâneas. Os que uma resposta em lote não trouxer
+    são tentados mais uma vez, sozinhos; se falharem de novo ficam em `falhas`.
+    """
+    resultado = ResultadoFAQ()
+    pendentes: Dict[str, Dict] = {}
+    chaves: Dict[str, str] = {}
+    for registro in registros:
+        entradas = entradas_faq(registro)
+        if not entradas['id'] or entradas['id'] in chaves:
+            continue
+        chave = chaves[entradas['id']] = hash_entradas(entradas, perguntas)
+        pendentes[chave] = entradas
+
+    em_cache = cache.get_many(modelo.nome, list(pendentes))
+    for chave in em_cache:
+        pendentes.pop(chave)
+    resultado.reaproveitados = len(em_cache)
+
+    entradas = list(pendentes.values())
+    lotes = [entradas[inicio:inicio + produtos_por_chamada] for inicio in range(0, len(entradas), produtos_por_chamada)]
+    por_id = {entrada['id']: chave for chave, entrada in pendentes.items()}
+    gerados: Dict[str, List[Dict]] = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for tentativa in range(2):
+            resultado.chamadas += len(lotes)
+            for lote, faqs in zip(lotes, executor.map(lambda lote: _chamar(modelo, lote, perguntas), lotes)):
+                # O cache é gravado nesta thread; a conexão SQLite não é compartilhada
+                cache.put_many(modelo.nome, {por_id[produto_id]: {'produto_id': produto_id, 'perguntas': faq}
+                                             for produto_id, faq in faqs.items()})
+                gerados.update(faqs)
+            faltando = [entrada for entrada in entradas if entrada['id'] not in gerados]
+            if not faltando or produtos_por_chamada == 1:
+                break
+            # Segunda tentativa: um produto por chamada
+            lotes = [[entrada] for entrada in faltando]
+
+    resultado.gerados = len(gerados)
+    resultado.falhas = [entrada['id'] for entrada in entradas if entrada['id'] not in gerados]
+    for produto_id, chave in chaves.items():
+        faq = em_cache.get(chave) or gerados.get(produto_id)
+        if faq is not None:
+            resultado.faqs[produto_id] = faq
+    return resultado
+
+def main(argv=None):
+    from combinar_produtos import combinar_produtos
+    from leitura_streaming import ler_dump
+
+    parser = argparse.ArgumentParser(description="Gera o FAQ dos produtos em lotes, com cache")
+    parser.add_argument('--produtos', default='Loja Integrada API - Produtos exemplo output api.json')
+    parser.add_argument('--precos', default='Loja Integrada API - Preços exemplo output api.json')
+    parser.add_argument('--modelo', choices=MODELOS, default='local')
+    parser.add_argument('--por-chamada', type=int, default=4, help="Produtos por chamada ao modelo")
+    parser.add_argument('--workers', type=int, default=4, help="Chamadas simultâneas")
+    parser.add_argument('--perguntas', type=int, default=PERGUNTAS_POR_PRODUTO)
+    parser.add_argument('--cache', default=ARQUIVO_CACHE)
+    parser.add_argument('--saida', help="Grava `id -> perguntas` em JSON")
+    args = parser.parse_args(argv)
+
+    modelo = criar_modelo(args.modelo)
+    cache = CacheFAQ(args.cache)
+    registros = combinar_produtos(ler_dump(args.produtos), ler_dump(args.precos), apenas_com_preco=False)
+    inicio = time.perf_counter()
+    resultado = gerar_faq(registros, modelo, cache, args.por_chamada, args.workers, args.perguntas)
+    cache.close()
+    print(f"❓ FAQ: {len(resultado.faqs)} produtos | {resultado.reaproveitados} do cache | "
+          f"{resultado.gerados} gerados em {resultado.chamadas} chamadas | {len(resultado.falhas)} falhas | "
+          f"{time.perf_counter() - inicio:.2f}s")
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado.faqs, f, ensure_ascii=False, indent=2)
+    return resultado
+
+if __name__ == "__main__":
+    main()
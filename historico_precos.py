@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Histórico colunar dos snapshots de preços
+
+Cada sincronização sobrescreve `preco_cheio`/`preco_promocional` no Baserow,
+então não havia histórico, e qualquer pergunta sobre o catálogo inteiro exigia
+varrer a tabela pela API. Aqui o snapshot combinado de cada execução é anexado
+a arquivos de coluna (um `.bin` por campo, preços em centavos inteiros) com o
+id do produto e o instante da execução. A leitura usa memory-map, de forma que
+"preços alterados nos últimos 30 dias" ou "produtos que saíram de promoção" são
+operações vetorizadas do NumPy sobre milhões de linhas.
+
+Execuções parciais (agendador) gravam só os produtos que mudaram; o estado em
+um instante é a última linha de cada produto desde a última execução completa.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from combinar_produtos import converter_preco
+
+PASTA_HISTORICO = os.path.join('estado', 'historico')
+
+# Preço ausente (produto sem preço promocional, custo não informado)
+SEM_PRECO = -1
+
+COLUNAS = {
+    'id': np.int64,
+    'execucao': np.int64,
+    'cheio': np.int64,
+    'promocional': np.int64,
+    'custo': np.int64,
+    'ativo': np.bool_,
+    'sob_consulta': np.bool_
+}
+
+def _centavos(valor) -> int:
+    numero = converter_preco(valor)
+    return int(numero * 100) if numero is not None else SEM_PRECO
+
+def preco_efetivo(cheio: np.ndarray, promocional: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de `indice_precos.preco_efetivo`, em centavos"""
+    return np.where(em_promocao(cheio, promocional), promocional, cheio)
+
+def em_promocao(cheio: np.ndarray, promocional: np.ndarray) -> np.ndarray:
+    """Promocional positivo e menor que o cheio (ou sem preço cheio)"""
+    return (promocional > 0) & ((cheio == SEM_PRECO) | (promocional < cheio))
+
+class GravacaoHistorico:
+    """Snapshot de uma execução sendo montado página a página; só aparece no histórico após `commit`
+
+    Guarda apenas as colunas numéricas, não os registros, para não acumular o
+    catálogo em memória.
+    """
+
+    def __init__(self, historico: 'HistoricoPrecos', execucao: int, completa: bool):
+        self.historico = historico
+        self.execucao = execucao
+        self.completa = completa
+        self.colunas: Dict[str, List] = {nome: [] for nome in COLUNAS if nome != 'execucao'}
+
+    def __len__(self):
+        return len(self.colunas['id'])
+
+    def add(self, registros: Iterable[Dict]):
+        for registro in registros:
+            produto_id = str(registro.get('id_produto_loja_integrada', ''))
+            if not produto_id.isdigit():
+                continue
+            self.colunas['id'].append(int(produto_id))
+            self.colunas['cheio'].append(_centavos(registro.get('valor_cheio')))
+            self.colunas['promocional'].append(_centavos(registro.get('valor_promocional')))
+            self.colunas['custo'].append(_centavos(registro.get('valor_custo')))
+            self.colunas['ativo'].append(registro.get('ativo') is not False)
+            self.colunas['sob_consulta'].append(registro.get('sob_consulta') is True)
+
+    def commit(self) -> int:
+        """Anexa o snapshot ao histórico; retorna o número de linhas gravadas"""
+        ids = np.asarray(self.colunas['id'], dtype=np.int64)
+        # Ordenado por id e sem duplicatas (retomadas podem repetir páginas): a última ocorrência vale
+        _, ultimas = np.unique(ids[::-1], return_index=True)
+        ordem = len(ids) - 1 - ultimas
+        colunas = {nome: np.asarray(valores, dtype=COLUNAS[nome])[ordem] for nome, valores in self.colunas.items()}
+        colunas['execucao'] = np.full(len(ordem), self.execucao, dtype=np.int64)
+        self.historico._anexar(colunas, self.execucao, self.completa)
+        self.colunas = {nome: [] for nome in self.colunas}
+        return len(ordem)
+
+class HistoricoPrecos:
+    """Arquivos de coluna só de anexação, lidos via memory-map
+
+    `meta.json` guarda o total de linhas e a lista de execuções
+    `[instante, primeira linha, linhas, completa]`; ele é gravado por último,
+    então uma gravação interrompida deixa só bytes órfãos no fim das colunas,
+    que são descartados na próxima.
+    """
+
+    def __init__(self, pasta: str = PASTA_HISTORICO):
+        self.pasta = pasta
+        self.meta = {'total': 0, 'execucoes': []}
+        self._colunas: Dict[str, np.ndarray] = {}
+        self._carregar()
+
+    def _arquivo(self, nome: str) -> str:
+        return os.path.join(self.pasta, f"{nome}.bin")
+
+    def _carregar(self):
+        caminho = os.path.join(self.pasta, 'meta.json')
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        self._colunas = {}
+
+    def __len__(self):
+        return self.meta['total']
+
+    @property
+    def execucoes(self) -> List[List]:
+        return self.meta['execucoes']
+
+    def coluna(self, nome: str) -> np.ndarray:
+        """Coluna inteira via memory-map (aberta na primeira consulta)"""
+        if nome not in self._colunas:
+            total = self.meta['total']
+            self._colunas[nome] = (np.memmap(self._arquivo(nome), dtype=COLUNAS[nome], mode='r', shape=(total,))
+                                   if total else np.zeros(0, dtype=COLUNAS[nome]))
+        return self._colunas[nome]
+
+    def begin(self, execucao: Optional[float] = None, completa: bool = True) -> GravacaoHistorico:
+        """Inicia o snapshot de uma execução (`execucao` em segundos Unix; padrão: agora)"""
+        return GravacaoHistorico(self, int(execucao if execucao is not None else time.time()), completa)
+
+    def append(self, registros: Iterable[Dict], execucao: Optional[float] = None, completa: bool = True) -> int:
+        gravacao = self.begin(execucao, completa)
+        gravacao.add(registros)
+        return gravacao.commit()
+
+    def _anexar(self, colunas: Dict[str, np.ndarray], execucao: int, completa: bool):
+        if self.execucoes and execucao < self.execucoes[-1][0]:
+            raise ValueError("execuções devem ser anexadas em ordem cronológica")
+        os.makedirs(self.pasta, exist_ok=True)
+        total = self.meta['total']
+        # Fecha os memory-maps antes de mexer nos arquivos
+        self._colunas = {}
+        for nome, valores in colunas.items():
+            with open(self._arquivo(nome), 'ab') as f:
+                f.truncate(total * np.dtype(COLUNAS[nome]).itemsize)
+                f.write(valores.tobytes())
+        quantidade = len(colunas['id'])
+        meta = {'total': total + quantidade,
+                'execucoes': self.execucoes + [[execucao, total, quantidade, completa]]}
+        temporario = os.path.join(self.pasta, 'meta.json.tmp')
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(temporario, os.path.join(self.pasta, 'meta.json'))
+        self.meta = meta
+
+    def _linhas(self, desde: Optional[float], ate: Optional[float]) -> slice:
+        """Faixa de linhas das execuções em `[desde, ate]`, incluindo a base anterior a `desde`
+
+        A base é a última execução completa antes de `desde` (e as parciais
+        depois dela), para comparar a primeira execução da janela com algo.
+        """
+        execucoes = self.execucoes
+        if not execucoes:
+            return slice(0, 0)
+        instantes = [execucao[0] for execucao in execucoes]
+        fim = len(execucoes) if ate is None else int(np.searchsorted(instantes, ate, side='right'))
+        inicio = 0 if desde is None else int(np.searchsorted(instantes, desde, side='left'))
+        while inicio > 0 and not execucoes[inicio - 1][3]:
+            inicio -= 1
+        inicio = max(0, inicio - 1)
+        if inicio >= fim:
+            return slice(0, 0)
+        return slice(execucoes[inicio][1], execucoes[fim - 1][1] + execucoes[fim - 1][2])
+
+    def _transicoes(self, desde: Optional[float], ate: Optional[float]) -> Dict[str, np.ndarray]:
+        """Pares de linhas consecutivas do mesmo produto, em ordem de execução"""
+        linhas = self._linhas(desde, ate)
+        ids = np.asarray(self.coluna('id')[linhas])
+        execucao = np.asarray(self.coluna('execucao')[linhas])
+        # As linhas já estão em ordem de execução e cada execução está ordenada por id: a
+        # ordenação estável (timsort) só intercala blocos ordenados e mantém a ordem no tempo
+        ordem = np.argsort(ids, kind='stable')
+        ids, execucao = ids[ordem], execucao[ordem]
+        mesmo = ids[1:] == ids[:-1]
+        if desde is not None:
+            mesmo &= execucao[1:] >= desde
+        anterior, atual = np.flatnonzero(mesmo), np.flatnonzero(mesmo) + 1
+        colunas = {'id': ids[atual], 'execucao': execucao[atual]}
+        for nome in ('cheio', 'promocional'):
+            valores = np.asarray(self.coluna(nome)[linhas])[ordem]
+            colunas[f"{nome}_anterior"] = valores[anterior]
+            colunas[nome] = valores[atual]
+        return colunas
+
+    def price_changes(self, desde: Optional[float] = None, ate: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Mudanças de preço efetivo entre execuções em `[desde, ate]`
+
+        Retorna colunas alinhadas: `id`, `execucao`, `anterior`, `atual` (centavos).
+        """
+        transicoes = self._transicoes(desde, ate)
+        anterior = preco_efetivo(transicoes['cheio_anterior'], transicoes['promocional_anterior'])
+        atual = preco_efetivo(transicoes['cheio'], transicoes['promocional'])
+        mudou = anterior != atual
+        return {'id': transicoes['id'][mudou], 'execucao': transicoes['execucao'][mudou],
+                'anterior': anterior[mudou], 'atual': atual[mudou]}
+
+    def promotions_ended(self, desde: Optional[float] = None, ate: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Produtos que estavam em promoção e deixaram de estar em `[desde, ate]`"""
+        transicoes = self._transicoes(desde, ate)
+        saiu = (em_promocao(transicoes['cheio_anterior'], transicoes['promocional_anterior'])
+                & ~em_promocao(transicoes['cheio'], transicoes['promocional']))
+        return {'id': transicoes['id'][saiu], 'execucao': transicoes['execucao'][saiu],
+                'promocional': transicoes['promocional_anterior'][saiu], 'cheio': transicoes['cheio'][saiu]}
+
+    def snapshot(self, em: Optional[float] = None) -> Dict[str, np.ndarray]:
+        """Estado do catálogo no instante `em` (padrão: última execução), ordenado por id
+
+        Parte da última execução completa até `em`: produtos ausentes dela já
+        tinham saído do catálogo.
+        """
+        execucoes = self.execucoes
+        fim = (len(execucoes) if em is None
+               else int(np.searchsorted([execucao[0] for execucao in execucoes], em, side='right')))
+        inicio = fim - 1
+        while inicio > 0 and not execucoes[inicio][3]:
+            inicio -= 1
+        linhas = (slice(execucoes[inicio][1], execucoes[fim - 1][1] + execucoes[fim - 1][2]) if fim
+                  else slice(0, 0))
+        ids = np.asarray(self.coluna('id')[linhas])
+        # Última linha de cada produto: `unique` sobre a ordem invertida pega a ocorrência mais recente
+        _, ultimas = np.unique(ids[::-1], return_index=True)
+        escolhidas = linhas.start + len(ids) - 1 - ultimas
+        return {nome: np.asarray(self.coluna(nome)[escolhidas]) for nome in COLUNAS}
+
+    def history(self, produto_id) -> Dict[str, np.ndarray]:
+        """Todas as linhas de um produto, em ordem de execução"""
+        linhas = np.flatnonzero(np.asarray(self.coluna('id')) == int(produto_id))
+        return {nome: np.asarray(self.coluna(nome)[linhas]) for nome in COLUNAS}
+
+def benchmark_historico(produtos: int = 100000, execucoes: int = 30, fracao_alterada: float = 0.02,
+                        pasta: Optional[str] = None, semente: int = 0) -> Dict[str, float]:
+    """Grava `execucoes` snapshots diários sintéticos e mede as consultas dos últimos 30 dias"""
+    import shutil
+    import tempfile
+
+    pasta_temporaria = pasta is None
+    pasta = pasta or tempfile.mkdtemp(prefix='historico_')
+    rng = np.random.default_rng(semente)
+    cheio = rng.integers(5000, 15000000, produtos)
+    promocional = np.where(rng.random(produtos) < 0.2, (cheio * 0.85).astype(np.int64), SEM_PRECO)
+    ids = np.arange(900000000, 900000000 + produtos)
+    historico = HistoricoPrecos(pasta)
+    inicio_execucoes = time.time() - execucoes * 86400
+    try:
+        tempo_gravacao = 0.0
+        for dia in range(execucoes):
+            alterados = rng.random(produtos) < fracao_alterada
+            cheio = np.where(alterados, (cheio * rng.uniform(0.9, 1.1, produtos)).astype(np.int64), cheio)
+            promocional = np.where(alterados & (rng.random(produtos) < 0.5), SEM_PRECO, promocional)
+            registros = ({'id_produto_loja_integrada': str(i), 'valor_cheio': f"{c / 100:.2f}",
+                          'valor_promocional': f"{p / 100:.2f}" if p != SEM_PRECO else None}
+                         for i, c, p in zip(ids.tolist(), cheio.tolist(), promocional.tolist()))
+            inicio = time.perf_counter()
+            historico.append(registros, execucao=inicio_execucoes + dia * 86400)
+            tempo_gravacao += time.perf_counter() - inicio
+
+        leitor = HistoricoPrecos(pasta)
+        desde = time.time() - 30 * 86400
+        inicio = time.perf_counter()
+        mudancas = leitor.price_changes(desde)
+        tempo_mudancas = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        fim_promocao = leitor.promotions_ended(desde)
+        tempo_promocoes = time.perf_counter() - inicio
+        inicio = time.perf_counter()
+        leitor.snapshot()
+        tempo_snapshot = time.perf_counter() - inicio
+        tamanho = sum(os.path.getsize(os.path.join(pasta, arquivo)) for arquivo in os.listdir(pasta))
+    finally:
+        if pasta_temporaria:
+            shutil.rmtree(pasta, ignore_errors=True)
+
+    resultado = {
+        'linhas': len(leitor),
+        'gravacao_por_execucao_s': tempo_gravacao / execucoes,
+        'mudancas_ms': tempo_mudancas * 1000,
+        'promocoes_encerradas_ms': tempo_promocoes * 1000,
+        'snapshot_ms': tempo_snapshot * 1000,
+        'bytes_por_linha': tamanho / max(1, len(leitor))
+    }
+    print(f"🗄️ {len(leitor)} linhas ({execucoes} execuções × {produtos} produtos), "
+          f"{resultado['bytes_por_linha']:.0f} bytes/linha, {resultado['gravacao_por_execucao_s']:.2f}s por execução")
+    print(f"   preços alterados em 30 dias: {len(mudancas['id'])} em {resultado['mudancas_ms']:.0f} ms")
+    print(f"   saíram de promoção: {len(fim_promocao['id'])} em {resultado['promocoes_encerradas_ms']:.0f} ms")
+    print(f"   snapshot atual: {resultado['snapshot_ms']:.0f} ms")
+    return resultado
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Consultas sobre o histórico de preços")
+    parser.add_argument('--pasta', default=PASTA_HISTORICO)
+    parser.add_argument('--dias', type=float, default=30, help="Janela das consultas")
+    parser.add_argument('--limite', type=int, default=20, help="Linhas exibidas por consulta")
+    parser.add_argument('--benchmark', type=int, metavar='PRODUTOS',
+                        help="Roda o benchmark sintético em vez de consultar o histórico")
+    args = parser.parse_args(argv)
+    if args.benchmark:
+        return benchmark_historico(args.benchmark)
+
+    historico = HistoricoPrecos(args.pasta)
+    if not len(historico):
+        print(f"⚠️ Histórico vazio em {args.pasta}: rode `python sync.py` primeiro")
+        return None
+    desde = time.time() - args.dias * 86400
+    mudancas = historico.price_changes(desde)
+    print(f"💲 {len(mudancas['id'])} mudanças de preço nos últimos {args.dias:g} dias")
+    for i in range(min(args.limite, len(mudancas['id']))):
+        print(f"   {mudancas['id'][i]}: {mudancas['anterior'][i] / 100:.2f} → {mudancas['atual'][i] / 100:.2f} "
+              f"({time.strftime('%Y-%m-%d %H:%M', time.localtime(mudancas['execucao'][i]))})")
+    fim_promocao = historico.promotions_ended(desde)
+    print(f"🏷️ {len(fim_promocao['id'])} produtos saíram de promoção")
+    for i in range(min(args.limite, len(fim_promocao['id']))):
+        print(f"   {fim_promocao['id'][i]}: {fim_promocao['promocional'][i] / 100:.2f} → "
+              f"{fim_promocao['cheio'][i] / 100:.2f}")
+    return {'mudancas': mudancas, 'promocoes_encerradas': fim_promocao}
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
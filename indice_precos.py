@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Índice de preços ordenado em memória
+
+Com os preços em texto ("R$ 19.000,00"), cada filtro ou ordenação do agente
+("drones abaixo de R$ 10 mil", "os 5 mais baratos") exigia varrer e interpretar
+o catálogo inteiro. Aqui o preço efetivo de cada produto (promocional quando
+menor que o cheio) fica em centavos inteiros numa lista ordenada; faixas e
+top-N saem por busca binária, e o índice é atualizado pelo delta da sincronização.
+"""
+
+import bisect
+import random
+import sys
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from combinar_produtos import converter_preco
+
+def preco_efetivo(registro: Dict) -> Optional[Decimal]:
+    """Preço de venda: o promocional quando positivo e menor que o cheio"""
+    cheio = converter_preco(registro.get('valor_cheio'))
+    promocional = converter_preco(registro.get('valor_promocional'))
+    if promocional is not None and promocional > 0 and (cheio is None or promocional < cheio):
+        return promocional
+    return cheio
+
+def _centavos(valor) -> int:
+    """Limite de uma consulta em centavos; um valor que não é preço é erro de quem consulta"""
+    numero = converter_preco(valor)
+    if numero is None:
+        raise ValueError(f"limite de preço inválido: {valor!r}")
+    return int(numero * 100)
+
+class IndicePrecos:
+    """Lista ordenada `(centavos, id_produto)` com os atributos usados nos filtros
+
+    Produtos inativos e "sob consulta" ficam no índice, mas são ignorados nas
+    consultas por padrão.
+    """
+
+    def __init__(self):
+        self.chaves: List[Tuple[int, str]] = []
+        self.produtos: Dict[str, Tuple[int, bool, bool]] = {}
+
+    def __len__(self):
+        return len(self.produtos)
+
+    def upsert(self, produto_id: str, registro: Dict):
+        produto_id = str(produto_id)
+        self.remove(produto_id)
+        preco = preco_efetivo(registro)
+        if preco is None:
+            return
+        centavos = int(preco * 100)
+        self.produtos[produto_id] = (centavos, registro.get('ativo') is not False,
+                                     registro.get('sob_consulta') is True)
+        bisect.insort(self.chaves, (centavos, produto_id))
+
+    def remove(self, produto_id: str):
+        atual = self.produtos.pop(str(produto_id), None)
+        if atual is None:
+            return
+        posicao = bisect.bisect_left(self.chaves, (atual[0], str(produto_id)))
+        del self.chaves[posicao]
+
+    def index(self, registros: Iterable[Dict]):
+        """Carga inicial: ordena uma vez em vez de inserir item a item"""
+        for registro in registros:
+            preco = preco_efetivo(registro)
+            if preco is None:
+                continue
+            produto_id = str(registro['id_produto_loja_integrada'])
+            self.produtos[produto_id] = (int(preco * 100), registro.get('ativo') is not False,
+                                         registro.get('sob_consulta') is True)
+        self.chaves = sorted((atributos[0], produto_id) for produto_id, atributos in self.produtos.items())
+
+    def apply_delta(self, resultado):
+        """Aplica um `ResultadoDelta` da sincronização incremental ao índice"""
+        for registro in resultado.creates + resultado.updates:
+            self.upsert(registro['id_produto_loja_integrada'], registro)
+        for produto_id in resultado.removidos:
+            self.remove(produto_id)
+
+    def _percorrer(self, inicio: int, fim: int, limite: Optional[int], incluir_inativos: bool,
+                   incluir_sob_consulta: bool) -> List[Tuple[str, Decimal]]:
+        encontrados = []
+        for posicao in range(inicio, fim):
+            centavos, produto_id = self.chaves[posicao]
+            _, ativo, sob_consulta = self.produtos[produto_id]
+            if (not ativo and not incluir_inativos) or (sob_consulta and not incluir_sob_consulta):
+                continue
+            encontrados.append((produto_id, Decimal(centavos).scaleb(-2)))
+            if limite is not None and len(encontrados) >= limite:
+                break
+        return encontrados
+
+    def range(self, minimo=None, maximo=None, limite: Optional[int] = 50, incluir_inativos: bool = False,
+              incluir_sob_consulta: bool = False) -> List[Tuple[str, Decimal]]:
+        """Produtos com preço efetivo em `[minimo, maximo]`, do mais barato ao mais caro
+
+        Um limite que não é um preço válido ("abc", "") levanta `ValueError`.
+        """
+        inicio = 0 if minimo is None else bisect.bisect_left(self.chaves, (_centavos(minimo), ''))
+        fim = len(self.chaves) if maximo is None else bisect.bisect_left(self.chaves, (_centavos(maximo) + 1, ''))
+        return self._percorrer(inicio, fim, limite, incluir_inativos, incluir_sob_consulta)
+
+    def cheapest(self, n: int = 10, **filtros) -> List[Tuple[str, Decimal]]:
+        """Os `n` produtos mais baratos"""
+        return self.range(limite=n, **filtros)
+
+def benchmark_precos(total: int = 100000, consultas: int = 2000, semente: int = 0) -> Dict[str, float]:
+    """Latência p50/p99 de consultas por faixa e top-N sobre um catálogo sintético"""
+    rng = random.Random(semente)
+    registros = [{
+        'id_produto_loja_integrada': str(i),
+        'valor_cheio': f"{rng.uniform(50, 150000):.2f}",
+        'valor_promocional': f"{rng.uniform(40, 120000):.2f}" if rng.random() < 0.2 else None,
+        'ativo': rng.random() > 0.05,
+        'sob_consulta': rng.random() < 0.02
+    } for i in range(total)]
+
+    indice = IndicePrecos()
+    inicio = time.perf_counter()
+    indice.index(registros)
+    tempo_indexacao = time.perf_counter() - inicio
+
+    latencias = []
+    for i in range(consultas):
+        inicio = time.perf_counter()
+        if i % 2:
+            indice.cheapest(10)
+        else:
+            minimo = rng.randrange(100, 100000)
+            indice.range(minimo, minimo + rng.randrange(100, 5000), limite=20)
+        latencias.append(time.perf_counter() - inicio)
+    latencias.sort()
+
+    # Referência: varredura com interpretação dos preços formatados, como antes
+    from combinar_produtos import formatar_preco
+    formatados = [formatar_preco(r['valor_cheio']) for r in registros]
+    inicio = time.perf_counter()
+    sorted(float(p[3:].replace('.', '').replace(',', '.')) for p in formatados if p)[:10]
+    tempo_varredura = time.perf_counter() - inicio
+
+    resultado = {
+        'produtos': total,
+        'indexacao_s': tempo_indexacao,
+        'p50_ms': latencias[len(latencias) // 2] * 1000,
+        'p99_ms': latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000,
+        'varredura_ms': tempo_varredura * 1000
+    }
+    print(f"💲 {total} preços indexados em {tempo_indexacao:.2f}s")
+    print(f"   {consultas} consultas (faixa e top-10): p50 {resultado['p50_ms']:.3f} ms | "
+          f"p99 {resultado['p99_ms']:.3f} ms | varredura de strings: {resultado['varredura_ms']:.1f} ms")
+    return resultado
+
+if __name__ == "__main__":
+    benchmark_precos(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
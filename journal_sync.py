@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Journal de checkpoints das execuções de sincronização
+
+Se uma execução morre no meio (timeout, 5xx do Baserow), a próxima recomeçava
+do offset 0 e regravava o catálogo inteiro. O journal SQLite local registra,
+por execução, as páginas de preços baixadas, o snapshot combinado de cada
+página de produtos e os lotes que o Baserow confirmou. Uma execução
+interrompida é retomada a partir do último lote confirmado: as páginas já
+registradas não são baixadas de novo e os lotes confirmados entram no estado
+de fingerprints antes da comparação, virando "inalterados".
+"""
+
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+ARQUIVO_JOURNAL = os.path.join('estado', 'journal.sqlite')
+
+EM_ANDAMENTO = 'em_andamento'
+CONCLUIDA = 'concluida'
+DESCARTADA = 'descartada'
+
+class JournalSync:
+    """Checkpoints por execução: páginas, snapshot combinado e lotes confirmados"""
+
+    def __init__(self, caminho: str = ARQUIVO_JOURNAL):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.caminho = caminho
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Com WAL, NORMAL ainda garante que uma transação confirmada sobrevive ao processo
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS execucoes ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, iniciada_em REAL NOT NULL,"
+            " concluida_em REAL, status TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS paginas ("
+            " execucao INTEGER NOT NULL, recurso TEXT NOT NULL, offset INTEGER NOT NULL,"
+            " dados TEXT NOT NULL, PRIMARY KEY (execucao, recurso, offset));"
+            "CREATE TABLE IF NOT EXISTS lotes ("
+            " execucao INTEGER NOT NULL, seq INTEGER NOT NULL, acao TEXT NOT NULL,"
+            " itens TEXT NOT NULL, confirmado_em REAL NOT NULL, PRIMARY KEY (execucao, seq));"
+        )
+        self.execucao: Optional[int] = None
+        self.retomada = False
+        self._seq = 0
+
+    def start_run(self, retomar: bool = True) -> int:
+        """Retoma a última execução interrompida ou abre uma nova"""
+        linha = self.conn.execute(
+            "SELECT id FROM execucoes WHERE status = ? ORDER BY id DESC LIMIT 1", (EM_ANDAMENTO,)).fetchone()
+        if linha and retomar:
+            self.execucao = linha[0]
+            self.retomada = True
+            self._seq = self.conn.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM lotes WHERE execucao = ?", (self.execucao,)).fetchone()[0]
+            return self.execucao
+        if linha:
+            self.discard(linha[0])
+        cursor = self.conn.execute(
+            "INSERT INTO execucoes (iniciada_em, status) VALUES (?, ?)", (time.time(), EM_ANDAMENTO))
+        self.conn.commit()
+        self.execucao = cursor.lastrowid
+        self.retomada = False
+        self._seq = 0
+        return self.execucao
+
+    def record_page(self, recurso: str, offset: int, dados):
+        """Registra uma página baixada (ou o snapshot combinado dela)"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO paginas (execucao, recurso, offset, dados) VALUES (?, ?, ?, ?)",
+            (self.execucao, recurso, offset, json.dumps(dados, ensure_ascii=False, separators=(',', ':'))))
+        self.conn.commit()
+
+    def offsets(self, recurso: str) -> List[int]:
+        return [offset for offset, in self.conn.execute(
+            "SELECT offset FROM paginas WHERE execucao = ? AND recurso = ? ORDER BY offset",
+            (self.execucao, recurso))]
+
+    def pages(self, recurso: str) -> Iterator[Tuple[int, object]]:
+        """Gera `(offset, dados)` das páginas registradas, na ordem dos offsets"""
+        # Uma consulta por página: só uma fica em memória e o gerador pode ser
+        # consumido enquanto outros checkpoints são gravados na mesma conexão
+        for offset in self.offsets(recurso):
+            dados, = self.conn.execute(
+                "SELECT dados FROM paginas WHERE execucao = ? AND recurso = ? AND offset = ?",
+                (self.execucao, recurso, offset)).fetchone()
+            yield offset, json.loads(dados)
+
+    def record_batch(self, acao: str, operacoes: Iterable[Dict], fingerprints: Dict[str, str]):
+        """Registra um lote confirmado pelo Baserow como `[id_produto, fingerprint]`"""
+        itens = [[op['id_produto_loja_integrada'],
+                  None if acao in ('delete', 'desativar') else fingerprints[op['id_produto_loja_integrada']]]
+                 for op in operacoes]
+        self._seq += 1
+        self.conn.execute(
+            "INSERT INTO lotes (execucao, seq, acao, itens, confirmado_em) VALUES (?, ?, ?, ?, ?)",
+            (self.execucao, self._seq, acao, json.dumps(itens), time.time()))
+        self.conn.commit()
+
+    def acked_batches(self) -> Iterator[Tuple[str, List[Dict], Dict[str, str]]]:
+        """Gera `(acao, operações, fingerprints)` dos lotes confirmados, no formato de `registrar`"""
+        linhas = self.conn.execute(
+            "SELECT acao, itens FROM lotes WHERE execucao = ? ORDER BY seq", (self.execucao,)).fetchall()
+        for acao, itens in linhas:
+            itens = json.loads(itens)
+            operacoes = [{'id_produto_loja_integrada': produto_id, 'acao': acao} for produto_id, _ in itens]
+            yield acao, operacoes, {produto_id: fp for produto_id, fp in itens if fp is not None}
+
+    def restore(self, estado) -> int:
+        """Aplica ao `EstadoSincronizacao` os lotes já confirmados; retorna quantas linhas"""
+        total = 0
+        for _, operacoes, fingerprints in self.acked_batches():
+            estado.registrar(operacoes, fingerprints)
+            total += len(operacoes)
+        return total
+
+    def finish(self):
+        """Marca a execução como concluída e descarta os checkpoints dela"""
+        self.conn.execute("DELETE FROM paginas WHERE execucao = ?", (self.execucao,))
+        self.conn.execute("DELETE FROM lotes WHERE execucao = ?", (self.execucao,))
+        self.conn.execute("UPDATE execucoes SET status = ?, concluida_em = ? WHERE id = ?",
+                          (CONCLUIDA, time.time(), self.execucao))
+        self.conn.commit()
+
+    def discard(self, execucao: int):
+        """Abandona uma execução interrompida sem retomá-la"""
+        self.conn.execute("DELETE FROM paginas WHERE execucao = ?", (execucao,))
+        self.conn.execute("DELETE FROM lotes WHERE execucao = ?", (execucao,))
+        self.conn.execute("UPDATE execucoes SET status = ? WHERE id = ?", (DESCARTADA, execucao))
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
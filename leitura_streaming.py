@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Leitura incremental de páginas JSON da Loja Integrada
+
+Uma página de 100 produtos tem ~1,2 MB, quase tudo HTML de
+`descricao_completa`, e o fluxo antigo carregava cada página inteira e
+concatenava tudo (`todosProdutos.concat(...)`), então o pico de memória crescia
+com o catálogo. O leitor percorre o stream (resposta HTTP ou dump salvo) em
+blocos e gera os objetos de cada array `objects` um de cada vez: só a
+estrutura externa é varrida em Python; cada objeto é decodificado pelo
+`raw_decode` do módulo `json`, em C.
+"""
+
+import codecs
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, Optional, TextIO
+
+_ESTRUTURA = re.compile(r'["\[\]{}:,]')
+_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.DOTALL)
+_ESPACOS = re.compile(r'[\s,]*')
+
+TAMANHO_BLOCO = 64 * 1024
+
+class LeitorObjetos:
+    """Itera os objetos dos arrays `chave` de um documento JSON lido em blocos
+
+    Funciona com uma página da API (`{"meta": ..., "objects": [...]}`) e com os
+    dumps do n8n (`[{"json": {...}}, ...]`). O último `meta` encontrado fica em
+    `self.meta`, para quem precisa de `total_count` ou `next`.
+    """
+
+    def __init__(self, fonte: TextIO, chave: str = 'objects', tamanho_bloco: int = TAMANHO_BLOCO):
+        self.fonte = fonte
+        self.chave = chave
+        self.tamanho_bloco = tamanho_bloco
+        self.meta: Optional[Dict] = None
+        self._decoder = json.JSONDecoder()
+        self._buffer = ''
+        self._fim = False
+
+    def _ler(self, minimo: int = 0) -> bool:
+        """Acrescenta um bloco ao buffer; retorna False no fim do stream"""
+        if self._fim:
+            return False
+        bloco = self.fonte.read(max(self.tamanho_bloco, minimo))
+        if not bloco:
+            self._fim = True
+            return False
+        self._buffer += bloco
+        return True
+
+    def _decodificar(self, pos: int):
+        """Decodifica o valor em `pos`, lendo mais blocos enquanto ele estiver incompleto"""
+        while True:
+            try:
+                return self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                # Dobra a leitura a cada tentativa para objetos muito maiores que o bloco
+                if not self._ler(len(self._buffer) - pos):
+                    raise
+
+    def __iter__(self) -> Iterator[Dict]:
+        pos = 0
+        pilha = []
+        ultima_string = None
+        chave_pendente = None
+        while True:
+            # Descarta o que já foi consumido para o buffer não crescer
+            if pos > self.tamanho_bloco:
+                self._buffer = self._buffer[pos:]
+                pos = 0
+            m = _ESTRUTURA.search(self._buffer, pos)
+            if m is None:
+                pos = len(self._buffer)
+                if not self._ler():
+                    return
+                continue
+            caractere, inicio = m.group(), m.start()
+            if caractere == '"':
+                string = _STRING.match(self._buffer, inicio)
+                if string is None or string.end() == len(self._buffer):
+                    pos = inicio
+                    if not self._ler():
+                        return
+                    continue
+                ultima_string = string.group()
+                pos = string.end()
+            elif caractere == ':':
+                chave_pendente = json.loads(ultima_string) if ultima_string else None
+                pos = inicio + 1
+            elif caractere == ',':
+                chave_pendente = None
+                pos = inicio + 1
+            elif caractere == '{' and chave_pendente == 'meta':
+                self.meta, pos = self._decodificar(inicio)
+                chave_pendente = None
+            elif caractere == '[' and chave_pendente == self.chave and pilha and pilha[-1] == '{':
+                chave_pendente = None
+                pos = inicio + 1
+                while True:
+                    pos = _ESPACOS.match(self._buffer, pos).end()
+                    if pos >= len(self._buffer):
+                        if not self._ler():
+                            return
+                        continue
+                    if self._buffer[pos] == ']':
+                        pos += 1
+                        break
+                    objeto, pos = self._decodificar(pos)
+                    yield objeto
+                    if pos > self.tamanho_bloco:
+                        self._buffer = self._buffer[pos:]
+                        pos = 0
+            elif caractere in '{[':
+                pilha.append(caractere)
+                chave_pendente = None
+                pos = inicio + 1
+            else:
+                if pilha:
+                    pilha.pop()
+                pos = inicio + 1
+
+def iterar_objetos(fonte: TextIO, chave: str = 'objects', tamanho_bloco: int = TAMANHO_BLOCO) -> Iterator[Dict]:
+    """Gera os objetos de `chave` lidos de um stream de texto"""
+    return iter(LeitorObjetos(fonte, chave, tamanho_bloco))
+
+def ler_dump(caminho: str, chave: str = 'objects') -> Iterator[Dict]:
+    """Gera os objetos de um dump salvo (ex: 'Loja Integrada API - Produtos exemplo output api.json')"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        yield from iterar_objetos(f, chave)
+
+class TextoResposta:
+    """Stream de texto mínimo (`read(n)`) sobre uma resposta `requests` com `stream=True`
+
+    Usa `iter_content`, que descomprime gzip e trata o fim da resposta; o
+    decodificador incremental não quebra caracteres UTF-8 divididos entre blocos.
+    """
+
+    def __init__(self, response, tamanho_bloco: int = TAMANHO_BLOCO):
+        self.blocos = response.iter_content(chunk_size=tamanho_bloco)
+        self.decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')()
+
+    def read(self, tamanho: int = -1) -> str:
+        partes = []
+        lidos = 0
+        for bloco in self.blocos:
+            texto = self.decoder.decode(bloco)
+            partes.append(texto)
+            lidos += len(texto)
+            if 0 <= tamanho <= lidos:
+                break
+        else:
+            partes.append(self.decoder.decode(b'', final=True))
+        return ''.join(partes)
+
+def abrir_resposta(response) -> TextIO:
+    """Stream de texto sobre uma resposta `requests` aberta com `stream=True`"""
+    return TextoResposta(response)
+
+def gerar_dump_sintetico(arquivo_base: str, destino: str, paginas: int) -> int:
+    """Grava um dump com `paginas` cópias das páginas de `arquivo_base`, sem montá-lo em memória"""
+    with open(arquivo_base, 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    total = 0
+    with open(destino, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for i in range(paginas):
+            for j, pagina in enumerate(base):
+                if i or j:
+                    f.write(',')
+                json.dump(pagina, f, ensure_ascii=False)
+                total += len(pagina.get('json', pagina).get('objects') or [])
+        f.write(']')
+    return total
+
+def _medir(modo: str, arquivo_produtos: str, arquivo_precos: str, fila) -> None:
+    """Roda uma abordagem em processo próprio e informa o pico de RSS (ru_maxrss)"""
+    import resource
+    from combinar_produtos import combinar_produtos, extrair_objetos
+
+    with open(arquivo_precos, 'r', encoding='utf-8') as f:
+        precos = list(extrair_objetos(json.load(f)))
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    if modo == 'json.load':
+        # Fluxo antigo: página inteira em memória e concatenação de todos os produtos
+        with open(arquivo_produtos, 'r', encoding='utf-8') as f:
+            paginas = json.load(f)
+        todos = []
+        for pagina in paginas:
+            todos = todos + (pagina.get('json', pagina).get('objects') or [])
+        combinados = len(list(combinar_produtos(todos, precos)))
+    else:
+        combinados = sum(1 for _ in combinar_produtos(ler_dump(arquivo_produtos), precos))
+    duracao = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KiB no Linux e em bytes no macOS
+    escala = 1 if sys.platform == 'darwin' else 1024
+    fila.put({'modo': modo, 'segundos': duracao, 'combinados': combinados,
+              'pico_rss_mb': pico * escala / 2 ** 20, 'acrescimo_rss_mb': (pico - base_rss) * escala / 2 ** 20})
+
+def benchmark_memoria(arquivo_produtos: str = 'Loja Integrada API - Produtos exemplo output api.json',
+                      arquivo_precos: str = 'Loja Integrada API - Preços exemplo output api.json',
+                      paginas: int = 50):
+    """Compara o pico de RSS de `json.load` + concatenação com a leitura em stream
+
+    Cada abordagem roda em um processo novo, já que o pico de RSS só cresce.
+    """
+    import multiprocessing
+
+    contexto = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as pasta:
+        dump = os.path.join(pasta, 'produtos.json')
+        produtos = gerar_dump_sintetico(arquivo_produtos, dump, paginas)
+        tamanho_mb = os.path.getsize(dump) / 2 ** 20
+        print(f"📄 Dump sintético: {produtos} produtos, {tamanho_mb:.0f} MB")
+        resultados = []
+        for modo in ('json.load', 'streaming'):
+            fila = contexto.Queue()
+            processo = contexto.Process(target=_medir, args=(modo, dump, arquivo_precos, fila))
+            processo.start()
+            resultado = fila.get()
+            processo.join()
+            resultados.append(resultado)
+            print(f"   {modo:<10} | pico RSS {resultado['pico_rss_mb']:7.1f} MB "
+                  f"(+{resultado['acrescimo_rss_mb']:.1f} MB) | {resultado['segundos']:.2f}s | "
+                  f"{resultado['combinados']} combinados")
+    return resultados
+
+if __name__ == "__main__":
+    benchmark_memoria(paginas=int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Conversão de HTML para texto para a `descricao_completa` dos produtos
+
+O `limparHtml` do workflow fazia três passadas de regex, trocava toda entidade
+por espaço ("&ccedil;" e "&nbsp;" destruíam o português) e cortava o texto em
+1000 caracteres. Aqui o HTML é tokenizado uma única vez por um regex compilado,
+as entidades são decodificadas com `html.unescape` e listas/títulos/parágrafos
+viram quebras de linha. O resultado é memoizado pelo hash do conteúdo.
+"""
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from html import unescape
+from typing import Dict, List, Optional
+
+# Tags que começam/terminam um bloco de texto (viram quebra de linha)
+TAGS_BLOCO = {
+    'address', 'article', 'aside', 'blockquote', 'dd', 'div', 'dl', 'dt', 'figcaption',
+    'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hr', 'li',
+    'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'thead', 'tfoot', 'tr', 'ul'
+}
+TAGS_IGNORADAS = {'script', 'style', 'head', 'title', 'noscript', 'template'}
+TAGS_CELULA = {'td', 'th'}
+
+_ESPACOS = re.compile(r'[ \t\r\n\f\v\xa0]+')
+
+# Atributos de uma tag: valores entre aspas podem conter '>' ("loop desenrolado", sem backtracking)
+_ATRIBUTOS = r'''[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*'''
+
+# Um único regex tokeniza o documento: <script>/<style> inteiros (o conteúdo é texto cru,
+# '<' ali não abre tag), comentários/doctype, tags e trechos de texto
+_TOKENS = re.compile(
+    r'<(script|style)\b' + _ATRIBUTOS + r'>.*?</\1\s*>'
+    r'|<!--.*?-->|<![^>]*>|<\?[^>]*>'
+    r'|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b' + _ATRIBUTOS + r'>'
+    r'|([^<]+|<)',
+    re.S | re.I
+)
+
+def converter_html(html: Optional[str]) -> str:
+    """Converte HTML em texto em uma única passada, sem memoização"""
+    if not html or not isinstance(html, str):
+        return ''
+    linhas: List[str] = []
+    atual: List[str] = []
+    prefixo = ''
+    ignorando = None
+
+    def quebrar_linha():
+        nonlocal prefixo
+        if atual:
+            texto = _ESPACOS.sub(' ', unescape(''.join(atual))).strip()
+            if texto:
+                linhas.append(prefixo + texto)
+            atual.clear()
+        prefixo = ''
+
+    for token in _TOKENS.finditer(html):
+        fechamento, tag, texto = token.group(2, 3, 4)
+        if texto:
+            if ignorando is None:
+                atual.append(texto)
+            continue
+        if not tag:
+            continue
+        tag = tag.lower()
+        if ignorando is not None:
+            # Dentro de <head>/<noscript>/... só interessa o fechamento da mesma tag
+            if fechamento and tag == ignorando:
+                ignorando = None
+            continue
+        if tag in TAGS_IGNORADAS:
+            # <script> sem fechamento também cai aqui e ignora o resto do documento
+            if not fechamento and html[token.end() - 2] != '/':
+                ignorando = tag
+        elif tag in TAGS_BLOCO or tag == 'br':
+            quebrar_linha()
+            if tag == 'li' and not fechamento:
+                prefixo = '- '
+        elif tag in TAGS_CELULA and not fechamento:
+            atual.append(' ')
+    quebrar_linha()
+    return '\n'.join(linhas)
+
+class CacheLimpeza:
+    """Cache LRU `sha1(html) -> texto`, guardando só o digest e o texto limpo"""
+
+    def __init__(self, max_itens: int = 4096):
+        self.max_itens = max_itens
+        self.itens: 'OrderedDict[bytes, str]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def html_para_texto(self, html: Optional[str]) -> str:
+        if not html or not isinstance(html, str):
+            return ''
+        chave = hashlib.sha1(html.encode('utf-8')).digest()
+        texto = self.itens.get(chave)
+        if texto is not None:
+            self.itens.move_to_end(chave)
+            self.hits += 1
+            return texto
+        self.misses += 1
+        texto = converter_html(html)
+        self.itens[chave] = texto
+        if len(self.itens) > self.max_itens:
+            self.itens.popitem(last=False)
+        return texto
+
+_cache_padrao = CacheLimpeza()
+
+def html_para_texto(html: Optional[str], limite: Optional[int] = None) -> str:
+    """Converte HTML em texto (memoizado); `limite` trunca opcionalmente o resultado"""
+    texto = _cache_padrao.html_para_texto(html)
+    if limite and len(texto) > limite:
+        texto = texto[:limite - 3].rstrip() + '...'
+    return texto
+
+def _limpar_html_regex(html: Optional[str]) -> str:
+    """Versão antiga (node "Combinar Produtos e Preços"), mantida só para o benchmark"""
+    if not html or not isinstance(html, str):
+        return ''
+    texto = re.sub(r'<[^>]*>', '', html)
+    texto = re.sub(r'&[^;]+;', ' ', texto)
+    texto = re.sub(r'\s+', ' ', texto).strip()
+    if len(texto) > 1000:
+        texto = texto[:997] + '...'
+    return texto
+
+def benchmark_limpeza(arquivo: str = 'Loja Integrada API - Produtos exemplo output api.json',
+                      repeticoes: int = 5) -> Dict[str, float]:
+    """Mede a limpeza das descrições da amostra: regex antigo, tokenizador e tokenizador com cache"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        paginas = json.load(f)
+    descricoes = [produto.get('descricao_completa') or ''
+                  for pagina in paginas for produto in pagina.get('json', pagina).get('objects', [])]
+    megabytes = sum(len(d.encode('utf-8')) for d in descricoes) / 1e6
+
+    def medir(funcao) -> float:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            for descricao in descricoes:
+                funcao(descricao)
+        return (time.perf_counter() - inicio) / repeticoes
+
+    cache = CacheLimpeza()
+    resultados = {
+        'regex_s': medir(_limpar_html_regex),
+        'tokenizador_s': medir(converter_html),
+        'tokenizador_cache_s': medir(cache.html_para_texto)
+    }
+    print(f"📄 {len(descricoes)} descrições, {megabytes:.2f} MB de HTML")
+    print(f"   Regex (antigo):       {resultados['regex_s'] * 1000:8.1f} ms  ({megabytes / resultados['regex_s']:.1f} MB/s, texto truncado)")
+    print(f"   Tokenizador:          {resultados['tokenizador_s'] * 1000:8.1f} ms  ({megabytes / resultados['tokenizador_s']:.1f} MB/s)")
+    print(f"   Tokenizador + cache:  {resultados['tokenizador_cache_s'] * 1000:8.1f} ms  (hits: {cache.hits}, misses: {cache.misses})")
+    return resultados
+
+if __name__ == "__main__":
+    benchmark_limpeza()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Cliente paginado da API da Loja Integrada
+
+Substitui o "Gerar Offsets" (que estimava 500 produtos fixos) e os delays de
+2 segundos por página: a primeira página informa `meta.total_count`, as demais
+são buscadas em paralelo com um pool limitado e um rate limiter compartilhado
+que respeita os 429/Retry-After da API.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from cliente_http import TIMEOUT_PADRAO, obter_sessao
+from leitura_streaming import LeitorObjetos, abrir_resposta
+from metricas import metricas_ativas
+
+API_URL = "https://api.awsli.com.br"
+LIMITE_POR_PAGINA = 100
+
+class RateLimiter:
+    """Token bucket thread-safe compartilhado entre as threads do fetcher"""
+
+    def __init__(self, requisicoes_por_segundo: float = 5.0, rajada: int = 5):
+        self.taxa = requisicoes_por_segundo
+        self.capacidade = max(1, rajada)
+        self.tokens = float(self.capacidade)
+        self.atualizado_em = time.monotonic()
+        self.bloqueado_ate = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Bloqueia até haver um token disponível (e nenhum Retry-After pendente)"""
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                espera = self.bloqueado_ate - agora
+                if espera <= 0:
+                    self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+                    self.atualizado_em = agora
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+    def pause(self, segundos: float):
+        """Suspende todas as requisições por `segundos` (usado ao receber 429)"""
+        with self.lock:
+            self.bloqueado_ate = max(self.bloqueado_ate, time.monotonic() + segundos)
+            self.tokens = 0.0
+
+def interpretar_retry_after(valor: Optional[str], padrao: float = 2.0) -> float:
+    """Converte o cabeçalho Retry-After (segundos ou data HTTP) em segundos"""
+    if not valor:
+        return padrao
+    try:
+        return max(0.0, float(valor))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(valor).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return padrao
+
+def _offset_da_url(url: Optional[str]) -> Optional[int]:
+    if not url:
+        return None
+    valores = parse_qs(urlsplit(url).query).get('offset')
+    return int(valores[0]) if valores else None
+
+class LojaIntegradaClient:
+    def __init__(self, chave_api: str, aplicacao: str, base_url: str = API_URL,
+                 max_workers: int = 4, limite_por_pagina: int = LIMITE_POR_PAGINA,
+                 rate_limiter: Optional[RateLimiter] = None, max_tentativas: int = 5,
+                 timeout: float = TIMEOUT_PADRAO):
+        if max_tentativas < 1:
+            raise ValueError("max_tentativas deve ser pelo menos 1")
+        self.base_url = base_url.rstrip('/')
+        self.headers = {
+            "Authorization": f"chave_api {chave_api} aplicacao {aplicacao}",
+            "Content-Type": "application/json"
+        }
+        self.max_workers = max(1, max_workers)
+        self.limite_por_pagina = limite_por_pagina
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_tentativas = max_tentativas
+        self.timeout = timeout
+        # 429/5xx são tratados em `get_page` (o rate limiter precisa pausar todas as
+        # threads); a sessão compartilhada só repete falhas de conexão
+        self.session = obter_sessao(self.base_url, pool_size=self.max_workers, status_retry=())
+
+    def _request(self, url: str, params: Optional[Dict], descricao: str, aceitar_404: bool = False,
+                 stream: bool = False) -> Optional[requests.Response]:
+        """GET com rate limit, aguardando e repetindo em caso de 429/5xx"""
+        for tentativa in range(1, self.max_tentativas + 1):
+            self.rate_limiter.acquire()
+            response = self.session.get(url, params=params, headers=self.headers, timeout=self.timeout,
+                                        stream=stream)
+            if response.status_code == 429 or response.status_code >= 500:
+                if tentativa == self.max_tentativas:
+                    break
+                response.close()
+                metricas_ativas().contar('http_retentativas', host=urlsplit(url).netloc, status=response.status_code)
+                espera = interpretar_retry_after(response.headers.get('Retry-After'), padrao=float(tentativa))
+                if response.status_code == 429:
+                    self.rate_limiter.pause(espera)
+                else:
+                    time.sleep(espera)
+                continue
+            if aceitar_404 and response.status_code == 404:
+                response.close()
+                return None
+            response.raise_for_status()
+            return response
+        response.raise_for_status()
+        raise requests.HTTPError(f"Falha ao buscar {descricao}: {response.status_code}", response=response)
+
+    def _get(self, url: str, params: Optional[Dict], descricao: str, aceitar_404: bool = False) -> Optional[Dict]:
+        response = self._request(url, params, descricao, aceitar_404)
+        return response.json() if response is not None else None
+
+    def get_page(self, recurso: str, offset: int, params: Optional[Dict] = None,
+                 limite: Optional[int] = None) -> Dict:
+        """Busca uma página de `/v1/{recurso}`, aguardando e repetindo em caso de 429
+
+        A resposta é lida em stream (`LeitorObjetos`): o corpo inteiro (~1,2 MB
+        por página de produtos) nunca fica em memória junto com os objetos.
+        """
+        query = dict(params or {}, limit=limite or self.limite_por_pagina, offset=offset)
+        response = self._request(f"{self.base_url}/v1/{recurso}", query, f"{recurso} offset={offset}", stream=True)
+        with response:
+            leitor = LeitorObjetos(abrir_resposta(response))
+            objetos = list(leitor)
+        return {'meta': leitor.meta or {}, 'objects': objetos}
+
+    def get_resource(self, resource_uri: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """Busca um recurso pela URI (ex: `/api/v1/categoria/123`); `None` se não existir"""
+        caminho = resource_uri.strip()
+        if caminho.startswith('/api/'):
+            caminho = caminho[len('/api'):]
+        return self._get(f"{self.base_url}{caminho}", params, resource_uri, aceitar_404=True)
+
+    def iter_pages(self, recurso: str, params: Optional[Dict] = None,
+                   pular: Optional[Set[int]] = None) -> Iterator[Tuple[int, Dict]]:
+        """Gera `(offset, página)` para todas as páginas do recurso
+
+        A primeira página define o total; as restantes são buscadas em paralelo.
+        Se o catálogo crescer durante a execução, o `meta.next` da última página
+        é seguido até o fim, de forma que a listagem nunca é truncada.
+
+        Offsets em `pular` (páginas já baixadas por uma execução interrompida)
+        não são gerados; só a primeira e a última página são buscadas mesmo
+        assim, para conhecer o total e o `meta.next`.
+        """
+        pular = pular or set()
+        primeira = self.get_page(recurso, 0, params)
+        if 0 not in pular:
+            yield 0, primeira
+        meta = primeira.get('meta') or {}
+        total = int(meta.get('total_count') or 0)
+        offsets = list(range(self.limite_por_pagina, total, self.limite_por_pagina))
+        offsets = [offset for offset in offsets if offset not in pular or offset == offsets[-1]]
+
+        ultima_pagina = primeira
+        if offsets:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                for offset, pagina in zip(offsets, executor.map(lambda o: self.get_page(recurso, o, params), offsets)):
+                    ultima_pagina = pagina
+                    if offset not in pular:
+                        yield offset, pagina
+
+        proximo = _offset_da_url((ultima_pagina.get('meta') or {}).get('next'))
+        while proximo is not None:
+            pagina = self.get_page(recurso, proximo, params)
+            if proximo not in pular:
+                yield proximo, pagina
+            proximo = _offset_da_url((pagina.get('meta') or {}).get('next'))
+
+    def iter_objects(self, recurso: str, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """Gera os objetos do recurso um a um, lendo cada resposta em stream
+
+        As páginas são buscadas em sequência seguindo `meta.next`; nenhuma página
+        inteira fica em memória, só o objeto atual e um bloco da resposta.
+        """
+        offset = 0
+        while offset is not None:
+            query = dict(params or {}, limit=self.limite_por_pagina, offset=offset)
+            response = self._request(f"{self.base_url}/v1/{recurso}", query, f"{recurso} offset={offset}",
+                                     stream=True)
+            with response:
+                leitor = LeitorObjetos(abrir_resposta(response))
+                yield from leitor
+            offset = _offset_da_url((leitor.meta or {}).get('next'))
+
+    def fetch_all(self, recurso: str, params: Optional[Dict] = None) -> List[Dict]:
+        """Retorna todos os objetos do recurso, na ordem dos offsets"""
+        objetos = []
+        for _, pagina in self.iter_pages(recurso, params):
+            objetos.extend(pagina.get('objects') or [])
+        return objetos
+
+    def fetch_produtos(self) -> List[Dict]:
+        """Busca todos os produtos com a descrição em HTML"""
+        return self.fetch_all('produto', {'description_html': 1})
+
+    def fetch_precos(self) -> List[Dict]:
+        """Busca todos os preços de produtos"""
+        return self.fetch_all('produto_preco')
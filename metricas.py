@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Métricas, rastreamento por etapa e perfil da sincronização
+
+Toda a observabilidade era `console.log`/`print` por produto, o que deixava
+execuções grandes mais lentas e não podia ser agregado. `Metricas` reúne os
+tempos de cada etapa, contadores (com rótulos opcionais) e histogramas de
+latência; toda resposta HTTP das sessões de `cliente_http.py` é registrada
+(latência, status e retentativas, inclusive as feitas pelo urllib3). O
+resultado sai como relatório JSON ou no formato texto do Prometheus.
+
+`Perfilador` é opcional: envolve as etapas quentes com cProfile (um `.prof`
+por etapa, para `pstats`/snakeviz) ou com amostragem de pilhas (`.folded`,
+para flamegraph.pl/speedscope), sem custo quando desligado.
+"""
+
+import bisect
+import cProfile
+import json
+import logging
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# Limites (segundos) dos histogramas de latência HTTP
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_SEGMENTO_ID = re.compile(r'^\d+$')
+
+def rota_normalizada(url: str) -> str:
+    """Caminho da URL com os ids trocados por `:id`, para não explodir a cardinalidade dos rótulos"""
+    partes = urlsplit(url).path.split('/')
+    return '/'.join(':id' if _SEGMENTO_ID.match(parte) else parte for parte in partes)
+
+class Histograma:
+    """Histograma cumulativo no estilo Prometheus, com quantis interpolados dentro do bucket"""
+
+    def __init__(self, limites: Tuple[float, ...] = BUCKETS_LATENCIA):
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def quantil(self, q: float) -> float:
+        """Mesma aproximação do `histogram_quantile` do Prometheus"""
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for i, contagem in enumerate(self.contagens):
+            if acumulado + contagem >= alvo and contagem:
+                if i == len(self.limites):
+                    return self.limites[-1]
+                inferior = self.limites[i - 1] if i else 0.0
+                return inferior + (self.limites[i] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+    def resumo(self) -> Dict:
+        return {'total': self.total, 'soma_s': round(self.soma, 6), 'p50_s': round(self.quantil(0.5), 6),
+                'p95_s': round(self.quantil(0.95), 6), 'p99_s': round(self.quantil(0.99), 6)}
+
+def _escapar(valor: str) -> str:
+    return valor.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _rotulos_prometheus(rotulos: Tuple[Tuple[str, str], ...], **extra) -> str:
+    pares = [f'{chave}="{_escapar(valor)}"' for chave, valor in rotulos + tuple(extra.items())]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+class Metricas:
+    """Etapas (início/fim), contadores e histogramas de uma execução; seguro entre threads
+
+    Contadores sem rótulos ficam em `contadores` (nomes livres, ex:
+    `linhas_create`); com rótulos viram séries, como no Prometheus.
+    """
+
+    def __init__(self):
+        self.origem = time.perf_counter()
+        self.etapas: Dict[str, List[float]] = {}
+        self.contadores: Dict[str, int] = {}
+        self.series: Dict[Tuple[str, Tuple], float] = {}
+        self.histogramas: Dict[Tuple[str, Tuple], Histograma] = {}
+        self.lock = threading.Lock()
+
+    def iniciar(self, etapa: str):
+        with self.lock:
+            self.etapas.setdefault(etapa, [time.perf_counter(), 0.0])
+
+    def finalizar(self, etapa: str):
+        self.iniciar(etapa)
+        with self.lock:
+            self.etapas[etapa][1] = time.perf_counter()
+
+    def contar(self, nome: str, quantidade: float = 1, **rotulos):
+        with self.lock:
+            if rotulos:
+                chave = (nome, tuple(sorted((k, str(v)) for k, v in rotulos.items())))
+                self.series[chave] = self.series.get(chave, 0) + quantidade
+            else:
+                self.contadores[nome] = self.contadores.get(nome, 0) + quantidade
+
+    def observar(self, nome: str, valor: float, **rotulos):
+        chave = (nome, tuple(sorted((k, str(v)) for k, v in rotulos.items())))
+        with self.lock:
+            histograma = self.histogramas.get(chave)
+            if histograma is None:
+                histograma = self.histogramas[chave] = Histograma()
+            histograma.observar(valor)
+
+    def registrar_resposta(self, response):
+        """Latência, status e retentativas de uma resposta `requests`"""
+        requisicao = response.request
+        host = urlsplit(requisicao.url).netloc
+        rota = rota_normalizada(requisicao.url)
+        self.contar('http_requisicoes', host=host, metodo=requisicao.method, rota=rota,
+                    status=response.status_code)
+        self.observar('http_latencia_segundos', response.elapsed.total_seconds(), host=host, rota=rota)
+        if response.status_code == 429:
+            self.contar('http_429', host=host)
+        # Retentativas feitas pelo urllib3 (sessões com `Retry`) não geram respostas próprias
+        historico = getattr(getattr(response.raw, 'retries', None), 'history', None) or ()
+        for tentativa in historico:
+            self.contar('http_retentativas', host=host, status=tentativa.status or 'erro')
+            if tentativa.status == 429:
+                self.contar('http_429', host=host)
+
+    def relatorio(self) -> Dict:
+        with self.lock:
+            agora = time.perf_counter()
+            etapas = {
+                etapa: {
+                    'inicio_s': round(inicio - self.origem, 3),
+                    'fim_s': round(fim - self.origem, 3),
+                    'duracao_s': round(fim - inicio, 3)
+                }
+                for etapa, (inicio, fim) in self.etapas.items()
+            }
+            series = [{'nome': nome, 'rotulos': dict(rotulos), 'valor': valor}
+                      for (nome, rotulos), valor in sorted(self.series.items())]
+            histogramas = [dict({'nome': nome, 'rotulos': dict(rotulos)}, **histograma.resumo())
+                           for (nome, rotulos), histograma in sorted(self.histogramas.items())]
+            contadores = dict(self.contadores)
+        return {
+            'total_s': round(agora - self.origem, 3),
+            'etapas': etapas,
+            'contadores': contadores,
+            'series': series,
+            'histogramas': histogramas
+        }
+
+    def prometheus(self, prefixo: str = 'sync') -> str:
+        """Exposição no formato texto do Prometheus (para o textfile collector do node_exporter)"""
+        linhas = []
+        with self.lock:
+            agora = time.perf_counter()
+            linhas.append(f"# TYPE {prefixo}_execucao_duracao_segundos gauge")
+            linhas.append(f"{prefixo}_execucao_duracao_segundos {agora - self.origem:.6f}")
+            if self.etapas:
+                linhas.append(f"# TYPE {prefixo}_etapa_duracao_segundos gauge")
+                for etapa, (inicio, fim) in sorted(self.etapas.items()):
+                    linhas.append(f'{prefixo}_etapa_duracao_segundos{{etapa="{etapa}"}} {fim - inicio:.6f}')
+            for nome, valor in sorted(self.contadores.items()):
+                linhas.append(f"# TYPE {prefixo}_{nome}_total counter")
+                linhas.append(f"{prefixo}_{nome}_total {valor}")
+            ultimo = None
+            for (nome, rotulos), valor in sorted(self.series.items()):
+                if nome != ultimo:
+                    linhas.append(f"# TYPE {prefixo}_{nome}_total counter")
+                    ultimo = nome
+                linhas.append(f"{prefixo}_{nome}_total{_rotulos_prometheus(rotulos)} {valor}")
+            ultimo = None
+            for (nome, rotulos), histograma in sorted(self.histogramas.items()):
+                if nome != ultimo:
+                    linhas.append(f"# TYPE {prefixo}_{nome} histogram")
+                    ultimo = nome
+                acumulado = 0
+                limites = [f"{limite:g}" for limite in histograma.limites] + ['+Inf']
+                for limite, contagem in zip(limites, histograma.contagens):
+                    acumulado += contagem
+                    linhas.append(f"{prefixo}_{nome}_bucket{_rotulos_prometheus(rotulos, le=limite)} {acumulado}")
+                linhas.append(f"{prefixo}_{nome}_sum{_rotulos_prometheus(rotulos)} {histograma.soma:.6f}")
+                linhas.append(f"{prefixo}_{nome}_count{_rotulos_prometheus(rotulos)} {histograma.total}")
+        return '\n'.join(linhas) + '\n'
+
+    def salvar(self, caminho: str, formato: str = 'json'):
+        """Grava o relatório (`json`) ou a exposição do Prometheus (`prometheus`) de forma atômica"""
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            if formato == 'prometheus':
+                f.write(self.prometheus())
+            else:
+                json.dump(self.relatorio(), f, ensure_ascii=False, indent=2)
+        os.replace(temporario, caminho)
+
+    def imprimir(self):
+        relatorio = self.relatorio()
+        print("\n⏱️ Tempo por etapa (segundos desde o início)")
+        print(f"{'etapa':<16} | {'início':>7} | {'fim':>7} | {'duração':>8}")
+        print("-" * 48)
+        for etapa, tempos in relatorio['etapas'].items():
+            print(f"{etapa:<16} | {tempos['inicio_s']:>7.2f} | {tempos['fim_s']:>7.2f} | {tempos['duracao_s']:>8.2f}")
+        latencias = [h for h in relatorio['histogramas'] if h['nome'] == 'http_latencia_segundos']
+        if latencias:
+            print(f"\n🌐 {'host':<24} | {'rota':<40} | {'req':>5} | {'p50 ms':>7} | {'p95 ms':>7} | {'p99 ms':>7}")
+            for h in latencias:
+                print(f"   {h['rotulos']['host'][:24]:<24} | {h['rotulos']['rota'][:40]:<40} | {h['total']:>5} | "
+                      f"{h['p50_s'] * 1000:>7.1f} | {h['p95_s'] * 1000:>7.1f} | {h['p99_s'] * 1000:>7.1f}")
+        retentativas = sum(s['valor'] for s in relatorio['series'] if s['nome'] == 'http_retentativas')
+        respostas_429 = sum(s['valor'] for s in relatorio['series'] if s['nome'] == 'http_429')
+        print(f"\n🏁 Total: {relatorio['total_s']:.2f}s | {relatorio['contadores']} | "
+              f"retentativas HTTP: {retentativas} | 429: {respostas_429}")
+
+# Registro que recebe as respostas HTTP; cada execução do pipeline ativa o seu
+_ativas = Metricas()
+
+def ativar(metricas: Metricas):
+    global _ativas
+    _ativas = metricas
+
+def metricas_ativas() -> Metricas:
+    return _ativas
+
+def gancho_resposta(response, *args, **kwargs):
+    """Hook `response` do `requests`, instalado nas sessões de `cliente_http`"""
+    _ativas.registrar_resposta(response)
+    return response
+
+def configurar_log(nivel: str = 'INFO'):
+    """Log por produto só aparece em DEBUG; em produção (INFO) não há I/O por item"""
+    logging.basicConfig(level=getattr(logging, nivel.upper()), format='%(message)s')
+
+class Perfilador:
+    """Perfil opcional das etapas quentes: `cprofile` (determinístico) ou `amostragem` (pilhas)
+
+    Use `with perfilador.perfilar('etapa'):` em volta do código; funciona nas
+    threads do executor, cada chamada é perfilada na própria thread.
+    """
+
+    def __init__(self, modo: str = 'cprofile', pasta: str = os.path.join('estado', 'perfil'),
+                 intervalo: float = 0.005):
+        if modo not in ('cprofile', 'amostragem'):
+            raise ValueError("modo deve ser 'cprofile' ou 'amostragem'")
+        self.modo = modo
+        self.pasta = pasta
+        self.intervalo = intervalo
+        self.lock = threading.Lock()
+        self.estatisticas: Dict[str, pstats.Stats] = {}
+        self.threads: Dict[int, str] = {}
+        self.pilhas: Dict[str, Dict[str, int]] = {}
+        self._parar = threading.Event()
+        self._amostrador: Optional[threading.Thread] = None
+
+    @contextmanager
+    def perfilar(self, etapa: str) -> Iterator[None]:
+        if self.modo == 'amostragem':
+            self._iniciar_amostrador()
+            ident = threading.get_ident()
+            with self.lock:
+                self.threads[ident] = etapa
+            try:
+                yield
+            finally:
+                with self.lock:
+                    self.threads.pop(ident, None)
+            return
+        perfil = cProfile.Profile()
+        perfil.enable()
+        try:
+            yield
+        finally:
+            perfil.disable()
+            with self.lock:
+                if etapa in self.estatisticas:
+                    self.estatisticas[etapa].add(perfil)
+                else:
+                    self.estatisticas[etapa] = pstats.Stats(perfil)
+
+    def _iniciar_amostrador(self):
+        with self.lock:
+            if self._amostrador is not None:
+                return
+            self._amostrador = threading.Thread(target=self._amostrar, daemon=True)
+        self._amostrador.start()
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            frames = sys._current_frames()
+            with self.lock:
+                alvos = dict(self.threads)
+            for ident, etapa in alvos.items():
+                frame = frames.get(ident)
+                pilha = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    pilha.append(f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}")
+                    frame = frame.f_back
+                if pilha:
+                    chave = ';'.join(reversed(pilha))
+                    with self.lock:
+                        contagens = self.pilhas.setdefault(etapa, {})
+                        contagens[chave] = contagens.get(chave, 0) + 1
+
+    def salvar(self, top: int = 15) -> List[str]:
+        """Grava um arquivo por etapa e imprime as funções mais caras; retorna os caminhos"""
+        self._parar.set()
+        if self._amostrador is not None:
+            self._amostrador.join()
+        os.makedirs(self.pasta, exist_ok=True)
+        caminhos = []
+        for etapa, estatisticas in self.estatisticas.items():
+            caminho = os.path.join(self.pasta, f"{etapa}.prof")
+            estatisticas.dump_stats(caminho)
+            caminhos.append(caminho)
+            print(f"\n🔬 Perfil de {etapa} ({caminho})")
+            estatisticas.sort_stats('cumulative').print_stats(top)
+        for etapa, pilhas in self.pilhas.items():
+            caminho = os.path.join(self.pasta, f"{etapa}.folded")
+            with open(caminho, 'w', encoding='utf-8') as f:
+                for pilha, contagem in sorted(pilhas.items()):
+                    f.write(f"{pilha} {contagem}\n")
+            caminhos.append(caminho)
+            # Tempo "próprio": a função no topo de cada pilha amostrada
+            proprio: Dict[str, int] = {}
+            for pilha, contagem in pilhas.items():
+                funcao = pilha.rsplit(';', 1)[-1]
+                proprio[funcao] = proprio.get(funcao, 0) + contagem
+            total = sum(proprio.values())
+            print(f"\n🔬 Amostras de {etapa}: {total} ({caminho})")
+            for funcao, contagem in sorted(proprio.items(), key=lambda item: -item[1])[:top]:
+                print(f"   {contagem / total:6.1%}  {funcao}")
+        return caminhos
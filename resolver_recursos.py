@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Resolução de recursos referenciados pelos produtos (categorias, SEO, variações)
+
+Os produtos trazem `categorias`, `seo` e `variacoes` apenas como URIs
+(`/api/v1/categoria/18743069`), então o agente não filtrava por categoria nem
+respondia sobre variantes. O resolver deduplica as URIs de cada execução,
+consulta um cache SQLite com TTL (por padrão um dia) e só busca na API o que
+faltar: as categorias de uma vez pela listagem, o resto em paralelo. Os campos
+expandidos são acrescentados ao registro combinado.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+import requests
+
+from combinar_produtos import extrair_id_recurso
+
+ARQUIVO_CACHE = os.path.join('estado', 'recursos.sqlite')
+TTL_PADRAO = 24 * 60 * 60
+
+# Profundidade máxima ao subir por `categoria_pai`
+MAX_NIVEIS_CATEGORIA = 10
+
+def tipo_recurso(resource_uri: str) -> str:
+    """Tipo do recurso a partir da URI (ex: /api/v1/categoria/123 -> 'categoria')"""
+    partes = [parte for parte in str(resource_uri).split('/') if parte]
+    return partes[-2] if len(partes) >= 2 else ''
+
+class CacheRecursos:
+    """Cache `URI -> objeto` em SQLite com expiração por idade
+
+    Recursos inexistentes (404) também são guardados, como `None`, para não
+    serem buscados de novo a cada produto que os referencia.
+    """
+
+    def __init__(self, caminho: str = ARQUIVO_CACHE, ttl: float = TTL_PADRAO):
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self.ttl = ttl
+        # O resolver é chamado das threads do pipeline; o lock serializa o acesso
+        self.conn = sqlite3.connect(caminho, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS recursos ("
+            " uri TEXT PRIMARY KEY, dados TEXT, buscado_em REAL NOT NULL)"
+        )
+
+    def get_many(self, uris: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Retorna os recursos ainda dentro do TTL (ausentes ficam de fora)"""
+        uris = list(uris)
+        limite = time.time() - self.ttl
+        encontrados = {}
+        with self.lock:
+            for inicio in range(0, len(uris), 500):
+                parte = uris[inicio:inicio + 500]
+                marcadores = ','.join('?' * len(parte))
+                for uri, dados in self.conn.execute(
+                        f"SELECT uri, dados FROM recursos WHERE buscado_em >= ? AND uri IN ({marcadores})",
+                        [limite] + parte):
+                    encontrados[uri] = json.loads(dados) if dados is not None else None
+        return encontrados
+
+    def put_many(self, itens: Dict[str, Optional[Dict]]):
+        agora = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO recursos (uri, dados, buscado_em) VALUES (?, ?, ?)",
+                [(uri, json.dumps(dados, ensure_ascii=False) if dados is not None else None, agora)
+                 for uri, dados in itens.items()])
+            self.conn.commit()
+
+    def purge_expired(self) -> int:
+        """Remove as entradas vencidas; retorna quantas"""
+        with self.lock:
+            cursor = self.conn.execute("DELETE FROM recursos WHERE buscado_em < ?", (time.time() - self.ttl,))
+            self.conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+class ResolverRecursos:
+    """Resolve URIs de recursos com memória da execução, cache em disco e busca em lote
+
+    `cliente` é um `LojaIntegradaClient` (usa `get_resource` e `iter_pages`).
+    """
+
+    # Recursos pequenos o bastante para baixar a listagem inteira de uma vez
+    RECURSOS_LISTAVEIS = ('categoria',)
+
+    def __init__(self, cliente, cache: Optional[CacheRecursos] = None, max_workers: int = 4):
+        self.cliente = cliente
+        self.cache = cache or CacheRecursos()
+        self.max_workers = max(1, max_workers)
+        self.memoria: Dict[str, Optional[Dict]] = {}
+        self.listados: Set[str] = set()
+        self.buscados = 0
+        self.lock = threading.Lock()
+
+    def _listar(self, tipo: str) -> Dict[str, Dict]:
+        """Baixa a listagem completa de um tipo de recurso (vazia se a listagem falhar)"""
+        recursos = {}
+        try:
+            for _, pagina in self.cliente.iter_pages(tipo):
+                for objeto in pagina.get('objects') or []:
+                    uri = objeto.get('resource_uri') or f"/api/v1/{tipo}/{objeto.get('id')}"
+                    recursos[uri] = objeto
+        except requests.RequestException as e:
+            # Sem a listagem, cada recurso ainda é buscado individualmente
+            print(f"⚠️ Falha ao listar {tipo}: {e}")
+            return {}
+        return recursos
+
+    def resolve(self, uris: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """Retorna `URI -> objeto` (ou `None` se o recurso não existe)"""
+        with self.lock:
+            pedidos = {uri for uri in uris if uri}
+            faltando = pedidos - self.memoria.keys()
+            if faltando:
+                self.memoria.update(self.cache.get_many(faltando))
+                faltando -= self.memoria.keys()
+            if faltando:
+                novos: Dict[str, Optional[Dict]] = {}
+                for tipo in self.RECURSOS_LISTAVEIS:
+                    if tipo not in self.listados and any(tipo_recurso(uri) == tipo for uri in faltando):
+                        self.listados.add(tipo)
+                        novos.update(self._listar(tipo))
+                        self.buscados += 1
+                restantes = sorted(faltando - novos.keys())
+                if restantes:
+                    with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                        novos.update(zip(restantes, executor.map(self.cliente.get_resource, restantes)))
+                    self.buscados += len(restantes)
+                self.cache.put_many(novos)
+                self.memoria.update(novos)
+            return {uri: self.memoria.get(uri) for uri in pedidos}
+
+    def resolve_products(self, produtos: List[Dict]) -> Dict[str, Optional[Dict]]:
+        """Resolve tudo que uma página de produtos referencia, inclusive categorias-pai"""
+        uris = set()
+        for produto in produtos:
+            uris.update(produto.get('categorias') or [])
+            uris.update(produto.get('variacoes') or [])
+            if produto.get('seo'):
+                uris.add(produto['seo'])
+        recursos = self.resolve(uris)
+        pendentes = uris
+        for _ in range(MAX_NIVEIS_CATEGORIA):
+            pais = {(recursos.get(uri) or {}).get('categoria_pai') for uri in pendentes
+                    if tipo_recurso(uri) == 'categoria'}
+            pendentes = {uri for uri in pais if uri and uri not in recursos}
+            if not pendentes:
+                break
+            recursos.update(self.resolve(pendentes))
+        return recursos
+
+def caminho_categoria(uri: str, recursos: Dict[str, Optional[Dict]]) -> str:
+    """Nome completo da categoria seguindo `categoria_pai` (ex: 'Drones > DJI')"""
+    nomes = []
+    visitados = set()
+    while uri and uri not in visitados and len(nomes) < MAX_NIVEIS_CATEGORIA:
+        visitados.add(uri)
+        categoria = recursos.get(uri)
+        if not categoria:
+            break
+        nomes.append(categoria.get('nome') or '')
+        uri = categoria.get('categoria_pai')
+    return ' > '.join(nome for nome in reversed(nomes) if nome)
+
+# Campos que `expandir_campos` acrescenta ao registro (ausentes com `--sem-recursos`)
+CAMPOS_RECURSOS = ('categorias', 'ids_categorias', 'seo_titulo', 'seo_descricao', 'variacoes')
+
+def expandir_campos(produto: Dict, recursos: Dict[str, Optional[Dict]]) -> Dict:
+    """Campos expandidos de um produto, para acrescentar ao registro combinado"""
+    categorias = produto.get('categorias') or []
+    seo = recursos.get(produto.get('seo') or '') or {}
+    variacoes = []
+    for uri in produto.get('variacoes') or []:
+        variacao = recursos.get(uri)
+        if not variacao:
+            continue
+        linha = ' | '.join(parte for parte in (variacao.get('sku') or '', variacao.get('nome') or '') if parte)
+        variacoes.append(linha or extrair_id_recurso(uri))
+    return {
+        'categorias': '; '.join(filter(None, (caminho_categoria(uri, recursos) for uri in categorias))),
+        'ids_categorias': ','.join(extrair_id_recurso(uri) for uri in categorias),
+        'seo_titulo': seo.get('title') or '',
+        'seo_descricao': seo.get('description') or '',
+        'variacoes': '\n'.join(variacoes)
+    }
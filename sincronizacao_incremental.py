@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Sincronização incremental por fingerprint de conteúdo
+
+O node "Combinar Produtos e Preços" marcava `acao = 'update'` para todo produto
+já existente e carimbava um `data_sincronizacao` novo, regravando o catálogo
+inteiro a cada execução. Aqui cada registro normalizado (campos de
+`mapeamento_campos_baserow.json`) recebe um fingerprint guardado em um estado
+local; só são emitidos creates, updates reais e deletes. O fingerprint tem o
+formato `<base>.<recursos16>`: o SHA-256 dos campos da listagem de produtos e
+preços, e os 16 primeiros dígitos hexadecimais do SHA-256 dos campos de
+`CAMPOS_RECURSOS` (categorias, SEO e variações).
+
+Produtos que sumiram da API ou vieram com `removido` são reconciliados conforme
+a política: excluídos do Baserow, desativados (`ativo = false`, `removido =
+true`) ou mantidos.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from resolver_recursos import CAMPOS_RECURSOS
+
+ARQUIVO_MAPEAMENTO = 'mapeamento_campos_baserow.json'
+ARQUIVO_ESTADO = os.path.join('estado', 'fingerprints.json')
+
+# Campos que mudam a cada execução e não representam alteração do produto
+CAMPOS_VOLATEIS = ('data_sincronizacao',)
+
+# Políticas para produtos removidos na Loja Integrada
+POLITICAS_REMOCAO = ('excluir', 'desativar', 'nenhuma')
+
+# Valor guardado no estado para produtos já desativados no Baserow
+MARCA_DESATIVADO = 'desativado'
+
+def carregar_campos_mapeados(arquivo: str = ARQUIVO_MAPEAMENTO, tabela: str = 'produtos_pincbar') -> List[str]:
+    """Lista os campos do registro combinado que participam do fingerprint"""
+    with open(arquivo, 'r', encoding='utf-8') as f:
+        mapeamento = json.load(f)[tabela]
+    return [campo for campo in mapeamento if campo not in CAMPOS_VOLATEIS]
+
+def normalizar_registro(registro: Dict, campos: Iterable[str]) -> Dict:
+    """Mantém só os campos mapeados, com `None` tratado como string vazia"""
+    normalizado = {}
+    for campo in campos:
+        valor = registro.get(campo)
+        if valor is None:
+            valor = ''
+        elif isinstance(valor, str):
+            valor = valor.strip()
+        normalizado[campo] = valor
+    normalizado['id_produto_loja_integrada'] = str(registro.get('id_produto_loja_integrada', ''))
+    return normalizado
+
+def _hash_normalizado(registro: Dict, campos: Iterable[str]) -> str:
+    conteudo = json.dumps(normalizar_registro(registro, campos), sort_keys=True,
+                          ensure_ascii=False, separators=(',', ':'), default=str)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def calcular_fingerprint(registro: Dict, campos: Iterable[str]) -> str:
+    """Fingerprint estável do registro normalizado
+
+    A base e os recursos são separados para que uma execução sem a expansão de
+    recursos compare só a base (ver `DetectorMudancas.classificar`).
+    """
+    campos = list(campos)
+    base = _hash_normalizado(registro, [campo for campo in campos if campo not in CAMPOS_RECURSOS])
+    recursos = _hash_normalizado(registro, [campo for campo in campos if campo in CAMPOS_RECURSOS])
+    return f"{base}.{recursos[:16]}"
+
+class EstadoSincronizacao:
+    """Armazena `id_produto_loja_integrada -> fingerprint` em um arquivo JSON local"""
+
+    def __init__(self, caminho: str = ARQUIVO_ESTADO):
+        self.caminho = caminho
+        self.fingerprints: Dict[str, str] = {}
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self.fingerprints = json.load(f)
+
+    def get(self, produto_id: str) -> Optional[str]:
+        return self.fingerprints.get(str(produto_id))
+
+    def registrar(self, operacoes: Iterable[Dict], fingerprints: Dict[str, str]):
+        """Registra no estado em memória operações já confirmadas pelo Baserow"""
+        for operacao in operacoes:
+            produto_id = operacao['id_produto_loja_integrada']
+            if operacao.get('acao') == 'delete':
+                self.fingerprints.pop(produto_id, None)
+            elif operacao.get('acao') == 'desativar':
+                self.fingerprints[produto_id] = MARCA_DESATIVADO
+            else:
+                self.fingerprints[produto_id] = fingerprints[produto_id]
+
+    def atualizar(self, resultado: 'ResultadoDelta'):
+        """Aplica um delta já gravado no Baserow ao estado em memória"""
+        self.registrar(resultado.operacoes, resultado.fingerprints)
+
+    def save(self):
+        """Grava o estado de forma atômica (arquivo temporário + rename)"""
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        temporario = f"{self.caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(self.fingerprints, f, ensure_ascii=False, sort_keys=True)
+        os.replace(temporario, self.caminho)
+
+# Ação da operação -> lista do `ResultadoDelta` onde ela é guardada
+_LISTAS_DELTA = {'create': 'creates', 'update': 'updates', 'delete': 'deletes', 'desativar': 'desativados'}
+
+@dataclass
+class ResultadoDelta:
+    """Delta de uma execução (ou de um lote)
+
+    Com `guardar_operacoes=False` as listas de operações ficam vazias e só a
+    contagem por ação e os ids removidos são mantidos: o pipeline em fluxo já
+    repassa cada operação adiante e não precisa do catálogo alterado inteiro.
+    """
+    creates: List[Dict] = field(default_factory=list)
+    updates: List[Dict] = field(default_factory=list)
+    deletes: List[Dict] = field(default_factory=list)
+    desativados: List[Dict] = field(default_factory=list)
+    inalterados: int = 0
+    fingerprints: Dict[str, str] = field(default_factory=dict)
+    contagem: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(_LISTAS_DELTA, 0))
+    ids_removidos: List[str] = field(default_factory=list)
+    guardar_operacoes: bool = True
+
+    def adicionar(self, operacao: Dict):
+        acao = operacao['acao']
+        self.contagem[acao] += 1
+        if acao in ('delete', 'desativar'):
+            self.ids_removidos.append(operacao['id_produto_loja_integrada'])
+        if self.guardar_operacoes:
+            getattr(self, _LISTAS_DELTA[acao]).append(operacao)
+
+    @property
+    def operacoes(self) -> List[Dict]:
+        return self.creates + self.updates + self.deletes + self.desativados
+
+    @property
+    def removidos(self) -> List[str]:
+        """IDs que devem sair dos caches e índices downstream"""
+        return self.ids_removidos
+
+    @classmethod
+    def de_lote(cls, lote: Iterable[Dict]) -> 'ResultadoDelta':
+        """Delta com um único lote já confirmado, para repassar aos índices downstream"""
+        delta = cls()
+        for operacao in lote:
+            delta.adicionar(operacao)
+        return delta
+
+    def resumo(self) -> Dict[str, int]:
+        return dict(self.contagem, inalterados=self.inalterados)
+
+class DetectorMudancas:
+    """Classifica registros um a um, para uso em pipelines que processam em fluxo
+
+    `mapa_baserow` é o índice `ID Produto Loja Integrada -> id da linha`. Quando
+    informado, ele decide entre create e update; sem ele, o próprio estado é
+    usado como referência do que já existe. `politica_remocao` é uma de
+    `POLITICAS_REMOCAO`. Com `guardar_operacoes=False`, o `resultado` guarda
+    só contagens e ids (ver `ResultadoDelta`).
+    """
+
+    def __init__(self, estado: EstadoSincronizacao, mapa_baserow: Optional[Dict[str, int]] = None,
+                 campos: Optional[List[str]] = None, politica_remocao: str = 'excluir',
+                 guardar_operacoes: bool = True):
+        if politica_remocao not in POLITICAS_REMOCAO:
+            raise ValueError(f"politica_remocao deve ser uma de {POLITICAS_REMOCAO}")
+        self.politica_remocao = politica_remocao
+        self.remocoes_bloqueadas = 0
+        self.estado = estado
+        self.campos = campos or carregar_campos_mapeados()
+        self.existentes = {str(k): v for k, v in mapa_baserow.items()} if mapa_baserow is not None else None
+        self.agora = datetime.now(timezone.utc).isoformat()
+        self.resultado = ResultadoDelta(guardar_operacoes=guardar_operacoes)
+        self.vistos = set()
+
+    def classificar(self, registro: Dict) -> Optional[Dict]:
+        """Retorna a operação (create/update) do registro, ou `None` se nada mudou"""
+        produto_id = str(registro.get('id_produto_loja_integrada', ''))
+        if not produto_id or produto_id in self.vistos:
+            return None
+        self.vistos.add(produto_id)
+        if registro.get('removido') is True and self.politica_remocao != 'nenhuma':
+            return self._remover(produto_id)
+        fingerprint = calcular_fingerprint(registro, self.campos)
+        anterior = self.estado.get(produto_id)
+        if anterior and not any(campo in registro for campo in CAMPOS_RECURSOS):
+            # Sem a expansão de recursos: compara só a base e mantém a parte dos recursos já
+            # gravados, que o update também não sobrescreve (`mapear_para_ids` pula campos ausentes)
+            _, separador, recursos = anterior.partition('.')
+            if separador:
+                fingerprint = f"{fingerprint.partition('.')[0]}.{recursos}"
+        self.resultado.fingerprints[produto_id] = fingerprint
+
+        existe = self._existe(produto_id)
+        if existe and anterior == fingerprint:
+            self.resultado.inalterados += 1
+            return None
+
+        operacao = dict(registro, id_produto_loja_integrada=produto_id, data_sincronizacao=self.agora)
+        if existe:
+            operacao['acao'] = 'update'
+            if self.existentes is not None:
+                operacao['id_baserow'] = self.existentes[produto_id]
+        else:
+            operacao['acao'] = 'create'
+        self.resultado.adicionar(operacao)
+        return operacao
+
+    def _existe(self, produto_id: str) -> bool:
+        if self.existentes is not None:
+            return produto_id in self.existentes
+        return self.estado.get(produto_id) is not None
+
+    def _remover(self, produto_id: str) -> Optional[Dict]:
+        """Operação de delete/desativação para um produto que ainda está no Baserow"""
+        if not self._existe(produto_id):
+            return None
+        if self.politica_remocao == 'desativar':
+            if self.estado.get(produto_id) == MARCA_DESATIVADO:
+                return None
+            operacao = {'id_produto_loja_integrada': produto_id, 'acao': 'desativar',
+                        'ativo': False, 'removido': True}
+        else:
+            operacao = {'id_produto_loja_integrada': produto_id, 'acao': 'delete'}
+        if self.existentes is not None:
+            operacao['id_baserow'] = self.existentes[produto_id]
+        self.resultado.adicionar(operacao)
+        return operacao
+
+    def remocoes(self, limite_fracao: Optional[float] = None) -> List[Dict]:
+        """Operações de remoção para os produtos que não apareceram nesta execução
+
+        Com `limite_fracao`, nada é removido se os ausentes passarem dessa fração
+        do que já existe (proteção contra uma listagem incompleta da API); a
+        quantidade fica em `remocoes_bloqueadas`. Produtos já desativados em
+        execuções anteriores ficam fora da conta: eles nunca voltam na listagem e,
+        acumulados, bloqueariam toda remoção futura.
+        """
+        if self.politica_remocao == 'nenhuma':
+            return []
+        anteriores = self.existentes.keys() if self.existentes is not None else self.estado.fingerprints.keys()
+        desativados = {produto_id for produto_id in anteriores if self.estado.get(produto_id) == MARCA_DESATIVADO}
+        ausentes = sorted(set(anteriores) - self.vistos - desativados)
+        ativos = len(anteriores) - len(desativados)
+        if limite_fracao is not None and ausentes and len(ausentes) > limite_fracao * ativos:
+            self.remocoes_bloqueadas = len(ausentes)
+            return []
+        if self.politica_remocao == 'excluir':
+            # Desativados por uma política anterior também saem ao trocar para exclusão
+            ausentes += sorted(desativados - self.vistos)
+        return [operacao for operacao in map(self._remover, ausentes) if operacao is not None]
+
+def detectar_mudancas(registros: Iterable[Dict], estado: EstadoSincronizacao,
+                      mapa_baserow: Optional[Dict[str, int]] = None,
+                      campos: Optional[List[str]] = None,
+                      detectar_remocoes: bool = True, politica_remocao: str = 'excluir') -> ResultadoDelta:
+    """Compara os registros combinados com o estado e emite apenas o que mudou"""
+    detector = DetectorMudancas(estado, mapa_baserow, campos, politica_remocao)
+    for registro in registros:
+        detector.classificar(registro)
+    if detectar_remocoes:
+        detector.remocoes()
+    return detector.resultado
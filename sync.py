@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Sincronização Loja Integrada -> Baserow em pipeline asyncio
+
+Substitui a cadeia sequencial do n8n ("Schedule Trigger → Gerar Offsets →
+Iterar Produtos/Preços → Baserow2 → Combinar → Processar Individualmente →
+Switch"). Produtos, preços e o índice do Baserow são baixados ao mesmo tempo;
+cada página de produtos é combinada, normalizada e comparada assim que chega,
+e a gravação em lote começa antes da última página. Filas limitadas garantem
+que nenhuma etapa acumule o catálogo inteiro em memória.
+
+Cada página e cada lote confirmado vão para o journal (`journal_sync.py`); uma
+execução interrompida é retomada do último lote confirmado. Ao final, os
+produtos que sumiram da API (ou vieram com `removido`) são desativados ou
+excluídos em lote. O snapshot de preços de cada execução é anexado ao
+histórico colunar (`historico_precos.py`).
+
+Com `--embeddings`, cada página combinada também passa por `gerar_embeddings`
+(`embeddings.py`) em uma thread própria: só textos que mudaram vão ao
+embedder, o resto sai do cache. Ao fim de uma sincronização completa com
+mudanças, o vector store é reconstruído com os vetores dos produtos vistos.
+Com `--faq local|openai`, os produtos criados ou alterados de cada página vão
+para `gerar_faq` (`faq_produtos.py`), também em uma thread própria; o cache
+por hash evita chamar o modelo de novo para o mesmo conteúdo.
+
+Cada lote confirmado também é repassado, como `ResultadoDelta`, aos índices
+downstream (`assinantes`, objetos com `apply_delta`). Os persistidos em disco
+entram sozinhos quando existem: o vector store (removidos viram lápides, a
+menos que ele vá ser reconstruído) e o cache de FAQ (removidos perdem o FAQ).
+Os demais não precisam de purga aqui: o cache de embeddings é endereçado pelo
+hash do texto (nada aponta para o produto; entradas órfãs saem pelo LRU), o
+cache de respostas se invalida relendo o arquivo de fingerprints, e o BM25
+(`busca_hibrida.py`) e o índice de preços (`indice_precos.py`) vivem na memória
+do processo do agente, que os passa em `assinantes` quando roda a sincronização
+no mesmo processo.
+
+Uso:
+    python sync.py --config config_baserow.json [--dry-run] [--workers 4] [--recomecar] [--embeddings]
+                   [--faq local|openai]
+                   [--relatorio r.json] [--prometheus sync.prom] [--perfil cprofile] [--log-nivel DEBUG]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from combinar_produtos import indexar_precos, montar_registro
+from configurar_baserow import ARQUIVO_CAMPOS, TAMANHO_LOTE_BASEROW, BaserowConfig, mapear_para_ids
+from embeddings import ARQUIVO_CACHE as ARQUIVO_EMBEDDINGS, CacheEmbeddings, EmbedderHash, gerar_embeddings
+from faq_produtos import ARQUIVO_CACHE as ARQUIVO_FAQ, MODELOS as MODELOS_FAQ, CacheFAQ, criar_modelo, gerar_faq
+from historico_precos import PASTA_HISTORICO, GravacaoHistorico, HistoricoPrecos
+from journal_sync import ARQUIVO_JOURNAL, JournalSync
+from loja_integrada import API_URL, LojaIntegradaClient
+from metricas import Metricas, Perfilador, ativar, configurar_log
+from resolver_recursos import ARQUIVO_CACHE as ARQUIVO_RECURSOS, CacheRecursos, ResolverRecursos, expandir_campos
+from sincronizacao_incremental import (ARQUIVO_ESTADO, ARQUIVO_MAPEAMENTO, POLITICAS_REMOCAO,
+                                       DetectorMudancas, EstadoSincronizacao, ResultadoDelta)
+from vector_store import PASTA_PADRAO as PASTA_VECTOR_STORE, VectorStore
+
+_FIM = object()
+
+log = logging.getLogger('sync')
+
+@dataclass
+class ConfigSync:
+    chave_api: str
+    aplicacao: str
+    baserow_url: str
+    baserow_token: str
+    tabela_id: int
+    loja_url: str = API_URL
+    max_workers: int = 4
+    arquivo_estado: str = ARQUIVO_ESTADO
+    arquivo_mapeamento: str = ARQUIVO_MAPEAMENTO
+    arquivo_journal: str = ARQUIVO_JOURNAL
+    arquivo_campos: str = ARQUIVO_CAMPOS
+    arquivo_recursos: str = ARQUIVO_RECURSOS
+    pasta_vector_store: str = PASTA_VECTOR_STORE
+    pasta_historico: str = PASTA_HISTORICO
+    arquivo_faq: str = ARQUIVO_FAQ
+    arquivo_embeddings: str = ARQUIVO_EMBEDDINGS
+    dry_run: bool = False
+    politica_remocao: str = 'desativar'
+    # Acima desta fração do catálogo ausente, a listagem é tratada como incompleta
+    limite_remocao: float = 0.5
+    retomar: bool = True
+    expandir_recursos: bool = True
+    registrar_historico: bool = True
+    # Embeda as páginas combinadas e reconstrói o vector store ao fim da completa
+    embeddings: bool = False
+    # Gera o FAQ dos produtos criados/alterados com o modelo `local` ou `openai`
+    faq: Optional[str] = None
+
+def carregar_config(caminho: str = 'config_baserow.json', **extras) -> ConfigSync:
+    """Lê `config_baserow.json` (seções `loja_integrada` e `baserow`)"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    return config_das_secoes(dados['loja_integrada'], dados['baserow'], **extras)
+
+def config_das_secoes(loja: Dict, baserow: Dict, **extras) -> ConfigSync:
+    """Monta a `ConfigSync` a partir das seções `loja_integrada` e `baserow` já lidas"""
+    return ConfigSync(
+        chave_api=loja['chave_api'],
+        aplicacao=loja['aplicacao'],
+        loja_url=loja.get('url', API_URL),
+        baserow_url=baserow['url'],
+        baserow_token=baserow['token'],
+        tabela_id=int(baserow['tables']['produtos']['id']),
+        **extras
+    )
+
+async def bombear(iterador: Callable[[], Iterable], fila: asyncio.Queue):
+    """Roda um iterador bloqueante em uma thread e publica os itens na fila
+
+    A fila limitada aplica backpressure: a thread espera enquanto o consumidor
+    não acompanha. Ao terminar (ou falhar) publica `_FIM`; erros são repassados.
+    """
+    loop = asyncio.get_running_loop()
+
+    def sinalizar_fim():
+        try:
+            fila.put_nowait(_FIM)
+        except asyncio.QueueFull:
+            pass
+
+    def produzir():
+        try:
+            for item in iterador():
+                asyncio.run_coroutine_threadsafe(fila.put(item), loop).result()
+            asyncio.run_coroutine_threadsafe(fila.put(_FIM), loop).result()
+        except BaseException:
+            # Em caso de erro não bloqueia a thread esperando espaço na fila
+            try:
+                loop.call_soon_threadsafe(sinalizar_fim)
+            except RuntimeError:
+                pass
+            raise
+
+    await loop.run_in_executor(None, produzir)
+
+class SyncPipeline:
+    def __init__(self, config: ConfigSync, loja: Optional[LojaIntegradaClient] = None,
+                 baserow: Optional[BaserowConfig] = None, tamanho_fila: int = 4,
+                 perfilador: Optional[Perfilador] = None, assinantes: Iterable = (), embedder=None,
+                 modelo_faq=None):
+        self.config = config
+        self.loja = loja or LojaIntegradaClient(config.chave_api, config.aplicacao, base_url=config.loja_url,
+                                                max_workers=config.max_workers)
+        self.baserow = baserow or BaserowConfig(config.baserow_url, config.baserow_token)
+        self.estado = EstadoSincronizacao(config.arquivo_estado)
+        with open(config.arquivo_mapeamento, 'r', encoding='utf-8') as f:
+            self.mapeamento = json.load(f)['produtos_pincbar']
+        self.ids_campos: Dict[str, int] = {}
+        self.tamanho_fila = tamanho_fila
+        self.metricas = Metricas()
+        self.perfilador = perfilador
+        self.detector: Optional[DetectorMudancas] = None
+        self.resolver = (ResolverRecursos(self.loja, CacheRecursos(config.arquivo_recursos),
+                                          max_workers=config.max_workers)
+                         if config.expandir_recursos else None)
+        # Em dry-run nada é gravado, então não há o que retomar
+        self.journal = None if config.dry_run else JournalSync(config.arquivo_journal)
+        # Sincronização parcial: `id do produto -> preço` vindos do agendador
+        self.parcial: Optional[Dict[str, Dict]] = None
+        self.historico: Optional[GravacaoHistorico] = None
+        # Índices downstream que recebem cada lote confirmado (`apply_delta`)
+        self.assinantes = list(assinantes)
+        # Etapa de embeddings: uma thread só, dona da conexão SQLite do cache
+        self.embedder = embedder or EmbedderHash()
+        self.executor_embeddings = (ThreadPoolExecutor(max_workers=1, thread_name_prefix='embeddings')
+                                    if config.embeddings and not config.dry_run else None)
+        self.cache_embeddings: Optional[CacheEmbeddings] = None
+        self._embedando: Optional[asyncio.Future] = None
+        # `id do produto -> (hash do texto, ativo, sob consulta)` dos produtos embedados nesta execução
+        self.vetores_produtos: Dict[str, Tuple[str, bool, bool]] = {}
+        # Etapa de FAQ: idem, com o cache de FAQ e as chamadas ao modelo
+        self.executor_faq = (ThreadPoolExecutor(max_workers=1, thread_name_prefix='faq')
+                             if config.faq and not config.dry_run else None)
+        self.modelo_faq = modelo_faq or (criar_modelo(config.faq) if self.executor_faq is not None else None)
+        self.cache_faq: Optional[CacheFAQ] = None
+        self._gerando_faq: Optional[asyncio.Future] = None
+
+    async def _baixar_precos(self) -> Dict[str, Dict]:
+        self.metricas.iniciar('precos')
+        if self.parcial is not None:
+            self.metricas.finalizar('precos')
+            return indexar_precos(self.parcial.values())
+        precos = []
+        retomadas = set()
+        if self.journal is not None:
+            for offset, objetos in self.journal.pages('produto_preco'):
+                retomadas.add(offset)
+                precos.extend(objetos)
+                self.metricas.contar('paginas_retomadas')
+        fila: asyncio.Queue = asyncio.Queue(self.tamanho_fila)
+        tarefa = asyncio.ensure_future(bombear(lambda: self.loja.iter_pages('produto_preco', pular=retomadas), fila))
+        while True:
+            item = await fila.get()
+            if item is _FIM:
+                break
+            offset, pagina = item
+            objetos = pagina.get('objects') or []
+            if self.journal is not None:
+                self.journal.record_page('produto_preco', offset, objetos)
+            precos.extend(objetos)
+            self.metricas.contar('paginas_precos')
+        await tarefa
+        self.metricas.finalizar('precos')
+        return indexar_precos(precos)
+
+    async def _indice_baserow(self) -> Dict[str, int]:
+        self.metricas.iniciar('indice_baserow')
+        loop = asyncio.get_running_loop()
+        if not self.config.dry_run:
+            # Ids dos campos vêm do cache local; o Baserow só é consultado se faltar algum
+            self.ids_campos = await loop.run_in_executor(
+                None, self.baserow.field_ids, self.config.tabela_id, self.mapeamento.values(),
+                self.config.arquivo_campos)
+        if self.parcial is not None:
+            indice = await loop.run_in_executor(None, self.baserow.find_product_rows, self.config.tabela_id,
+                                                list(self.parcial))
+        else:
+            indice = await loop.run_in_executor(None, self.baserow.build_product_index, self.config.tabela_id)
+        self.metricas.contar('linhas_baserow', len(indice))
+        self.metricas.finalizar('indice_baserow')
+        return indice
+
+    @staticmethod
+    def _classificar(registros: List[Dict], detector: DetectorMudancas) -> List[Dict]:
+        operacoes = []
+        # Log por produto só em DEBUG: em catálogos grandes o I/O pesa mais que o diff
+        depurar = log.isEnabledFor(logging.DEBUG)
+        for registro in registros:
+            operacao = detector.classificar(registro)
+            if operacao is not None:
+                operacoes.append(operacao)
+            if depurar:
+                log.debug("   %s %s", operacao['acao'] if operacao else 'inalterado',
+                          registro.get('id_produto_loja_integrada'))
+        return operacoes
+
+    def _perfil(self, etapa: str):
+        """Contexto de perfil da etapa, ou um contexto vazio quando o perfil está desligado"""
+        return self.perfilador.perfilar(etapa) if self.perfilador is not None else nullcontext()
+
+    def _processar_pagina(self, pagina: Dict, indice_precos: Dict[str, Dict],
+                          detector: DetectorMudancas) -> Tuple[List[Dict], List[Dict]]:
+        """Combina, normaliza e compara uma página de produtos (roda em thread)"""
+        with self._perfil('combinar_diff'):
+            produtos = [produto for produto in pagina.get('objects') or []
+                        if str(produto.get('id', '')) in indice_precos]
+            recursos = self.resolver.resolve_products(produtos) if self.resolver is not None else None
+            registros = []
+            for produto in produtos:
+                registro = montar_registro(produto, indice_precos[str(produto.get('id', ''))])
+                if recursos is not None:
+                    registro.update(expandir_campos(produto, recursos))
+                registros.append(registro)
+            return registros, self._classificar(registros, detector)
+
+    async def _combinar(self, paginas: asyncio.Queue, saida: asyncio.Queue, precos: 'asyncio.Future',
+                        indice_baserow: 'asyncio.Future', download: 'asyncio.Future') -> DetectorMudancas:
+        indice_precos = await precos
+        # As operações seguem pela fila; o resultado guarda só contagens e ids
+        detector = self.detector = DetectorMudancas(self.estado, await indice_baserow,
+                                                    politica_remocao=self.config.politica_remocao,
+                                                    guardar_operacoes=False)
+        self.metricas.iniciar('combinar_diff')
+        loop = asyncio.get_running_loop()
+        if self.journal is not None:
+            # Snapshot das páginas combinadas antes da interrupção
+            for _, registros in self.journal.pages('produto'):
+                if self.historico is not None:
+                    self.historico.add(registros)
+                await self._enfileirar_embeddings(registros)
+                operacoes = self._classificar(registros, detector)
+                await self._enfileirar_faq(operacoes)
+                for operacao in operacoes:
+                    await saida.put(operacao)
+        while True:
+            item = await paginas.get()
+            if item is _FIM:
+                break
+            offset, pagina = item
+            self.metricas.contar('paginas_produtos')
+            registros, operacoes = await loop.run_in_executor(
+                None, self._processar_pagina, pagina, indice_precos, detector)
+            if self.journal is not None:
+                self.journal.record_page('produto', offset, registros)
+            if self.historico is not None:
+                self.historico.add(registros)
+            await self._enfileirar_embeddings(registros)
+            await self._enfileirar_faq(operacoes)
+            for operacao in operacoes:
+                await saida.put(operacao)
+        for etapa in (self._embedando, self._gerando_faq):
+            if etapa is not None:
+                await etapa
+        # Remoções só depois de confirmar que o download terminou sem erro
+        await download
+        remocoes = detector.remocoes(self.config.limite_remocao) if self.parcial is None else []
+        for operacao in remocoes:
+            await saida.put(operacao)
+        if detector.remocoes_bloqueadas:
+            print(f"⚠️ {detector.remocoes_bloqueadas} produtos ausentes (mais de "
+                  f"{self.config.limite_remocao:.0%} do Baserow): remoção ignorada nesta execução")
+            self.metricas.contar('remocoes_bloqueadas', detector.remocoes_bloqueadas)
+        await saida.put(_FIM)
+        self.metricas.finalizar('combinar_diff')
+        return detector
+
+    async def _enfileirar_embeddings(self, registros: List[Dict]):
+        """Manda a página para a thread de embeddings, com no máximo uma página em andamento"""
+        if self.executor_embeddings is None:
+            return
+        if self._embedando is not None:
+            await self._embedando
+        self._embedando = asyncio.get_running_loop().run_in_executor(
+            self.executor_embeddings, self._embedar, registros)
+
+    def _embedar(self, registros: List[Dict]):
+        """Gera (ou reaproveita do cache) os vetores de uma página (roda na thread de embeddings)"""
+        if self.cache_embeddings is None:
+            # A conexão SQLite só pode ser usada na thread que a abriu
+            self.cache_embeddings = CacheEmbeddings(self.config.arquivo_embeddings)
+        registros = [registro for registro in registros
+                     if registro.get('id_produto_loja_integrada') and registro.get('removido') is not True]
+        with self._perfil('embeddings'):
+            resultado = gerar_embeddings(registros, self.embedder, self.cache_embeddings)
+        for produto_id, chave, registro in zip(resultado.ids, resultado.chaves, registros):
+            self.vetores_produtos[produto_id] = (chave, registro.get('ativo') is not False,
+                                                 registro.get('sob_consulta') is True)
+        self.metricas.contar('embeddings_gerados', resultado.gerados)
+        self.metricas.contar('embeddings_reaproveitados', resultado.reaproveitados)
+
+    async def _enfileirar_faq(self, operacoes: List[Dict]):
+        """Manda os produtos criados/alterados da página para a thread de FAQ, uma página por vez"""
+        if self.executor_faq is None:
+            return
+        registros = [operacao for operacao in operacoes if operacao['acao'] in ('create', 'update')]
+        if not registros:
+            return
+        if self._gerando_faq is not None:
+            await self._gerando_faq
+        self._gerando_faq = asyncio.get_running_loop().run_in_executor(self.executor_faq, self._gerar_faq, registros)
+
+    def _gerar_faq(self, registros: List[Dict]):
+        """Gera (ou reaproveita do cache) o FAQ dos produtos (roda na thread de FAQ)"""
+        if self.cache_faq is None:
+            # Conexão própria da thread; a do `_abrir_indices` fica com a purga no loop
+            self.cache_faq = CacheFAQ(self.config.arquivo_faq)
+        with self._perfil('faq'):
+            resultado = gerar_faq(registros, self.modelo_faq, self.cache_faq, max_workers=self.config.max_workers)
+        self.metricas.contar('faq_gerados', resultado.gerados)
+        self.metricas.contar('faq_reaproveitados', resultado.reaproveitados)
+        self.metricas.contar('faq_falhas', len(resultado.falhas))
+
+    def _fechar_faq(self):
+        if self.cache_faq is not None:
+            self.cache_faq.close()
+            self.cache_faq = None
+
+    def _reconstruir_vector_store(self) -> int:
+        """Reconstrói o vector store com os produtos embedados nesta execução (thread de embeddings)"""
+        if self.cache_embeddings is None:
+            return 0
+        vetores = self.cache_embeddings.get_many(
+            self.embedder.nome, list({chave for chave, _, _ in self.vetores_produtos.values()}))
+        # Um vetor despejado do cache no meio da execução só volta na próxima
+        ids = [produto_id for produto_id, (chave, _, _) in self.vetores_produtos.items() if chave in vetores]
+        self.metricas.contar('embeddings_ausentes', len(self.vetores_produtos) - len(ids))
+        if not ids:
+            return 0
+        VectorStore.construir([int(produto_id) for produto_id in ids],
+                              np.stack([vetores[self.vetores_produtos[produto_id][0]] for produto_id in ids]),
+                              ativo=[self.vetores_produtos[produto_id][1] for produto_id in ids],
+                              sob_consulta=[self.vetores_produtos[produto_id][2] for produto_id in ids],
+                              pasta=self.config.pasta_vector_store)
+        return len(ids)
+
+    def _fechar_embeddings(self):
+        if self.cache_embeddings is not None:
+            self.cache_embeddings.close()
+            self.cache_embeddings = None
+
+    def _gravar_lote(self, acao: str, lote: List[Dict]):
+        """Grava um lote no Baserow (roda em thread)"""
+        tabela = self.config.tabela_id
+        if self.config.dry_run:
+            return
+        with self._perfil('escrita'):
+            if acao == 'create':
+                self.baserow.batch_create_rows(
+                    tabela, [mapear_para_ids(op, self.mapeamento, self.ids_campos) for op in lote],
+                    user_field_names=False)
+            elif acao in ('update', 'desativar'):
+                self.baserow.batch_update_rows(
+                    tabela, [dict(mapear_para_ids(op, self.mapeamento, self.ids_campos), id=op['id_baserow'])
+                             for op in lote],
+                    user_field_names=False)
+            else:
+                self.baserow.batch_delete_rows(tabela, [op['id_baserow'] for op in lote])
+
+    async def _escrever(self, entrada: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        buffers: Dict[str, List[Dict]] = {'create': [], 'update': [], 'delete': [], 'desativar': []}
+
+        async def descarregar(acao: str):
+            lote, buffers[acao] = buffers[acao], []
+            if not lote:
+                return
+            self.metricas.iniciar('escrita')
+            await loop.run_in_executor(None, self._gravar_lote, acao, lote)
+            self.metricas.contar(f"linhas_{acao}", len(lote))
+            self.metricas.contar('lotes_gravados')
+            if not self.config.dry_run:
+                # Só chegam operações depois que `_combinar` criou o detector
+                fingerprints = self.detector.resultado.fingerprints
+                if self.journal is not None:
+                    self.journal.record_batch(acao, lote, fingerprints)
+                self.estado.registrar(lote, fingerprints)
+                self._notificar(lote)
+                if acao in ('delete', 'desativar'):
+                    self.metricas.contar('removidos', len(lote))
+
+        while True:
+            operacao = await entrada.get()
+            if operacao is _FIM:
+                break
+            buffers[operacao['acao']].append(operacao)
+            if len(buffers[operacao['acao']]) >= TAMANHO_LOTE_BASEROW:
+                await descarregar(operacao['acao'])
+        for acao in buffers:
+            await descarregar(acao)
+        self.metricas.finalizar('escrita')
+
+    def _abrir_indices(self) -> List:
+        """Índices persistidos que já existem em disco e devem acompanhar os lotes gravados"""
+        indices = []
+        # Com a reconstrução ao fim da completa, lápides no store antigo seriam trabalho perdido
+        reconstruir = self.executor_embeddings is not None and self.parcial is None
+        if not reconstruir and os.path.exists(os.path.join(self.config.pasta_vector_store, 'meta.json')):
+            indices.append(VectorStore(self.config.pasta_vector_store))
+        if os.path.exists(self.config.arquivo_faq):
+            indices.append(CacheFAQ(self.config.arquivo_faq))
+        return indices
+
+    def _notificar(self, lote: List[Dict]):
+        """Repassa um lote confirmado aos índices downstream"""
+        if not self.assinantes:
+            return
+        delta = ResultadoDelta.de_lote(lote)
+        for indice in self.assinantes:
+            purgados = indice.apply_delta(delta)
+            if isinstance(purgados, int) and purgados:
+                self.metricas.contar('purgados', purgados, indice=type(indice).__name__)
+
+    def _deve_reconstruir(self, detector: DetectorMudancas) -> bool:
+        """Completa, sem remoções bloqueadas e com algo gravado (ou sem vector store ainda)"""
+        if self.executor_embeddings is None or self.parcial is not None or detector.remocoes_bloqueadas:
+            return False
+        if not os.path.exists(os.path.join(self.config.pasta_vector_store, 'meta.json')):
+            return True
+        return any(self.metricas.contadores.get(nome) for nome in (
+            'linhas_create', 'linhas_update', 'linhas_delete', 'linhas_desativar', 'linhas_retomadas'))
+
+    def _retomar(self) -> set:
+        """Abre (ou retoma) a execução no journal; retorna os offsets de produtos já processados"""
+        if self.journal is None:
+            return set()
+        self.journal.start_run(self.config.retomar)
+        if not self.journal.retomada:
+            return set()
+        restauradas = self.journal.restore(self.estado)
+        # O journal guarda só os ids, então só as remoções já confirmadas são repassadas de novo
+        # (a purga é idempotente); os índices persistidos não dependem dos creates/updates
+        for acao, lote, _ in self.journal.acked_batches():
+            if acao in ('delete', 'desativar'):
+                self._notificar(lote)
+        retomados = set(self.journal.offsets('produto'))
+        print(f"♻️ Retomando execução {self.journal.execucao}: {len(retomados)} páginas de produtos "
+              f"e {restauradas} linhas já confirmadas")
+        self.metricas.contar('linhas_retomadas', restauradas)
+        return retomados
+
+    def _iter_parcial(self, por_pagina: int = 50):
+        """Busca só os produtos da sincronização parcial, agrupados em páginas"""
+        uris = [f"/api/v1/produto/{produto_id}" for produto_id in self.parcial]
+        buscar = lambda uri: self.loja.get_resource(uri, {'description_html': 1})
+        with ThreadPoolExecutor(max_workers=self.config.max_workers) as executor:
+            for inicio in range(0, len(uris), por_pagina):
+                produtos = executor.map(buscar, uris[inicio:inicio + por_pagina])
+                yield inicio, {'objects': [produto for produto in produtos if produto]}
+
+    async def run(self, parcial: Optional[Dict[str, Dict]] = None) -> Dict:
+        """Executa a sincronização completa, ou só dos produtos de `parcial` (`id -> preço`)
+
+        A parcial não lê a tabela inteira do Baserow, não usa o journal e não
+        reconcilia remoções; isso fica para a próxima sincronização completa.
+        """
+        # As respostas HTTP das sessões compartilhadas passam a contar nesta execução
+        ativar(self.metricas)
+        paginas: asyncio.Queue = asyncio.Queue(self.tamanho_fila)
+        operacoes: asyncio.Queue = asyncio.Queue(TAMANHO_LOTE_BASEROW * 2)
+        if parcial is not None:
+            self.parcial = {str(produto_id): preco for produto_id, preco in parcial.items()}
+            self.journal = None
+            self.metricas.contar('produtos_parcial', len(self.parcial))
+        proprios = [] if self.config.dry_run else self._abrir_indices()
+        self.assinantes.extend(proprios)
+        retomados = self._retomar()
+        if self.config.registrar_historico and not self.config.dry_run:
+            self.historico = HistoricoPrecos(self.config.pasta_historico).begin(completa=self.parcial is None)
+
+        async def baixar_produtos():
+            self.metricas.iniciar('produtos')
+            if self.parcial is not None:
+                await bombear(self._iter_parcial, paginas)
+            else:
+                await bombear(lambda: self.loja.iter_pages('produto', {'description_html': 1}, pular=retomados),
+                              paginas)
+            self.metricas.finalizar('produtos')
+
+        precos = asyncio.ensure_future(self._baixar_precos())
+        indice_baserow = asyncio.ensure_future(self._indice_baserow())
+        download = asyncio.ensure_future(baixar_produtos())
+        combinar = asyncio.ensure_future(self._combinar(paginas, operacoes, precos, indice_baserow, download))
+        escrita = asyncio.ensure_future(self._escrever(operacoes))
+        try:
+            _, _, _, detector, _ = await asyncio.gather(precos, indice_baserow, download, combinar, escrita)
+
+            if not self.config.dry_run:
+                self.estado.save()
+                if self.historico is not None:
+                    self.metricas.contar('linhas_historico', self.historico.commit())
+                if self.journal is not None:
+                    self.journal.finish()
+            if self._deve_reconstruir(detector):
+                self.metricas.iniciar('vector_store')
+                self.metricas.contar('vector_store_produtos', await asyncio.get_running_loop().run_in_executor(
+                    self.executor_embeddings, self._reconstruir_vector_store))
+                self.metricas.finalizar('vector_store')
+        finally:
+            for indice in proprios:
+                if hasattr(indice, 'close'):
+                    indice.close()
+            if self.executor_embeddings is not None:
+                self.executor_embeddings.submit(self._fechar_embeddings)
+                self.executor_embeddings.shutdown(wait=True)
+            if self.executor_faq is not None:
+                self.executor_faq.submit(self._fechar_faq)
+                self.executor_faq.shutdown(wait=True)
+        if self.resolver is not None:
+            self.metricas.contar('recursos_buscados', self.resolver.buscados)
+        self.metricas.contar('inalterados', detector.resultado.inalterados)
+        return self.metricas.relatorio()
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sincroniza produtos da Loja Integrada com o Baserow")
+    parser.add_argument('--config', default='config_baserow.json')
+    parser.add_argument('--workers', type=int, default=4, help="Páginas baixadas em paralelo")
+    parser.add_argument('--estado', default=ARQUIVO_ESTADO, help="Arquivo de fingerprints")
+    parser.add_argument('--dry-run', action='store_true', help="Calcula o delta sem gravar no Baserow")
+    parser.add_argument('--remocao', choices=POLITICAS_REMOCAO, default='desativar',
+                        help="O que fazer com produtos removidos na Loja Integrada (padrão: desativar)")
+    parser.add_argument('--sem-recursos', action='store_true',
+                        help="Não expande categorias, SEO e variações")
+    parser.add_argument('--sem-historico', action='store_true',
+                        help="Não anexa o snapshot de preços ao histórico (estado/historico)")
+    parser.add_argument('--embeddings', action='store_true',
+                        help="Gera embeddings das páginas (cache em estado/embeddings.sqlite) e reconstrói "
+                             "o vector store ao fim da completa")
+    parser.add_argument('--faq', choices=MODELOS_FAQ,
+                        help="Gera o FAQ dos produtos criados/alterados com este modelo (cache em estado/faq.sqlite)")
+    parser.add_argument('--recomecar', action='store_true',
+                        help="Descarta uma execução interrompida em vez de retomá-la")
+    parser.add_argument('--relatorio', help="Grava o relatório da execução em JSON")
+    parser.add_argument('--prometheus', help="Grava as métricas no formato texto do Prometheus")
+    parser.add_argument('--perfil', choices=('cprofile', 'amostragem'),
+                        help="Perfila as etapas de combinação e escrita (arquivos em estado/perfil)")
+    parser.add_argument('--log-nivel', choices=('DEBUG', 'INFO', 'WARNING'), default='INFO',
+                        help="DEBUG registra a decisão de cada produto")
+    args = parser.parse_args(argv)
+    configurar_log(args.log_nivel)
+
+    config = carregar_config(args.config, max_workers=args.workers, arquivo_estado=args.estado,
+                             dry_run=args.dry_run, politica_remocao=args.remocao,
+                             retomar=not args.recomecar, expandir_recursos=not args.sem_recursos,
+                             registrar_historico=not args.sem_historico, embeddings=args.embeddings,
+                             faq=args.faq)
+    perfilador = Perfilador(args.perfil) if args.perfil else None
+    pipeline = SyncPipeline(config, perfilador=perfilador)
+    print("🔄 Sincronização Loja Integrada → Baserow" + (" (dry-run)" if args.dry_run else ""))
+    relatorio = asyncio.run(pipeline.run())
+    pipeline.metricas.imprimir()
+    if perfilador is not None:
+        perfilador.salvar()
+    if args.relatorio:
+        pipeline.metricas.salvar(args.relatorio)
+    if args.prometheus:
+        pipeline.metricas.salvar(args.prometheus, formato='prometheus')
+    return relatorio
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Sincronização de várias lojas em processos separados
+
+O workflow atende uma única loja (um `chave_api`/`aplicacao` fixo e uma
+tabela). Aqui a lista `lojas` do `config_baserow.json` é distribuída entre até
+`--processos` processos: cada loja roda o `SyncPipeline` em um processo novo,
+com o próprio rate limiter, as próprias sessões HTTP e a própria pasta de
+estado. Uma loja que falha (exceção, processo morto ou tempo esgotado) não
+interrompe as demais; ao final sai o relatório agregado com produtos/s.
+
+Cada item de `lojas` herda das seções `loja_integrada` e `baserow` do topo o
+que não definir, por exemplo:
+
+    "lojas": [
+        {"nome": "principal", "pasta_estado": "estado"},
+        {"nome": "outlet",
+         "loja_integrada": {"chave_api": "...", "aplicacao": "..."},
+         "baserow": {"tables": {"produtos": {"id": "123"}}}}
+    ]
+
+Sem `lojas`, o topo do arquivo é tratado como uma loja só ("principal").
+
+Uso:
+    python sync_lojas.py --config config_baserow.json [--processos 4] [--lojas principal outlet]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import time
+import traceback
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional, Tuple
+
+from configurar_baserow import ARQUIVO_CAMPOS
+from embeddings import ARQUIVO_CACHE as ARQUIVO_EMBEDDINGS
+from faq_produtos import ARQUIVO_CACHE as ARQUIVO_FAQ, MODELOS as MODELOS_FAQ
+from historico_precos import PASTA_HISTORICO
+from journal_sync import ARQUIVO_JOURNAL
+from resolver_recursos import ARQUIVO_CACHE as ARQUIVO_RECURSOS
+from sincronizacao_incremental import ARQUIVO_ESTADO, POLITICAS_REMOCAO
+from sync import ConfigSync, config_das_secoes
+from vector_store import PASTA_PADRAO as PASTA_VECTOR_STORE
+
+PASTA_LOJAS = os.path.join('estado', 'lojas')
+
+_NOME_VALIDO = re.compile(r'^[\w-]+$')
+
+def _mesclar(base: Dict, extra: Dict) -> Dict:
+    """Mescla `extra` sobre `base`, descendo nos dicionários aninhados"""
+    resultado = dict(base)
+    for chave, valor in extra.items():
+        if isinstance(valor, dict) and isinstance(resultado.get(chave), dict):
+            resultado[chave] = _mesclar(resultado[chave], valor)
+        else:
+            resultado[chave] = valor
+    return resultado
+
+def caminhos_estado(pasta: str) -> Dict[str, str]:
+    """Arquivos de estado da `ConfigSync` dentro de `pasta`, com os mesmos nomes do padrão"""
+    return {
+        'arquivo_estado': os.path.join(pasta, os.path.basename(ARQUIVO_ESTADO)),
+        'arquivo_journal': os.path.join(pasta, os.path.basename(ARQUIVO_JOURNAL)),
+        'arquivo_campos': os.path.join(pasta, os.path.basename(ARQUIVO_CAMPOS)),
+        'arquivo_recursos': os.path.join(pasta, os.path.basename(ARQUIVO_RECURSOS)),
+        'pasta_vector_store': os.path.join(pasta, os.path.basename(PASTA_VECTOR_STORE)),
+        'pasta_historico': os.path.join(pasta, os.path.basename(PASTA_HISTORICO)),
+        'arquivo_faq': os.path.join(pasta, os.path.basename(ARQUIVO_FAQ)),
+        'arquivo_embeddings': os.path.join(pasta, os.path.basename(ARQUIVO_EMBEDDINGS))
+    }
+
+def carregar_lojas(caminho: str = 'config_baserow.json', **extras) -> List[Tuple[str, ConfigSync]]:
+    """Lê a lista `lojas` do `config_baserow.json`; retorna `(nome, config)` na ordem do arquivo"""
+    with open(caminho, 'r', encoding='utf-8') as f:
+        dados = json.load(f)
+    itens = dados.get('lojas') or [{'nome': 'principal', 'pasta_estado': os.path.dirname(ARQUIVO_ESTADO)}]
+    lojas = []
+    for item in itens:
+        nome = str(item.get('nome', ''))
+        if not _NOME_VALIDO.match(nome):
+            raise ValueError(f"Nome de loja inválido: {nome!r} (use letras, números, _ ou -)")
+        if any(nome == existente for existente, _ in lojas):
+            raise ValueError(f"Loja repetida: {nome}")
+        caminhos = caminhos_estado(item.get('pasta_estado') or os.path.join(PASTA_LOJAS, nome))
+        config = config_das_secoes(_mesclar(dados['loja_integrada'], item.get('loja_integrada') or {}),
+                                   _mesclar(dados['baserow'], item.get('baserow') or {}),
+                                   **dict(caminhos, **extras))
+        lojas.append((nome, config))
+    return lojas
+
+def _executar_loja(nome: str, config: ConfigSync, conexao):
+    """Processo de uma loja: roda o pipeline e envia o resultado pelo pipe"""
+    from cliente_http import fechar_sessoes
+    from sync import SyncPipeline
+
+    inicio = time.perf_counter()
+    # Falha por padrão: um BaseException (KeyboardInterrupt, SystemExit) não deixa `resultado` sem valor
+    resultado = {'loja': nome, 'ok': False, 'erro': "execução interrompida"}
+    try:
+        for caminho in (config.arquivo_estado, config.arquivo_journal, config.arquivo_campos):
+            os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        pipeline = SyncPipeline(config)
+        relatorio = asyncio.run(pipeline.run())
+        resultado = {'loja': nome, 'ok': True, 'relatorio': relatorio}
+    except Exception as e:
+        resultado = {'loja': nome, 'ok': False, 'erro': f"{type(e).__name__}: {e}",
+                     'traceback': traceback.format_exc()}
+    except BaseException as e:
+        resultado['erro'] = f"execução interrompida ({type(e).__name__})"
+        raise
+    finally:
+        fechar_sessoes()
+        resultado['sync_s'] = round(time.perf_counter() - inicio, 3)
+        try:
+            conexao.send(resultado)
+        finally:
+            conexao.close()
+
+def produtos_processados(relatorio: Dict) -> int:
+    """Produtos comparados na execução: gravados (create/update) mais os inalterados"""
+    contadores = relatorio.get('contadores') or {}
+    return int(contadores.get('linhas_create', 0) + contadores.get('linhas_update', 0)
+               + contadores.get('inalterados', 0))
+
+def coordenar(lojas: List[Tuple[str, ConfigSync]], processos: Optional[int] = None,
+              tempo_limite: Optional[float] = None) -> Dict:
+    """Roda as lojas em até `processos` processos simultâneos; retorna o relatório agregado
+
+    Cada loja ganha um processo novo (spawn), então nada é compartilhado entre
+    lojas além do disco. Um processo que termina sem enviar resultado ou passa
+    de `tempo_limite` segundos conta como falha daquela loja.
+    """
+    import multiprocessing
+
+    contexto = multiprocessing.get_context('spawn')
+    processos = max(1, min(processos or os.cpu_count() or 1, len(lojas)))
+    pendentes = list(lojas)
+    ativos: Dict[str, Tuple] = {}
+    resultados: Dict[str, Dict] = {}
+    inicio = time.perf_counter()
+
+    while pendentes or ativos:
+        while pendentes and len(ativos) < processos:
+            nome, config = pendentes.pop(0)
+            recebimento, envio = contexto.Pipe(duplex=False)
+            processo = contexto.Process(target=_executar_loja, args=(nome, config, envio), name=f"sync-{nome}")
+            processo.start()
+            # O pai fecha a ponta de envio para perceber quando o filho morre
+            envio.close()
+            ativos[nome] = (processo, recebimento, time.perf_counter())
+            print(f"🚀 {nome}: iniciada (pid {processo.pid})")
+
+        wait([recebimento for _, recebimento, _ in ativos.values()]
+             + [processo.sentinel for processo, _, _ in ativos.values()], timeout=1.0)
+        for nome, (processo, recebimento, iniciado) in list(ativos.items()):
+            resultado = None
+            # `is_alive` antes de `poll`: se o filho já saiu, o que ele enviou está no pipe
+            vivo = processo.is_alive()
+            if recebimento.poll():
+                try:
+                    resultado = recebimento.recv()
+                except EOFError:
+                    resultado = {'loja': nome, 'ok': False,
+                                 'erro': f"processo terminou sem resultado (código {processo.exitcode})"}
+            elif not vivo:
+                resultado = {'loja': nome, 'ok': False,
+                             'erro': f"processo terminou sem resultado (código {processo.exitcode})"}
+            elif tempo_limite is not None and time.perf_counter() - iniciado > tempo_limite:
+                processo.terminate()
+                resultado = {'loja': nome, 'ok': False, 'erro': f"tempo limite de {tempo_limite:g}s excedido"}
+            if resultado is None:
+                continue
+            # Duração vista pelo coordenador, incluindo a criação do processo
+            resultado['duracao_s'] = round(time.perf_counter() - iniciado, 3)
+            processo.join()
+            recebimento.close()
+            del ativos[nome]
+            resultados[nome] = resultado
+            if resultado['ok']:
+                print(f"✅ {nome}: {produtos_processados(resultado['relatorio'])} produtos em "
+                      f"{resultado['duracao_s']:.1f}s")
+            else:
+                print(f"❌ {nome}: {resultado['erro']}")
+
+    total_s = time.perf_counter() - inicio
+    por_loja = [resultados[nome] for nome, _ in lojas]
+    produtos = sum(produtos_processados(resultado['relatorio']) for resultado in por_loja if resultado['ok'])
+    soma_s = sum(resultado['duracao_s'] for resultado in por_loja)
+    return {
+        'total_s': round(total_s, 3),
+        'processos': processos,
+        'lojas': por_loja,
+        'falhas': [resultado['loja'] for resultado in por_loja if not resultado['ok']],
+        'produtos': produtos,
+        'produtos_por_s': round(produtos / total_s, 1) if total_s else None,
+        # Quanto o paralelismo economizou frente a rodar as lojas uma após a outra
+        'soma_lojas_s': round(soma_s, 3),
+        'aceleracao': round(soma_s / total_s, 2) if total_s else None
+    }
+
+def imprimir_relatorio(relatorio: Dict):
+    print(f"\n{'loja':<20} | {'status':<6} | {'produtos':>8} | {'duração':>8} | {'produtos/s':>10}")
+    print("-" * 64)
+    for resultado in relatorio['lojas']:
+        produtos = produtos_processados(resultado['relatorio']) if resultado['ok'] else 0
+        taxa = produtos / resultado['duracao_s'] if resultado['duracao_s'] else 0
+        print(f"{resultado['loja'][:20]:<20} | {'ok' if resultado['ok'] else 'falha':<6} | {produtos:>8} | "
+              f"{resultado['duracao_s']:>7.1f}s | {taxa:>10.1f}")
+    print(f"\n🏁 {len(relatorio['lojas'])} lojas em {relatorio['total_s']:.1f}s com {relatorio['processos']} "
+          f"processos | {relatorio['produtos']} produtos ({relatorio['produtos_por_s']} produtos/s) | "
+          f"aceleração {relatorio['aceleracao']}x sobre a execução em sequência")
+    if relatorio['falhas']:
+        print(f"⚠️ Falharam: {', '.join(relatorio['falhas'])}")
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Sincroniza várias lojas Loja Integrada → Baserow em paralelo")
+    parser.add_argument('--config', default='config_baserow.json')
+    parser.add_argument('--processos', type=int, help="Lojas sincronizadas ao mesmo tempo (padrão: núcleos)")
+    parser.add_argument('--lojas', nargs='+', help="Sincroniza só as lojas com estes nomes")
+    parser.add_argument('--workers', type=int, default=4, help="Páginas baixadas em paralelo por loja")
+    parser.add_argument('--dry-run', action='store_true', help="Calcula o delta sem gravar no Baserow")
+    parser.add_argument('--remocao', choices=POLITICAS_REMOCAO, default='desativar')
+    parser.add_argument('--embeddings', action='store_true', help="Gera embeddings e reconstrói o vector store")
+    parser.add_argument('--faq', choices=MODELOS_FAQ, help="Gera o FAQ dos produtos criados/alterados")
+    parser.add_argument('--tempo-limite', type=float, help="Segundos até uma loja ser interrompida")
+    parser.add_argument('--relatorio', help="Grava o relatório agregado em JSON")
+    args = parser.parse_args(argv)
+
+    lojas = carregar_lojas(args.config, max_workers=args.workers, dry_run=args.dry_run,
+                           politica_remocao=args.remocao, embeddings=args.embeddings, faq=args.faq)
+    if args.lojas:
+        desconhecidas = set(args.lojas) - {nome for nome, _ in lojas}
+        if desconhecidas:
+            parser.error(f"lojas não encontradas no config: {', '.join(sorted(desconhecidas))}")
+        lojas = [(nome, config) for nome, config in lojas if nome in args.lojas]
+    print(f"🔄 Sincronizando {len(lojas)} lojas" + (" (dry-run)" if args.dry_run else ""))
+    relatorio = coordenar(lojas, args.processos, args.tempo_limite)
+    imprimir_relatorio(relatorio)
+    if args.relatorio:
+        with open(args.relatorio, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, ensure_ascii=False, indent=2)
+    return relatorio
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,9 @@ import requests
 import json
 from datetime import datetime
 
+from cliente_http import obter_sessao
+from combinar_produtos import combinar_produtos, extrair_objetos
+
 def configurar_credenciais():
     """Guia para configurar credenciais"""
     print("🔑 CONFIGURAÇÃO DE CREDENCIAIS NECESSÁRIA")
@@ -54,7 +57,7 @@ def testar_api():
     
     try:
         # Fazer requisição
-        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response = obter_sessao(url).get(url, headers=headers, params=params, timeout=30)
         
         print(f"Status Code: {response.status_code}")
         print(f"Headers de Resposta: {dict(response.headers)}")
@@ -254,85 +257,14 @@ def testar_logica_combinacao():
         }
     ]
 
-    # Simular a lógica da node "Combinar Produtos e Preços"
-    def processarDados(produtosData, precosData):
-        # Extrair lista de produtos - dados vêm como array com objetos json
-        let_produtos = []
-        let_precos = []
-
-        # Processar dados dos produtos
-        if produtosData and isinstance(produtosData, list):
-            for item in produtosData:
-                if 'json' in item and 'objects' in item['json']:
-                    let_produtos.extend(item['json']['objects'])
-
-        # Processar dados dos preços
-        if precosData and isinstance(precosData, list):
-            for item in precosData:
-                if 'json' in item and 'objects' in item['json']:
-                    let_precos.extend(item['json']['objects'])
-
-        print(f'Produtos encontrados: {len(let_produtos)}')
-        print(f'Preços encontrados: {len(let_precos)}')
-
-        return let_produtos, let_precos
-
-    # Função para formatar preço
-    def formatarPreco(valor):
-        if not valor:
-            return 'R$ 0,00'
-        try:
-            numero = float(valor)
-            return f"R$ {numero:,.2f}".replace(',', '_').replace('.', ',').replace('_', '.')
-        except (ValueError, TypeError):
-            return 'R$ 0,00'
+    # Simular a lógica da node "Combinar Produtos e Preços", sem concatenar páginas:
+    # os produtos são consumidos um a um por `combinar_produtos`
+    produtos = extrair_objetos(produtos_data)
+    precos = extrair_objetos(precos_data)
 
-    # Função para encontrar preço do produto
-    def encontrarPreco(produtoId, listaPrecos):
-        if not produtoId or not listaPrecos or len(listaPrecos) == 0:
-            return None
-
-        produtoIdStr = str(produtoId)
-        for preco in listaPrecos:
-            precoProdutoUrl = preco.get('produto', '')
-            precoProdutoId = precoProdutoUrl.split('/').pop()
-            if precoProdutoId == produtoIdStr:
-                return preco
-        return None
-
-    # Processar os dados
-    produtos, precos = processarDados(produtos_data, precos_data)
-
-    # Combinar dados para todos os produtos
     produtos_combinados = []
-    for produto in produtos:
-        preco_correspondente = encontrarPreco(produto['id'], precos)
-
-        produto_combinado = {
-            'id_produto_loja_integrada': produto['id'],
-            'nome': produto['nome'],
-            'titulo_produto': produto['nome'],
-            'apelido': produto.get('apelido', ''),
-            'sku': produto.get('sku', ''),
-            'descricao_completa': produto.get('descricao_completa', ''),
-            'descricao_produto': produto.get('descricao_completa', ''),
-            'url_produto': produto.get('url', ''),
-            'url_video_youtube': produto.get('url_video_youtube', ''),
-            'gtin': produto.get('gtin', ''),
-            'mpn': produto.get('mpn', ''),
-            'ncm': produto.get('ncm', ''),
-            'id_externo': produto.get('id_externo', ''),
-            'ativo': produto.get('ativo', False),
-            'bloqueado': produto.get('bloqueado', False),
-            'removido': produto.get('removido', False),
-            'tipo': produto.get('tipo', 'produto'),
-            'preco_cheio': formatarPreco(preco_correspondente['cheio']) if preco_correspondente else 'R$ 0,00',
-            'preco_promocional': formatarPreco(preco_correspondente.get('promocional')) if preco_correspondente and preco_correspondente.get('promocional') else None,
-            'preco_custo': formatarPreco(preco_correspondente.get('custo')) if preco_correspondente and preco_correspondente.get('custo') else None,
-            'sob_consulta': preco_correspondente.get('sob_consulta', False) if preco_correspondente else False,
-            'data_sincronizacao': '2024-08-28T18:00:00Z',
-            'fonte': 'loja_integrada'
-        }
+    for produto_combinado in combinar_produtos(produtos, precos):
+        produto_combinado['data_sincronizacao'] = '2024-08-28T18:00:00Z'
         produtos_combinados.append(produto_combinado)
 
     print(f'✅ Produtos combinados gerados: {len(produtos_combinados)}')
@@ -0,0 +1,68 @@
+"""Escrita em lote no Baserow contra um servidor HTTP local com 429/502 injetados"""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from configurar_baserow import BaserowConfig
+
+class _BaserowFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _responder(self):
+        corpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.recebidas.append((self.command, self.path, len(corpo['items'])))
+        status = self.server.roteiro.pop(0) if self.server.roteiro else 200
+        if status == 200:
+            resposta = json.dumps({'items': [dict(item, id=i + 1) for i, item in enumerate(corpo['items'])]})
+        else:
+            resposta = json.dumps({'error': 'falha injetada'})
+        dados = resposta.encode()
+        self.send_response(status)
+        if status == 429:
+            self.send_header('Retry-After', '0')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    do_POST = _responder
+    do_PATCH = _responder
+
+@pytest.fixture
+def servidor():
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _BaserowFalso)
+    servidor.roteiro = []
+    servidor.recebidas = []
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+def _cliente(servidor) -> BaserowConfig:
+    return BaserowConfig(f"http://127.0.0.1:{servidor.server_port}", 'token', timeout=5)
+
+def test_create_repetido_apos_429(servidor):
+    servidor.roteiro = [429]
+    criadas = _cliente(servidor).batch_create_rows(1, [{'Nome': 'a'}, {'Nome': 'b'}])
+    assert len(criadas) == 2
+    assert [metodo for metodo, _, _ in servidor.recebidas] == ['POST', 'POST']
+
+def test_create_nao_repetido_apos_502(servidor):
+    servidor.roteiro = [502]
+    with pytest.raises(requests.HTTPError):
+        _cliente(servidor).batch_create_rows(1, [{'Nome': 'a'}, {'Nome': 'b'}])
+    # O lote pode ter sido gravado antes do 502: reenviar duplicaria as linhas
+    assert len(servidor.recebidas) == 1
+
+def test_update_repetido_apos_502(servidor):
+    servidor.roteiro = [502]
+    atualizadas = _cliente(servidor).batch_update_rows(1, [{'id': 1, 'Nome': 'a'}])
+    assert len(atualizadas) == 1
+    assert [metodo for metodo, _, _ in servidor.recebidas] == ['PATCH', 'PATCH']
@@ -0,0 +1,54 @@
+"""Guarda do cache de respostas: paráfrases acertam, outro modelo, número ou negação não"""
+
+import pytest
+
+from cache_respostas import STOPWORDS, CacheRespostas, identificadores, negacoes, normalizar_pergunta
+from embeddings import EmbedderHash
+
+class EmbedderSinonimos:
+    """Faz o papel de um modelo semântico: paráfrases de preço viram o mesmo vetor"""
+
+    SINONIMOS = {'custa': 'preco', 'valor': 'preco'}
+    IGNORADAS = STOPWORDS | {'qual', 'quanto', 'e'}
+
+    def __init__(self):
+        self.base = EmbedderHash()
+        self.nome, self.dim = 'sinonimos', self.base.dim
+
+    def embed(self, textos):
+        return self.base.embed([' '.join(self.SINONIMOS.get(termo, termo) for termo in texto.split()
+                                         if termo not in self.IGNORADAS) for texto in textos])
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheRespostas(EmbedderSinonimos(), caminho=str(tmp_path / 'respostas.sqlite'), caminho_estado=None,
+                           nomes_produtos=['DJI Mavic 3', 'DJI Mavic 3 Classic', 'DJI Air 3'])
+    cache.put("qual o preço do Mavic 3?", "R$ 12.999,00", ['1'])
+    cache.put("tem o Mavic 3 em estoque?", "Sim, 4 unidades.", ['1'])
+    yield cache
+    cache.close()
+
+@pytest.mark.parametrize('pergunta', ["quanto custa o Mavic 3?", "qual o valor do Mavic 3?",
+                                      "preço do mavic 3?", "Mavic 3 preço?"])
+def test_parafrase_acerta(cache, pergunta):
+    guardada = cache.get(pergunta)
+    assert guardada is not None and guardada['resposta'] == "R$ 12.999,00"
+    assert cache.metricas['acertos_exatos'] == 0
+
+@pytest.mark.parametrize('pergunta', ["qual o preço do Mavic 4?", "qual o preço do Air 3?",
+                                      "qual o preço do Mavic 3 Classic?", "quanto custam 2 Mavic 3?"])
+def test_outro_modelo_ou_numero_nao_acerta(cache, pergunta):
+    assert cache.get(pergunta) is None
+
+def test_negacao_nao_acerta(cache):
+    assert cache.get("nao tem o mavic 3 em estoque?") is None
+    assert cache.get("não tem o Mavic 3 em estoque?") is None
+    assert cache.get("Tem o mavic 3 em estoque") is not None
+
+def test_guarda():
+    termos_modelo = frozenset({'mavic', 'classic'})
+    assert identificadores(normalizar_pergunta("Tem o Mavic 3 Classic (SKU AB-120)?"), termos_modelo) == \
+        {'mavic', '3', 'classic', '120'}
+    assert identificadores('quanto custa o drone') == frozenset()
+    assert negacoes('mavic sem camera') == {'sem'}
+    assert not STOPWORDS & {'nao', 'sem'}
@@ -0,0 +1,88 @@
+"""Geração de FAQ em lotes com o modelo local: tamanho dos lotes, cache e nova tentativa
+
+As chamadas rodam com `max_workers=1` para que a ordem dos lotes seja determinística.
+"""
+
+import json
+
+import pytest
+
+from faq_produtos import _FIM_DADOS, _INICIO_DADOS, CacheFAQ, ModeloFAQLocal, gerar_faq
+
+class ModeloContado(ModeloFAQLocal):
+    """Modelo local que registra os ids de cada chamada e pode omitir produtos das respostas em lote"""
+
+    def __init__(self, omitir=()):
+        super().__init__()
+        self.lotes = []
+        self.omitir = set(omitir)
+
+    def completar(self, prompt: str) -> str:
+        inicio = prompt.index(_INICIO_DADOS) + len(_INICIO_DADOS)
+        ids = [produto['id'] for produto in json.loads(prompt[inicio:prompt.index(_FIM_DADOS)])['produtos']]
+        self.lotes.append(ids)
+        resposta = json.loads(super().completar(prompt))
+        if len(ids) > 1:
+            resposta['faqs'] = [faq for faq in resposta['faqs'] if faq['id'] not in self.omitir]
+        return json.dumps(resposta)
+
+def _registro(produto_id: int, preco: str = '100.00') -> dict:
+    return {'id_produto_loja_integrada': str(produto_id), 'nome': f"Drone {produto_id}",
+            'sku': f"SKU-{produto_id}",
+            'descricao_produto': f"Drone {produto_id} com câmera 4K e bateria de longa duração.",
+            'preco_cheio': preco, 'preco_promocional': '', 'sob_consulta': False}
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CacheFAQ(str(tmp_path / 'faq.sqlite'))
+    yield cache
+    cache.close()
+
+def test_lotes_de_produtos_por_chamada(cache):
+    modelo = ModeloContado()
+    resultado = gerar_faq([_registro(i) for i in range(10)], modelo, cache,
+                          produtos_por_chamada=4, max_workers=1, perguntas=5)
+    assert [len(lote) for lote in modelo.lotes] == [4, 4, 2]
+    assert resultado.chamadas == 3 and resultado.gerados == 10 and not resultado.falhas
+    assert all(len(faq) == 5 for faq in resultado.faqs.values())
+
+def test_cache_reaproveitado_com_mesmo_hash(cache):
+    registros = [_registro(i) for i in range(6)]
+    gerar_faq(registros, ModeloContado(), cache,
+              produtos_por_chamada=4, max_workers=1, perguntas=5)
+    modelo = ModeloContado()
+    resultado = gerar_faq(registros, modelo, cache,
+                          produtos_por_chamada=4, max_workers=1, perguntas=5)
+    assert modelo.lotes == []
+    assert resultado.reaproveitados == 6 and resultado.gerados == 0 and len(resultado.faqs) == 6
+
+def test_preco_alterado_gera_de_novo(cache):
+    gerar_faq([_registro(i) for i in range(6)], ModeloContado(), cache,
+              produtos_por_chamada=4, max_workers=1, perguntas=5)
+    modelo = ModeloContado()
+    registros = [_registro(i, '90.00' if i == 2 else '100.00') for i in range(6)]
+    resultado = gerar_faq(registros, modelo, cache,
+                          produtos_por_chamada=4, max_workers=1, perguntas=5)
+    assert modelo.lotes == [['2']]
+    assert resultado.reaproveitados == 5 and resultado.gerados == 1
+    assert resultado.faqs['2'][0]['resposta'] == 'Custa 90.00.'
+
+def test_ids_ausentes_da_resposta_tentados_uma_vez_sozinhos(cache):
+    modelo = ModeloContado(omitir={'1', '5'})
+    resultado = gerar_faq([_registro(i) for i in range(6)], modelo, cache,
+                          produtos_por_chamada=4, max_workers=1, perguntas=5)
+    assert modelo.lotes == [['0', '1', '2', '3'], ['4', '5'], ['1'], ['5']]
+    assert resultado.chamadas == 4 and resultado.gerados == 6 and not resultado.falhas
+
+def test_falha_persistente_fica_em_falhas(cache):
+    class ModeloQuebrado(ModeloContado):
+        def completar(self, prompt):
+            texto = json.loads(super().completar(prompt))
+            texto['faqs'] = [faq for faq in texto['faqs'] if faq['id'] != '3']
+            return json.dumps(texto)
+
+    modelo = ModeloQuebrado()
+    resultado = gerar_faq([_registro(i) for i in range(4)], modelo, cache,
+                          produtos_por_chamada=4, max_workers=1, perguntas=5)
+    assert modelo.lotes == [['0', '1', '2', '3'], ['3']]
+    assert resultado.falhas == ['3'] and '3' not in resultado.faqs
@@ -0,0 +1,24 @@
+"""Limites das consultas por faixa do índice de preços"""
+
+from decimal import Decimal
+
+import pytest
+
+from indice_precos import IndicePrecos
+
+@pytest.fixture
+def indice():
+    indice = IndicePrecos()
+    indice.index([{'id_produto_loja_integrada': str(i), 'valor_cheio': f"{i * 10}.00"} for i in range(1, 6)])
+    return indice
+
+def test_faixa(indice):
+    assert indice.range('20.00', 30) == [('2', Decimal('20.00')), ('3', Decimal('30.00'))]
+    assert [produto_id for produto_id, _ in indice.range(-0.01, 10)] == ['1']
+
+@pytest.mark.parametrize('limite', ['abc', '', 'R$ 20,00'])
+def test_limite_invalido_levanta_erro(indice, limite):
+    with pytest.raises(ValueError):
+        indice.range(maximo=limite)
+    with pytest.raises(ValueError):
+        indice.range(minimo=limite)
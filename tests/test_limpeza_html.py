@@ -0,0 +1,14 @@
+"""Casos de borda do tokenizador de HTML"""
+
+from limpeza_html import converter_html
+
+def test_script_com_menor_que_nao_engole_o_resto():
+    assert converter_html('<script>x<y</script>fim') == 'fim'
+    assert converter_html('<STYLE>p>a{}</style ><p>texto</p>') == 'texto'
+
+def test_maior_que_dentro_de_atributo_entre_aspas():
+    assert converter_html('<a title="a>b">link</a> ok') == 'link ok'
+    assert converter_html("<img alt='1>2'/>depois") == 'depois'
+
+def test_blocos_e_entidades():
+    assert converter_html('<p>a&ccedil;&atilde;o</p><ul><li>um</li><li>dois</li></ul>') == 'ação\n- um\n- dois'
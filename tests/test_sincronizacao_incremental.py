@@ -0,0 +1,44 @@
+"""Fingerprint com recursos expandidos e reconciliação de removidos"""
+
+from resolver_recursos import CAMPOS_RECURSOS
+from sincronizacao_incremental import (MARCA_DESATIVADO, DetectorMudancas, EstadoSincronizacao,
+                                       carregar_campos_mapeados)
+
+CAMPOS = carregar_campos_mapeados()
+
+def _registro(**extra) -> dict:
+    registro = {'id_produto_loja_integrada': '1', 'nome': 'Drone', 'preco_cheio': 'R$ 1.000,00',
+                'categorias': 'Drones > DJI', 'ids_categorias': '10', 'seo_titulo': 'Drone DJI',
+                'seo_descricao': '', 'variacoes': ''}
+    registro.update(extra)
+    return registro
+
+def _sem_recursos(registro: dict) -> dict:
+    return {campo: valor for campo, valor in registro.items() if campo not in CAMPOS_RECURSOS}
+
+def _sincronizar(estado: EstadoSincronizacao, registro: dict):
+    detector = DetectorMudancas(estado, campos=CAMPOS)
+    operacao = detector.classificar(registro)
+    if operacao is not None:
+        estado.registrar([operacao], detector.resultado.fingerprints)
+    return operacao
+
+def test_execucao_sem_recursos_nao_regrava(tmp_path):
+    estado = EstadoSincronizacao(str(tmp_path / 'fingerprints.json'))
+    assert _sincronizar(estado, _registro())['acao'] == 'create'
+    assert _sincronizar(estado, _sem_recursos(_registro())) is None
+    # Mudança na base ainda é detectada, sem apagar os recursos já gravados
+    operacao = _sincronizar(estado, _sem_recursos(_registro(nome='Drone X')))
+    assert operacao['acao'] == 'update' and 'categorias' not in operacao
+    assert _sincronizar(estado, _registro(nome='Drone X')) is None
+    assert _sincronizar(estado, _registro(nome='Drone X', categorias='Drones'))['acao'] == 'update'
+
+def test_desativados_fora_da_conta_de_remocao(tmp_path):
+    estado = EstadoSincronizacao(str(tmp_path / 'fingerprints.json'))
+    estado.fingerprints = {str(i): MARCA_DESATIVADO for i in range(60)}
+    estado.fingerprints.update({str(i): 'x' for i in range(60, 100)})
+    detector = DetectorMudancas(estado, campos=CAMPOS, politica_remocao='desativar')
+    detector.vistos.update(str(i) for i in range(60, 95))
+    remocoes = detector.remocoes(limite_fracao=0.5)
+    assert sorted(operacao['id_produto_loja_integrada'] for operacao in remocoes) == [str(i) for i in range(95, 100)]
+    assert detector.remocoes_bloqueadas == 0
@@ -0,0 +1,77 @@
+"""Sincronização completa contra os servidores locais do benchmark offline"""
+
+import asyncio
+import os
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+import requests
+
+import benchmark_offline
+from cliente_http import fechar_sessoes
+from faq_produtos import CacheFAQ
+from loja_integrada import LojaIntegradaClient, RateLimiter
+from sync import ConfigSync, SyncPipeline
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def servidores(monkeypatch):
+    # As fixtures do benchmark leem os dumps pelo caminho relativo à raiz
+    monkeypatch.chdir(RAIZ)
+    simulado = benchmark_offline.ServidorSimulado(250, latencia=0, taxa_429=0)
+    https = []
+    for api in ('loja', 'baserow'):
+        http = ThreadingHTTPServer(('127.0.0.1', 0), benchmark_offline._criar_handler(simulado, api))
+        http.daemon_threads = True
+        threading.Thread(target=http.serve_forever, daemon=True).start()
+        https.append(http)
+    yield simulado, [f"http://127.0.0.1:{http.server_port}" for http in https]
+    for http in https:
+        http.shutdown()
+        http.server_close()
+    fechar_sessoes()
+
+def _sincronizar(loja_url: str, baserow_url: str, pasta, **extras):
+    config = ConfigSync(chave_api='teste', aplicacao='teste', baserow_url=baserow_url, baserow_token='teste',
+                        tabela_id=benchmark_offline.TABELA_ID, loja_url=loja_url, expandir_recursos=False,
+                        registrar_historico=False, arquivo_estado=str(pasta / 'fingerprints.json'),
+                        arquivo_journal=str(pasta / 'journal.sqlite'),
+                        arquivo_campos=str(pasta / 'campos_baserow.json'),
+                        pasta_vector_store=str(pasta / 'vector_store'), arquivo_faq=str(pasta / 'faq.sqlite'),
+                        **extras)
+    loja = LojaIntegradaClient('teste', 'teste', base_url=loja_url, rate_limiter=RateLimiter(1000.0, rajada=4))
+    return asyncio.run(SyncPipeline(config, loja=loja).run())['contadores']
+
+def test_paginas_da_loja_sem_response_json(servidores, monkeypatch, tmp_path):
+    simulado, (loja_url, baserow_url) = servidores
+    decodificadas = []
+    json_original = requests.Response.json
+
+    def json_registrado(self, **kwargs):
+        decodificadas.append(self.url)
+        return json_original(self, **kwargs)
+
+    monkeypatch.setattr(requests.Response, 'json', json_registrado)
+    contadores = _sincronizar(loja_url, baserow_url, tmp_path)
+
+    assert contadores['paginas_produtos'] == 3
+    assert len(simulado.linhas) == contadores['linhas_create'] > 200
+    assert not [url for url in decodificadas if url.startswith(loja_url)]
+
+def test_faq_dos_produtos_criados_e_alterados(servidores, tmp_path):
+    simulado, urls = servidores
+    contadores = _sincronizar(*urls, tmp_path, faq='local')
+    assert contadores['faq_gerados'] == contadores['linhas_create'] > 200
+
+    # Sem mudanças não há operação, então nada vai ao modelo
+    assert not _sincronizar(*urls, tmp_path, faq='local').get('faq_gerados')
+
+    simulado.alterar_precos(0.05)
+    contadores = _sincronizar(*urls, tmp_path, faq='local')
+    assert contadores['faq_gerados'] == contadores['linhas_update'] > 0
+    cache = CacheFAQ(str(tmp_path / 'faq.sqlite'))
+    produtos, = cache.conn.execute("SELECT COUNT(DISTINCT produto_id) FROM faq").fetchone()
+    cache.close()
+    assert produtos == len(simulado.linhas)
@@ -0,0 +1,25 @@
+"""Casos limite do vector store IVF"""
+
+import numpy as np
+import pytest
+
+from vector_store import VectorStore
+
+@pytest.fixture
+def store(tmp_path):
+    vetores = np.random.default_rng(0).standard_normal((50, 8)).astype(np.float32)
+    return VectorStore.construir(list(range(50)), vetores, pasta=str(tmp_path / 'vetores')), vetores
+
+@pytest.mark.parametrize('k', [0, -1, -5])
+def test_k_nao_positivo_sem_resultados(store, k):
+    store, vetores = store
+    assert store.search(vetores[0], k=k) == []
+    assert store.search_exact(vetores[0], k=k) == []
+
+def test_busca_encontra_o_proprio_vetor(store):
+    store, vetores = store
+    assert store.search_exact(vetores[7], k=1)[0][0] == 7
+
+def test_construir_sem_vetores(tmp_path):
+    with pytest.raises(ValueError, match="pelo menos um vetor"):
+        VectorStore.construir([], np.zeros((0, 8), dtype=np.float32), pasta=str(tmp_path / 'vetores'))
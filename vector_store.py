@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Vector store local para busca semântica de produtos
+
+Os vetores (float32, normalizados para similaridade de cosseno) ficam em disco e
+são abertos com memory-map. Um índice IVF (k-means sobre os vetores) agrupa as
+linhas por centróide, de forma que cada consulta só percorre as `n_probe` listas
+mais próximas em vez do catálogo inteiro. Filtros por `ativo`/`sob_consulta`
+são aplicados sobre máscaras booleanas, sem sair do processo. Produtos
+removidos na Loja Integrada viram "lápides" até a próxima reconstrução.
+"""
+
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PASTA_PADRAO = os.path.join('estado', 'vector_store')
+
+def normalizar(vetores: np.ndarray) -> np.ndarray:
+    """Normaliza as linhas para norma 1 (produto interno = cosseno)"""
+    vetores = np.asarray(vetores, dtype=np.float32)
+    normas = np.linalg.norm(vetores, axis=-1, keepdims=True)
+    normas[normas == 0] = 1.0
+    return vetores / normas
+
+def _atribuir(vetores: np.ndarray, centroides: np.ndarray, bloco: int = 65536) -> np.ndarray:
+    """Centróide mais próximo de cada vetor, em blocos para limitar a memória"""
+    atribuicoes = np.empty(len(vetores), dtype=np.int32)
+    for inicio in range(0, len(vetores), bloco):
+        parte = np.asarray(vetores[inicio:inicio + bloco])
+        atribuicoes[inicio:inicio + bloco] = np.argmax(parte @ centroides.T, axis=1)
+    return atribuicoes
+
+def treinar_kmeans(vetores: np.ndarray, n_listas: int, iteracoes: int = 10,
+                   amostra_por_lista: int = 64, semente: int = 0) -> np.ndarray:
+    """K-means esférico sobre uma amostra dos vetores; retorna os centróides"""
+    rng = np.random.default_rng(semente)
+    tamanho_amostra = min(len(vetores), n_listas * amostra_por_lista)
+    amostra = np.asarray(vetores[np.sort(rng.choice(len(vetores), tamanho_amostra, replace=False))])
+    centroides = amostra[rng.choice(len(amostra), n_listas, replace=False)].copy()
+    for _ in range(iteracoes):
+        atribuicoes = _atribuir(amostra, centroides)
+        somas = np.zeros_like(centroides)
+        np.add.at(somas, atribuicoes, amostra)
+        vazios = np.bincount(atribuicoes, minlength=n_listas) == 0
+        # Listas vazias recebem um ponto aleatório da amostra
+        somas[vazios] = amostra[rng.choice(len(amostra), int(vazios.sum()))]
+        centroides = normalizar(somas)
+    return centroides
+
+class VectorStore:
+    """Índice IVF persistido em uma pasta, lido via memory-map"""
+
+    def __init__(self, pasta: str = PASTA_PADRAO):
+        self.pasta = pasta
+        with open(os.path.join(pasta, 'meta.json'), 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.dim = self.meta['dim']
+        self.total = self.meta['total']
+        self.vetores = np.memmap(os.path.join(pasta, 'vetores.f32'), dtype=np.float32, mode='r',
+                                 shape=(self.total, self.dim))
+        self.centroides = np.load(os.path.join(pasta, 'centroides.npy'))
+        self.offsets = np.load(os.path.join(pasta, 'offsets.npy'))
+        self.ids = np.load(os.path.join(pasta, 'ids.npy'), mmap_mode='r')
+        self.ativo = np.load(os.path.join(pasta, 'ativo.npy'), mmap_mode='r')
+        self.sob_consulta = np.load(os.path.join(pasta, 'sob_consulta.npy'), mmap_mode='r')
+        arquivo_removidos = os.path.join(pasta, 'removidos.npy')
+        self.removidos = (np.load(arquivo_removidos) if os.path.exists(arquivo_removidos)
+                          else np.zeros(0, dtype=np.int64))
+
+    @classmethod
+    def construir(cls, ids: Sequence[int], vetores: np.ndarray, ativo: Optional[Sequence[bool]] = None,
+                  sob_consulta: Optional[Sequence[bool]] = None, pasta: str = PASTA_PADRAO,
+                  n_listas: Optional[int] = None) -> 'VectorStore':
+        """Treina o IVF, ordena os vetores por lista e grava tudo em `pasta`"""
+        if not len(ids) or not len(vetores):
+            # O k-means precisa de pelo menos um vetor para sortear os centróides
+            raise ValueError("o vector store precisa de pelo menos um vetor")
+        vetores = normalizar(vetores)
+        total, dim = vetores.shape
+        ids = np.asarray(ids, dtype=np.int64)
+        ativo = np.ones(total, dtype=bool) if ativo is None else np.asarray(ativo, dtype=bool)
+        sob_consulta = np.zeros(total, dtype=bool) if sob_consulta is None else np.asarray(sob_consulta, dtype=bool)
+        n_listas = n_listas or max(1, min(int(np.sqrt(total) * 2), total))
+
+        centroides = treinar_kmeans(vetores, n_listas)
+        atribuicoes = _atribuir(vetores, centroides)
+        ordem = np.argsort(atribuicoes, kind='stable')
+        offsets = np.zeros(n_listas + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(atribuicoes, minlength=n_listas))
+
+        os.makedirs(pasta, exist_ok=True)
+        arquivo = np.memmap(os.path.join(pasta, 'vetores.f32'), dtype=np.float32, mode='w+', shape=(total, dim))
+        arquivo[:] = vetores[ordem]
+        arquivo.flush()
+        del arquivo
+        np.save(os.path.join(pasta, 'centroides.npy'), centroides)
+        np.save(os.path.join(pasta, 'offsets.npy'), offsets)
+        np.save(os.path.join(pasta, 'ids.npy'), ids[ordem])
+        np.save(os.path.join(pasta, 'ativo.npy'), ativo[ordem])
+        np.save(os.path.join(pasta, 'sob_consulta.npy'), sob_consulta[ordem])
+        if os.path.exists(os.path.join(pasta, 'removidos.npy')):
+            os.remove(os.path.join(pasta, 'removidos.npy'))
+        with open(os.path.join(pasta, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'dim': dim, 'total': total, 'n_listas': n_listas, 'metrica': 'cosseno'}, f)
+        return cls(pasta)
+
+    def remove(self, ids: Iterable) -> int:
+        """Marca produtos como removidos (persistido em `removidos.npy`); retorna quantos eram novos"""
+        novos = np.setdiff1d(np.intersect1d(np.asarray([int(i) for i in ids], dtype=np.int64), self.ids),
+                             self.removidos)
+        if len(novos):
+            self.removidos = np.union1d(self.removidos, novos)
+            np.save(os.path.join(self.pasta, 'removidos.npy'), self.removidos)
+        return len(novos)
+
+    def apply_delta(self, resultado) -> int:
+        """Aplica um `ResultadoDelta`: produtos removidos viram lápides (vetores novos só na reconstrução)"""
+        return self.remove(resultado.removidos) if resultado.removidos else 0
+
+    def _mascara(self, inicio: int, fim: int, ativo: Optional[bool],
+                 sob_consulta: Optional[bool]) -> Optional[np.ndarray]:
+        mascara = None
+        if ativo is not None:
+            mascara = self.ativo[inicio:fim] == ativo
+        if sob_consulta is not None:
+            parte = self.sob_consulta[inicio:fim] == sob_consulta
+            mascara = parte if mascara is None else mascara & parte
+        if len(self.removidos):
+            parte = ~np.isin(self.ids[inicio:fim], self.removidos)
+            mascara = parte if mascara is None else mascara & parte
+        return mascara
+
+    def search(self, consulta: np.ndarray, k: int = 10, n_probe: int = 8,
+               ativo: Optional[bool] = None, sob_consulta: Optional[bool] = None) -> List[Tuple[int, float]]:
+        """Top-k aproximado: percorre só as `n_probe` listas mais próximas da consulta"""
+        consulta = normalizar(consulta).reshape(-1)
+        n_probe = min(n_probe, len(self.centroides))
+        listas = np.argpartition(-(self.centroides @ consulta), n_probe - 1)[:n_probe]
+
+        candidatos_ids, candidatos_scores = [], []
+        for lista in listas:
+            inicio, fim = int(self.offsets[lista]), int(self.offsets[lista + 1])
+            if inicio == fim:
+                continue
+            scores = self.vetores[inicio:fim] @ consulta
+            mascara = self._mascara(inicio, fim, ativo, sob_consulta)
+            ids = self.ids[inicio:fim]
+            if mascara is not None:
+                scores, ids = scores[mascara], ids[mascara]
+            candidatos_scores.append(scores)
+            candidatos_ids.append(ids)
+        if not candidatos_scores:
+            return []
+        return self._top_k(np.concatenate(candidatos_ids), np.concatenate(candidatos_scores), k)
+
+    def search_exact(self, consulta: np.ndarray, k: int = 10, ativo: Optional[bool] = None,
+                     sob_consulta: Optional[bool] = None) -> List[Tuple[int, float]]:
+        """Top-k exato (força bruta), usado como referência de recall"""
+        consulta = normalizar(consulta).reshape(-1)
+        scores = np.asarray(self.vetores @ consulta)
+        ids = np.asarray(self.ids)
+        mascara = self._mascara(0, self.total, ativo, sob_consulta)
+        if mascara is not None:
+            scores, ids = scores[mascara], ids[mascara]
+        return self._top_k(ids, scores, k)
+
+    @staticmethod
+    def _top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        k = min(k, len(scores))
+        # `k < 0` passaria pelo argpartition (índices negativos) e devolveria resultados
+        if k <= 0:
+            return []
+        melhores = np.argpartition(-scores, k - 1)[:k]
+        melhores = melhores[np.argsort(-scores[melhores])]
+        return [(int(ids[i]), float(scores[i])) for i in melhores]
+
+def _dados_sinteticos(total: int, dim: int, grupos: int = 256, semente: int = 0) -> np.ndarray:
+    """Vetores agrupados (como embeddings reais de um catálogo), gerados em blocos"""
+    rng = np.random.default_rng(semente)
+    centros = rng.standard_normal((grupos, dim)).astype(np.float32)
+    vetores = np.empty((total, dim), dtype=np.float32)
+    for inicio in range(0, total, 100000):
+        fim = min(total, inicio + 100000)
+        vetores[inicio:fim] = centros[rng.integers(0, grupos, fim - inicio)]
+        vetores[inicio:fim] += 1.5 * rng.standard_normal((fim - inicio, dim)).astype(np.float32)
+    return vetores
+
+def benchmark_vector_store(tamanhos=(10000, 100000), dim: int = 128, consultas: int = 100,
+                           k: int = 10, n_probes=(8, 32),
+                           pasta: str = os.path.join('estado', 'benchmark_vetores')) -> List[Dict]:
+    """Mede recall@k (contra a busca exata) e latência por consulta para cada tamanho"""
+    resultados = []
+    print(f"{'vetores':>9} | {'n_probe':>7} | {'build (s)':>9} | {'recall@' + str(k):>9} | "
+          f"{'p50 (ms)':>8} | {'p99 (ms)':>8} | {'exata (ms)':>10}")
+    print("-" * 80)
+    try:
+        for total in tamanhos:
+            vetores = _dados_sinteticos(total, dim)
+            inicio = time.perf_counter()
+            store = VectorStore.construir(np.arange(total), vetores, pasta=pasta)
+            tempo_build = time.perf_counter() - inicio
+            del vetores
+
+            rng = np.random.default_rng(1)
+            amostras = np.asarray(store.vetores[rng.choice(total, consultas, replace=False)])
+            amostras = amostras + 0.1 * rng.standard_normal(amostras.shape).astype(np.float32)
+            latencias_exata, exatos = [], []
+            for consulta in amostras:
+                inicio = time.perf_counter()
+                exatos.append({i for i, _ in store.search_exact(consulta, k=k)})
+                latencias_exata.append(time.perf_counter() - inicio)
+
+            for n_probe in n_probes:
+                latencias, acertos = [], 0
+                for consulta, exato in zip(amostras, exatos):
+                    inicio = time.perf_counter()
+                    aproximado = store.search(consulta, k=k, n_probe=n_probe)
+                    latencias.append(time.perf_counter() - inicio)
+                    acertos += len({i for i, _ in aproximado} & exato)
+                resultado = {
+                    'vetores': total,
+                    'n_probe': n_probe,
+                    'build_s': tempo_build,
+                    'recall': acertos / (consultas * k),
+                    'p50_ms': float(np.percentile(latencias, 50) * 1000),
+                    'p99_ms': float(np.percentile(latencias, 99) * 1000),
+                    'exata_ms': float(np.median(latencias_exata) * 1000)
+                }
+                resultados.append(resultado)
+                print(f"{total:>9} | {n_probe:>7} | {tempo_build:>9.1f} | {resultado['recall']:>9.3f} | "
+                      f"{resultado['p50_ms']:>8.2f} | {resultado['p99_ms']:>8.2f} | {resultado['exata_ms']:>10.2f}")
+            del store
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+    return resultados
+
+if __name__ == "__main__":
+    # Ex: python vector_store.py 10000 100000 1000000
+    tamanhos = tuple(int(arg) for arg in sys.argv[1:]) or (10000, 100000)
+    benchmark_vector_store(tamanhos)